@@ -311,9 +311,12 @@ class BotChatAgent(QMainWindow):
             try:
                 summary = self.data_manager.get_dashboard_summary()
                 trans_list = summary.get("recent_transactions", [])[:3]
-                debts = self.data_manager.debts
-                funds = self.data_manager.funds
-                goals = self.data_manager.goals
+                # Snapshot bất biến (chỉ nợ / quỹ): không giữ tham chiếu tới list sống của Engine,
+                # cũng không chụp cả sổ giao dịch (đã có số liệu tổng hợp trong summary)
+                snap = self.data_manager.snapshot(transactions=False)
+                debts = snap.debts
+                funds = snap.funds
+                goals = snap.goals
 
                 # Tạo context dạng văn bản có cấu trúc
                 ctx = "=== CONTEXT TÀI CHÍNH NGƯỜI DÙNG (CẬP NHẬT THỰC TẾ) ===\n"
@@ -0,0 +1,197 @@
+"""
+Backup tăng dần (incremental), khử trùng lặp và nén cho mọi file dữ liệu.
+
+Cấu trúc thư mục backups/:
+    chunks/ab/abcdef....z     Khối dữ liệu nén zlib, đặt tên theo SHA-256 của nội dung gốc
+    manifests/<thời điểm>.json   Mỗi lần backup = 1 manifest: file nào gồm những khối nào
+
+Chia khối theo nội dung (content-defined) tại ranh giới dòng: cắt khối khi hash của dòng
+rơi vào mẫu cố định, nên thêm/sửa vài dòng chỉ làm đổi vài khối lân cận. File không đổi
+(cùng size + mtime với lần trước) thì dùng lại danh sách khối mà không cần đọc file.
+File không tồn tại lúc backup (vd: journal đã gộp hết) vẫn được ghi vào manifest với cờ "missing":
+restore xóa file đó nếu đang có -> không để journal cũ replay đè lên dữ liệu vừa dựng lại.
+=> Auto-backup chạy dày vẫn chỉ tốn đúng phần byte đã thay đổi.
+"""
+import hashlib
+import json
+import os
+import pathlib
+import zlib
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+# Trung bình ~1 khối / 64 dòng, chặn trên để file 1 dòng rất dài vẫn chia được
+_CUT_MASK = 0x3F
+MIN_CHUNK = 4 * 1024
+MAX_CHUNK = 256 * 1024
+
+# Chính sách giữ lại mặc định: N bản gần nhất + 1 bản/ngày trong D ngày
+KEEP_LAST = 20
+KEEP_DAILY = 30
+
+
+def split_chunks(data: bytes) -> List[bytes]:
+    """Chia theo nội dung tại ranh giới dòng (crc32 của dòng & mask == 0 -> cắt)"""
+    chunks: List[bytes] = []
+    start = 0
+    pos = 0
+    size = len(data)
+    crc32 = zlib.crc32
+    while pos < size:
+        nl = data.find(b"\n", pos)
+        end = size if nl == -1 else nl + 1
+        length = end - start
+        if length >= MAX_CHUNK or (length >= MIN_CHUNK and crc32(data[pos:end]) & _CUT_MASK == 0):
+            chunks.append(data[start:end])
+            start = end
+        pos = end
+    if start < size:
+        chunks.append(data[start:])
+    return chunks
+
+
+class BackupStore:
+    def __init__(self, root: pathlib.Path):
+        self.root = pathlib.Path(root)
+        self.chunk_dir = self.root / "chunks"
+        self.manifest_dir = self.root / "manifests"
+        self._written = 0
+
+    # ==========================
+    # KHỐI DỮ LIỆU
+    # ==========================
+    def _chunk_path(self, digest: str) -> pathlib.Path:
+        return self.chunk_dir / digest[:2] / (digest + ".z")
+
+    def _put_chunk(self, data: bytes) -> str:
+        """Lưu 1 khối nếu chưa có (cộng số byte nén thực ghi vào self._written), trả về hash"""
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._chunk_path(digest)
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            blob = zlib.compress(data, 6)
+            tmp = path.with_name(path.name + ".tmp")
+            tmp.write_bytes(blob)
+            os.replace(tmp, path)
+            self._written += len(blob)
+        return digest
+
+    def _get_chunk(self, digest: str) -> bytes:
+        data = zlib.decompress(self._chunk_path(digest).read_bytes())
+        if hashlib.sha256(data).hexdigest() != digest:
+            raise ValueError(f"Khối {digest[:12]} bị hỏng")
+        return data
+
+    # ==========================
+    # SNAPSHOT / MANIFEST
+    # ==========================
+    def snapshots(self) -> List[pathlib.Path]:
+        """Các manifest, cũ -> mới"""
+        if not self.manifest_dir.exists():
+            return []
+        return sorted(self.manifest_dir.glob("*.json"))
+
+    def read_manifest(self, manifest: pathlib.Path) -> Dict:
+        return json.loads(pathlib.Path(manifest).read_text(encoding="utf-8"))
+
+    def snapshot(self, files: Dict[str, pathlib.Path]) -> Optional[pathlib.Path]:
+        """
+        Backup các file {tên logic: đường dẫn}. File không tồn tại thì chỉ ghi nhận là "missing".
+        Không có gì thay đổi so với bản gần nhất -> không tạo manifest mới, trả về bản gần nhất.
+        """
+        self._written = 0
+        previous = self.snapshots()
+        prev_files = self.read_manifest(previous[-1])["files"] if previous else {}
+
+        entries: Dict[str, Dict] = {}
+        for name, path in files.items():
+            path = pathlib.Path(path)
+            if not path.exists():
+                entries[name] = {"path": str(path), "missing": True, "chunks": []}
+                continue
+            st = path.stat()
+            old = prev_files.get(name)
+            if old and not old.get("missing") and old["size"] == st.st_size and old["mtime_ns"] == st.st_mtime_ns \
+                    and all(self._chunk_path(h).exists() for h in old["chunks"]):
+                entries[name] = old
+                continue
+            data = path.read_bytes()
+            entries[name] = {
+                "path": str(path),
+                "size": len(data),
+                "mtime_ns": st.st_mtime_ns,
+                "chunks": [self._put_chunk(c) for c in split_chunks(data)],
+            }
+
+        if previous and entries == prev_files:
+            return previous[-1]
+
+        self.manifest_dir.mkdir(parents=True, exist_ok=True)
+        now = datetime.now()
+        manifest = self.manifest_dir / f"{now.strftime('%Y%m%d_%H%M%S_%f')}.json"
+        payload = {"created": now.isoformat(timespec="seconds"), "bytes_written": self._written, "files": entries}
+        tmp = manifest.with_name(manifest.name + ".tmp")
+        tmp.write_text(json.dumps(payload, ensure_ascii=False, indent=1), encoding="utf-8")
+        os.replace(tmp, manifest)
+        return manifest
+
+    def restore(self, manifest: pathlib.Path, dest_dir: Optional[pathlib.Path] = None,
+                names: Optional[List[str]] = None) -> List[pathlib.Path]:
+        """
+        Dựng lại file từ 1 manifest. dest_dir=None -> ghi đè về đúng đường dẫn gốc.
+        File "missing" trong manifest (vd: journal) bị xóa ở đích nếu đang có.
+        Trả về danh sách file đã ghi.
+        """
+        restored = []
+        for name, entry in self.read_manifest(manifest)["files"].items():
+            if names is not None and name not in names:
+                continue
+            target = pathlib.Path(entry["path"]) if dest_dir is None else pathlib.Path(dest_dir) / pathlib.Path(entry["path"]).name
+            if entry.get("missing"):
+                target.unlink(missing_ok=True)
+                continue
+            data = b"".join(self._get_chunk(h) for h in entry["chunks"])
+            target.parent.mkdir(parents=True, exist_ok=True)
+            tmp = target.with_name(target.name + ".tmp")
+            tmp.write_bytes(data)
+            os.replace(tmp, target)
+            restored.append(target)
+        return restored
+
+    # ==========================
+    # CHÍNH SÁCH GIỮ LẠI + DỌN KHỐI
+    # ==========================
+    def prune(self, keep_last: int = KEEP_LAST, keep_daily: int = KEEP_DAILY) -> int:
+        """
+        Giữ `keep_last` bản gần nhất + bản cuối cùng của mỗi ngày trong `keep_daily` ngày.
+        Xóa các manifest còn lại rồi dọn các khối không còn manifest nào dùng. Trả về số manifest đã xóa.
+        """
+        manifests = self.snapshots()
+        keep = set(manifests[-keep_last:]) if keep_last > 0 else set()
+        cutoff = (datetime.now() - timedelta(days=keep_daily)).strftime("%Y%m%d")
+        last_of_day: Dict[str, pathlib.Path] = {}
+        for m in manifests:
+            day = m.name[:8]
+            if day >= cutoff:
+                last_of_day[day] = m
+        keep.update(last_of_day.values())
+
+        removed = 0
+        for m in manifests:
+            if m not in keep:
+                m.unlink(missing_ok=True)
+                removed += 1
+        if removed:
+            self._collect_garbage()
+        return removed
+
+    def _collect_garbage(self):
+        used = set()
+        for m in self.snapshots():
+            for entry in self.read_manifest(m)["files"].values():
+                used.update(entry["chunks"])
+        if not self.chunk_dir.exists():
+            return
+        for path in self.chunk_dir.glob("*/*.z"):
+            if path.stem not in used:
+                path.unlink(missing_ok=True)
@@ -0,0 +1,131 @@
+"""
+Change feed có kiểu của DataManager.
+
+Mỗi thao tác ghi tạo 1 `Change`: loại đối tượng, thao tác, các id bị ảnh hưởng và giá trị
+trước/sau. DataManager gom các Change (1 thao tác, 1 lô hoặc cả 1 transaction()) rồi bắn
+theo từng miền dữ liệu (transactions_changed, debts_changed, funds_changed, calendar_changed),
+nên màn hình chỉ cần cập nhật đúng phần bị đổi thay vì dựng lại toàn bộ.
+"""
+import copy
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Loại đối tượng
+KIND_TRANSACTION = "transaction"
+KIND_DEBT = "debt"
+KIND_PAYMENT = "payment"      # 1 lần trả nợ (payment_log)
+KIND_FUND = "fund"
+KIND_GOAL = "goal"
+KIND_TODO = "todo"            # id = ngày ISO của danh sách mua sắm
+KIND_NOTE = "note"            # id = ngày ISO của danh sách ghi chú
+
+# Thao tác
+OP_ADD = "add"
+OP_UPDATE = "update"
+OP_DELETE = "delete"
+OP_RELOAD = "reload"          # Không rõ chi tiết (import, đổi hàng loạt...) -> dựng lại cả miền
+
+# Miền dữ liệu (mỗi miền 1 signal trên DataManager)
+DOMAIN_TRANSACTIONS = "transactions"
+DOMAIN_DEBTS = "debts"
+DOMAIN_FUNDS = "funds"
+DOMAIN_CALENDAR = "calendar"
+DOMAINS = (DOMAIN_TRANSACTIONS, DOMAIN_DEBTS, DOMAIN_FUNDS, DOMAIN_CALENDAR)
+
+_KIND_DOMAIN = {
+    KIND_TRANSACTION: DOMAIN_TRANSACTIONS,
+    KIND_DEBT: DOMAIN_DEBTS,
+    KIND_PAYMENT: DOMAIN_DEBTS,
+    KIND_FUND: DOMAIN_FUNDS,
+    KIND_GOAL: DOMAIN_FUNDS,
+    KIND_TODO: DOMAIN_CALENDAR,
+    KIND_NOTE: DOMAIN_CALENDAR,
+}
+
+
+@dataclass(frozen=True)
+class Change:
+    """
+    1 thay đổi. before/after song song với ids (None = chưa có / đã xóa).
+    kind=None: thay đổi không rõ loại (notify_change() không tham số) -> mọi miền dựng lại.
+    """
+    kind: Optional[str]
+    op: str
+    ids: Tuple = ()
+    before: Tuple = ()
+    after: Tuple = ()
+
+    @property
+    def domains(self) -> Tuple[str, ...]:
+        if self.kind is None:
+            return DOMAINS
+        return (_KIND_DOMAIN[self.kind],)
+
+    @property
+    def is_reload(self) -> bool:
+        return self.op == OP_RELOAD
+
+    @classmethod
+    def added(cls, kind: str, items: Iterable, key: str = "id") -> "Change":
+        items = tuple(detach(i) for i in items)
+        return cls(kind, OP_ADD, tuple(getattr(i, key) for i in items), (None,) * len(items), items)
+
+    @classmethod
+    def updated(cls, kind: str, before: Iterable, after: Iterable, key: str = "id") -> "Change":
+        after = tuple(detach(i) for i in after)
+        return cls(kind, OP_UPDATE, tuple(getattr(i, key) for i in after), tuple(before), after)
+
+    @classmethod
+    def deleted(cls, kind: str, ids: Iterable, before: Iterable) -> "Change":
+        before = tuple(before)
+        return cls(kind, OP_DELETE, tuple(ids), before, (None,) * len(before))
+
+    @classmethod
+    def reload(cls, kind: Optional[str] = None) -> "Change":
+        return cls(kind, OP_RELOAD)
+
+
+def detach(value):
+    """
+    Bản sao độc lập để làm giá trị before/after: engine sửa tại chỗ (fund.current += ...) hay
+    TransactionRow (view sống của ColumnarStore) cũng không làm đổi Change đã bắn.
+    """
+    if value is None:
+        return None
+    to_transaction = getattr(value, "to_transaction", None)
+    if to_transaction is not None:
+        return to_transaction()
+    return copy.deepcopy(value)
+
+
+def group_by_domain(changes: Iterable[Change]) -> Dict[str, List[Change]]:
+    """{miền: các Change của miền đó}, chỉ gồm miền có thay đổi"""
+    out: Dict[str, List[Change]] = {}
+    for change in changes:
+        for domain in change.domains:
+            out.setdefault(domain, []).append(change)
+    return out
+
+
+def changed_dates(changes: Iterable[Change]) -> Optional[set]:
+    """
+    Các ngày (ISO) bị ảnh hưởng: ngày giao dịch trước/sau, hạn nợ, ngày của todo/note.
+    None = không xác định được (reload, giao dịch định kỳ...) -> cần dựng lại toàn bộ.
+    """
+    dates = set()
+    for change in changes:
+        if change.is_reload:
+            return None
+        if change.kind in (KIND_TODO, KIND_NOTE):
+            dates.update(change.ids)
+            continue
+        for value in change.before + change.after:
+            if value is None:
+                continue
+            if getattr(value, "is_recurring", False):
+                return None   # Lần phát sinh rải khắp các tháng
+            for attr in ("date", "due_date"):
+                day = getattr(value, attr, None)
+                if isinstance(day, str) and day:
+                    dates.add(day[:10])
+    return dates
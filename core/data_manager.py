@@ -1,14 +1,52 @@
 import sys
 import shutil
 import pathlib
-from datetime import datetime, date
-from PyQt6.QtCore import QObject, pyqtSignal
+from contextlib import contextmanager
+from types import MappingProxyType
+from datetime import datetime, date, timedelta
+from PyQt6.QtCore import QObject, QThread, QTimer, pyqtSignal
 from models._tran import *
+from core.write_behind import WriteBehind
+from core.backup import BackupStore
+from core.snapshot import DataSnapshot
+from core.change_feed import (
+    Change, detach, group_by_domain,
+    KIND_TRANSACTION, KIND_DEBT, KIND_PAYMENT, KIND_FUND, KIND_GOAL, KIND_TODO, KIND_NOTE,
+    OP_ADD, OP_UPDATE, OP_DELETE,
+    DOMAIN_TRANSACTIONS, DOMAIN_DEBTS, DOMAIN_FUNDS, DOMAIN_CALENDAR,
+)
 
 # Import Engine từ các module con
 
 # Định nghĩa đường dẫn backup chung (Engine tự lo file data của nó)
 BACKUP_DIR = pathlib.Path(__file__).parent.parent / "backups"
+# Chu kỳ auto-backup khi bật cài đặt "auto_backup" (phút)
+AUTO_BACKUP_MINUTES = 10
+# Dashboard: giao dịch định kỳ sắp tới trong N ngày (hiện tối đa M dòng)
+UPCOMING_DAYS = 30
+UPCOMING_LIMIT = 10
+# Tên các Engine (dùng cho engine_ready / is_ready)
+ENGINES = ("transactions", "debts", "budget", "calendar")
+
+
+class EngineLoader(QThread):
+    """Dựng 1 Engine (đọc + parse file dữ liệu) ở thread riêng, xong thì bắn loaded(tên, engine)"""
+    loaded = pyqtSignal(str, object)
+
+    def __init__(self, name, factory, parent=None):
+        super().__init__(parent)
+        self.name = name
+        self.factory = factory
+        self.engine = None
+
+    def run(self):
+        try:
+            self.engine = self.factory()
+        except Exception as e:
+            # Để GUI thread dựng lại đồng bộ (lỗi sẽ hiện ra ở đó)
+            print(f"❌ EngineLoader: lỗi nạp {self.name}: {e}")
+        self.loaded.emit(self.name, self.engine)
+
 
 class DataManager(QObject):
     """
@@ -17,8 +55,18 @@ class DataManager(QObject):
     """
     _instance = None
     
-    # Signal: Bắn ra khi bất kỳ dữ liệu nào thay đổi
+    # Signal: Bắn ra khi bất kỳ dữ liệu nào thay đổi (không kèm chi tiết, giữ cho màn hình cũ)
     data_changed = pyqtSignal()
+    # Change feed có kiểu (xem core/change_feed.py): list[Change] của 1 lần notify
+    changes = pyqtSignal(list)
+    # Theo miền: chỉ bắn khi miền đó có thay đổi, kèm các Change của miền
+    transactions_changed = pyqtSignal(list)
+    debts_changed = pyqtSignal(list)
+    funds_changed = pyqtSignal(list)
+    calendar_changed = pyqtSignal(list)
+    # Signal: 1 Engine đã nạp xong (tên trong ENGINES) / mọi Engine đã nạp xong
+    engine_ready = pyqtSignal(str)
+    all_ready = pyqtSignal()
 
     @classmethod
     def instance(cls):
@@ -37,16 +85,99 @@ class DataManager(QObject):
         from services.buget_mgr.engine import BudgetEngine
         from services.calendar_mgr.engine import CalendarEngine
         # --- KHỞI TẠO CÁC ENGINE ---
-        # DataManager nắm giữ quyền điều khiển các engine này
+        # DataManager nắm giữ quyền điều khiển các engine này.
+        # Mỗi Engine nạp song song trên 1 thread riêng -> cửa sổ vẽ được ngay, không phụ thuộc độ lớn dữ liệu.
+        # Trang nào cần Engine chưa nạp xong thì hiện khung chờ (xem is_ready / engine_ready).
         print("🔄 DataManager: Đang khởi động các Engine...")
-        self.trans_engine = TransactionEngine()
-        self.debt_engine = DebtEngine()
-        self.budget_engine = BudgetEngine()
-        self.calendar_engine = CalendarEngine()
-        
+        WriteBehind.instance()   # Tạo singleton trên GUI thread trước khi các thread nạp chạy
+        self._engines = {}
+        self._loaders = {}
+        factories = {
+            "transactions": TransactionEngine,
+            "debts": DebtEngine,
+            "budget": BudgetEngine,
+            "calendar": CalendarEngine,
+        }
+        for name, factory in factories.items():
+            loader = EngineLoader(name, factory, self)
+            loader.loaded.connect(self._on_engine_loaded)
+            self._loaders[name] = loader
+            loader.start()
+
+        # --- UNIT OF WORK (xem transaction()) ---
+        self._tx_depth = 0
+        self._tx_changes = []
+        # Change chờ bắn ở lượt event loop kế tiếp (gộp mọi notify trong cùng 1 lượt)
+        self._pending_changes = []
+        # Kết quả dẫn xuất (summary, giao dịch gần đây...) cache theo version của Engine, xem _memo()
+        self._memo_cache = {}
+
+        # --- AUTO BACKUP (bật/tắt theo cài đặt "auto_backup" của AppContext) ---
+        self._auto_backup_timer = QTimer(self)
+        self._auto_backup_timer.setInterval(AUTO_BACKUP_MINUTES * 60 * 1000)
+        self._auto_backup_timer.timeout.connect(self.create_backup)
+        from core.app_context import AppContext
+        ctx = AppContext.instance()
+        ctx.setting_changed.connect(self._on_setting_changed)
+        self._on_setting_changed("auto_backup", ctx.get_setting("auto_backup", False))
+
+        print("✅ DataManager: Đã khởi động, các Engine đang nạp ở background.")
 
-        
-        print("✅ DataManager: Đã load dữ liệu thành công.")
+    # ==========================================
+    # 0. NẠP ENGINE Ở BACKGROUND
+    # ==========================================
+    @property
+    def trans_engine(self):
+        return self._engine("transactions")
+
+    @property
+    def debt_engine(self):
+        return self._engine("debts")
+
+    @property
+    def budget_engine(self):
+        return self._engine("budget")
+
+    @property
+    def calendar_engine(self):
+        return self._engine("calendar")
+
+    def _engine(self, name):
+        engine = self._engines.get(name)
+        if engine is None:
+            # Cần ngay khi chưa nạp xong (agent, backup, đóng app...) -> chờ đồng bộ
+            self._finish_loading(name)
+            engine = self._engines[name]
+        return engine
+
+    def is_ready(self, *names) -> bool:
+        """Các Engine `names` (mặc định: tất cả) đã nạp xong chưa"""
+        return all(name in self._engines for name in (names or ENGINES))
+
+    def wait_ready(self):
+        """Chờ (đồng bộ) mọi Engine nạp xong"""
+        for name in list(self._loaders):
+            self._finish_loading(name)
+
+    def _finish_loading(self, name):
+        loader = self._loaders.get(name)
+        if loader is not None:
+            loader.wait()
+            self._on_engine_loaded(name, loader.engine)
+
+    def _on_engine_loaded(self, name, engine):
+        loader = self._loaders.pop(name, None)
+        if loader is None:
+            return   # Đã nhận qua wait đồng bộ, signal tới sau -> bỏ qua
+        if engine is None:
+            engine = loader.factory()
+        self._engines[name] = engine
+        loader.wait()   # loaded là lệnh cuối của run(): chỉ chờ thread kết thúc hẳn rồi mới hủy
+        loader.deleteLater()
+        print(f"✅ DataManager: Engine '{name}' đã sẵn sàng.")
+        self.engine_ready.emit(name)
+        if not self._loaders:
+            self.all_ready.emit()
 
 
 
@@ -70,27 +201,36 @@ class DataManager(QObject):
         }
 
     # --- ACTIONS (Để UI gọi khi người dùng thao tác) ---
+    # Todo/note không có id riêng: id của Change là ngày, before/after là cả danh sách của ngày đó
+    def _calendar_change(self, kind, date_str, before):
+        getter = self.calendar_engine.get_todos if kind == KIND_TODO else self.calendar_engine.get_notes
+        return Change(kind, OP_UPDATE, (date_str,), (before,), (detach(getter(date_str)),))
+
     def add_cal_todo(self, date_str, name, price):
+        before = detach(self.calendar_engine.get_todos(date_str))
         self.calendar_engine.add_todo(date_str, name, price)
-        self.notify_change() # Báo UI reload
+        self.notify_change(self._calendar_change(KIND_TODO, date_str, before)) # Báo UI reload
 
     def toggle_cal_todo(self, date_str, index, is_done):
+        before = detach(self.calendar_engine.get_todos(date_str))
         self.calendar_engine.update_todo_status(date_str, index, is_done)
-        # Checkbox toggle thường không cần reload toàn bộ lịch, 
-        # nhưng reload để đồng bộ chấm màu/gạch ngang cũng tốt.
-        self.notify_change()
+        # Chỉ ngày này bị đổi -> lịch vẽ lại đúng 1 ô, dashboard chỉ cập nhật nếu là hôm nay
+        self.notify_change(self._calendar_change(KIND_TODO, date_str, before))
 
     def delete_cal_todo(self, date_str, index):
+        before = detach(self.calendar_engine.get_todos(date_str))
         self.calendar_engine.delete_todo(date_str, index)
-        self.notify_change()
+        self.notify_change(self._calendar_change(KIND_TODO, date_str, before))
 
     def add_cal_note(self, date_str, content):
+        before = detach(self.calendar_engine.get_notes(date_str))
         self.calendar_engine.add_note(date_str, content)
-        self.notify_change()
+        self.notify_change(self._calendar_change(KIND_NOTE, date_str, before))
 
     def delete_cal_note(self, date_str, index):
+        before = detach(self.calendar_engine.get_notes(date_str))
         self.calendar_engine.delete_note(date_str, index)
-        self.notify_change()
+        self.notify_change(self._calendar_change(KIND_NOTE, date_str, before))
 
     # ==========================================
     # 1. TRANSACTION PROXY (Ủy quyền)
@@ -100,17 +240,80 @@ class DataManager(QObject):
         """Trả về list Transaction Objects từ Engine"""
         return self.trans_engine.get_all()
 
+    def get_transaction(self, tid):
+        """Tra cứu 1 giao dịch theo id (O(1) qua index của Engine)"""
+        return self.trans_engine.get_by_id(tid)
+
+    def filter_transactions(self, keyword="", type_name=None, date_from=None, date_to=None):
+        """Lọc giao dịch (dạng rút gọn của query_transactions), trả về list"""
+        return self.trans_engine.filter(keyword, type_name, date_from, date_to)
+
+    def get_transaction_summary(self):
+        """{income, expense, balance} của toàn bộ sổ (O(1), Engine giữ tổng cộng dồn)"""
+        return self.trans_engine.summary()
+
+    def query_transactions(self, **filters):
+        """
+        Truy vấn khai báo (Engine tự chọn index), trả về QueryResult lười.
+        Ví dụ: query_transactions(date_from=d, date_to=d, order="date")
+        """
+        return self.trans_engine.query(**filters)
+
+    def get_recurring_occurrences(self, start, end):
+        """Các lần phát sinh của giao dịch định kỳ trong [start, end] (sinh lười, không lưu vào sổ)"""
+        return self.trans_engine.occurrences(start, end)
+
+    def get_rollup(self):
+        """Cube tổng hợp (tháng x danh mục x thành viên x loại) do Engine duy trì"""
+        return self.trans_engine.rollup
+
+    def get_top_transactions(self, n=5, type_name="expense"):
+        """n giao dịch có số tiền lớn nhất của 1 loại (index top-K của Engine, không sort cả sổ)"""
+        return self.trans_engine.largest(n, type_name)
+
     def add_transaction(self, t):
         self.trans_engine.add_transaction(t)
-        self.notify_change()
-
-    def update_transaction(self, t):
-        self.trans_engine.update_transaction(t)
-        self.notify_change()
+        self.notify_change(Change.added(KIND_TRANSACTION, [t]))
+
+    # update_*: object bị sửa tại chỗ trước khi gọi thì truyền `before` (bản detach() chụp TRƯỚC khi sửa),
+    # nếu không before đọc lại từ Engine sẽ chính là object đã sửa (before == after).
+    # Bản hàng loạt nhận `before` là list song song với `items`.
+    def update_transaction(self, t, before=None):
+        known = before
+        if before is None:
+            before = detach(self.trans_engine.get_by_id(t.id))
+        # Engine chỉ nhận `before` do bên gọi chụp: bản đọc lại ở trên có thể đã bị sửa tại chỗ,
+        # trừ nó khỏi tổng/cube sẽ sai (không có bản chụp -> Engine tự tính lại)
+        self.trans_engine.update_transaction(t, known)
+        if before is not None:
+            self.notify_change(Change.updated(KIND_TRANSACTION, [before], [t]))
 
     def delete_transaction(self, tid):
+        before = detach(self.trans_engine.get_by_id(tid))
         self.trans_engine.delete_transaction(tid)
-        self.notify_change()
+        if before is not None:
+            self.notify_change(Change.deleted(KIND_TRANSACTION, [tid], [before]))
+
+    # Hàng loạt: cả lô ghi xuống đĩa 1 lần và chỉ notify 1 lần
+    def add_transactions(self, items):
+        added = self.trans_engine.add_many(items)
+        if added:
+            self.notify_change(Change.added(KIND_TRANSACTION, added))
+
+    def update_transactions(self, items, before=None):
+        items = list(items)
+        known = {} if before is None else {t.id: b for t, b in zip(items, before)}
+        before = {t.id: detach(self.trans_engine.get_by_id(t.id)) for t in items}
+        before.update(known)
+        updated = self.trans_engine.update_many(items, known)
+        if updated:
+            self.notify_change(Change.updated(KIND_TRANSACTION, [before[t.id] for t in updated], updated))
+
+    def delete_transactions(self, tids):
+        before = {tid: detach(self.trans_engine.get_by_id(tid)) for tid in tids}
+        removed = self.trans_engine.delete_many(list(before))
+        if removed:
+            self.notify_change(Change.deleted(KIND_TRANSACTION, removed, [before[tid] for tid in removed]))
 
     # ==========================================
     # 2. DEBT PROXY (Ủy quyền)
@@ -120,76 +323,137 @@ class DataManager(QObject):
         """Trả về list Debt Objects từ Engine"""
         return self.debt_engine.get_debts()
 
+    def _debts_by_id(self, ids):
+        """{id: bản sao khoản nợ hiện tại} cho các id (giá trị before của Change)"""
+        ids = set(ids)
+        return {d.id: detach(d) for d in self.debt_engine.get_debts() if d.id in ids}
+
     def add_debt(self, d):
         self.debt_engine.add_debt(d)
-        self.notify_change()
+        self.notify_change(Change.added(KIND_DEBT, [d]))
 
-    def update_debt(self, d):
-        self.debt_engine.update_debt(d)
-        self.notify_change()
+    def update_debt(self, d, before=None):
+        known = self._debts_by_id([d.id])
+        self.debt_engine.update_debt(d, before)
+        if known:
+            self.notify_change(Change.updated(KIND_DEBT, [before if before is not None else known[d.id]], [d]))
 
     def delete_debt(self, did):
+        before = self._debts_by_id([did])
         self.debt_engine.delete_debt(did)
-        self.notify_change()
+        if before:
+            self.notify_change(Change.deleted(KIND_DEBT, [did], [before[did]]))
+
+    def add_debts(self, items):
+        added = self.debt_engine.add_many(items)
+        if added:
+            self.notify_change(Change.added(KIND_DEBT, added))
+
+    def update_debts(self, items, before=None):
+        items = list(items)
+        known = self._debts_by_id(d.id for d in items)
+        if before is not None:
+            known.update((d.id, b) for d, b in zip(items, before) if d.id in known)
+        updated = self.debt_engine.update_many(items, known)
+        if updated:
+            self.notify_change(Change.updated(KIND_DEBT, [known[d.id] for d in updated], updated))
+
+    def delete_debts(self, ids):
+        before = self._debts_by_id(ids)
+        if self.debt_engine.delete_many(list(before)):
+            self.notify_change(Change.deleted(KIND_DEBT, list(before), list(before.values())))
+
+    @property
+    def payment_log(self):
+        """Các lần trả nợ gần nhất (cũ -> mới)"""
+        return self.debt_engine.payments
+
+    def log_debt_payment(self, debt, amount):
+        self.debt_engine.log_payment(debt, amount, date.today().isoformat())
+        entry = self.debt_engine.payments[-1]
+        self.notify_change(Change(KIND_PAYMENT, OP_ADD, (debt.id,), (None,), (dict(entry),)))
+
+    def versions(self):
+        """Version hiện tại của các Engine (tăng mỗi khi dữ liệu Engine đó đổi)"""
+        return {
+            "transactions": self.trans_engine.version,
+            "debts": self.debt_engine.version,
+            "budget": self.budget_engine.version,
+            "calendar": self.calendar_engine.version,
+        }
+
+    def snapshot(self, transactions=True):
+        """
+        Ảnh chụp bất biến (giao dịch, cube, nợ, quỹ) của version hiện tại, đọc được từ mọi thread.
+        Dữ liệu chưa đổi -> trả lại đúng snapshot cũ; Engine nào chưa đổi thì phần của nó dùng chung.
+        transactions=False: chỉ chụp nợ / quỹ (rows, rollup = None) -> không dựng bảng copy-on-write
+        của sổ giao dịch, không nạp phân vùng năm cũ (vd: context cho agent chat).
+        """
+        v = self.versions()
+        tv, dv, bv = v["transactions"], v["debts"], v["budget"]
+        if not transactions:
+            return self._memo("snapshot_accounts", (dv, bv), lambda: DataSnapshot(
+                versions=MappingProxyType(dict(v)), rows=None, rollup=None, **self._snapshot_accounts(dv, bv)))
+        return self._memo("snapshot", (tv, dv, bv), lambda: DataSnapshot(
+            versions=MappingProxyType(dict(v)),
+            rows=self.trans_engine.snapshot(),
+            rollup=self._memo("snapshot_rollup", (tv,), self.trans_engine.rollup.copy),
+            **self._snapshot_accounts(dv, bv),
+        ))
+
+    def _snapshot_accounts(self, dv, bv):
+        """Phần nợ / quỹ của snapshot (tuple bản sao, cache theo version Engine nợ / quỹ)"""
+        return {
+            "debts": self._memo("snapshot_debts", (dv,), lambda: tuple(detach(d) for d in self.debts)),
+            "funds": self._memo("snapshot_funds", (bv,), lambda: tuple(detach(f) for f in self.funds)),
+            "goals": self._memo("snapshot_goals", (bv,), lambda: tuple(detach(g) for g in self.goals)),
+        }
+
+    def _memo(self, name, key, compute):
+        """
+        Trả về compute() đã cache cho tới khi `key` (tuple version/ngày) đổi.
+        Kết quả dùng chung giữa các lần gọi -> nơi gọi chỉ đọc, không sửa tại chỗ.
+        """
+        hit = self._memo_cache.get(name)
+        if hit is not None and hit[0] == key:
+            return hit[1]
+        value = compute()
+        self._memo_cache[name] = (key, value)
+        return value
 
     def get_dashboard_summary(self):
         """
         Tổng hợp số liệu từ tất cả các nguồn để hiển thị lên Dashboard.
         Trả về dict với dữ liệu đã được chuẩn hóa, an toàn và sẵn sàng cho UI.
+        Mỗi phần được cache theo version của Engine nguồn (+ ngày hôm nay nếu phụ thuộc ngày):
+        gọi lại khi dữ liệu chưa đổi (Dashboard refresh, mỗi tin nhắn chat của bot) gần như miễn phí.
         """
-        from datetime import date
-
         today_str = date.today().isoformat()
+        v = self.versions()
+        key = (v["transactions"], v["debts"], v["budget"], v["calendar"], today_str)
+        return dict(self._memo("summary", key, lambda: self._build_dashboard_summary(today_str)))
+
+    def _build_dashboard_summary(self, today_str):
+        tv = self.trans_engine.version
 
         # --- 1. Transaction Summary ---
-        try:
-            trans_sum = self.trans_engine.summary()  # {income, expense, balance}
-            income = trans_sum.get("income", 0)
-            expense = trans_sum.get("expense", 0)
-            balance = trans_sum.get("balance", 0)
-        except Exception:
-            income = expense = balance = 0
+        income, expense, balance = self._memo("trans_summary", (tv,), self._trans_summary)
 
         # --- 2. Debt Summary ---
-        try:
-            debt_sum = self.debt_engine.summary()  # {i_owe, they_owe, net}
-            debt_owe = debt_sum.get("i_owe", 0)
-            debt_recv = debt_sum.get("they_owe", 0)
-            debt_net = debt_sum.get("net", 0)
-        except Exception:
-            debt_owe = debt_recv = debt_net = 0
+        debt_owe, debt_recv, debt_net = self._memo("debt_summary", (self.debt_engine.version,), self._debt_summary)
 
         # --- 3. Savings (Từ BudgetEngine) ---
-        try:
-            funds = self.funds or []
-            total_savings = sum(getattr(fund, 'current', 0) for fund in funds)
-        except Exception:
-            total_savings = 0
+        total_savings = self._memo("savings", (self.budget_engine.version,), self._savings)
 
         # --- 4. Giao dịch gần đây (5 giao dịch mới nhất) ---
-        try:
-            all_trans = self.trans_engine.get_all() or []
-            # Sắp xếp theo ngày giảm dần (hỗ trợ cả str "YYYY-MM-DD" và date object)
-            def parse_date(trans):
-                d = getattr(trans, 'date', '')
-                if isinstance(d, str):
-                    return d
-                elif hasattr(d, 'isoformat'):
-                    return d.isoformat()
-                else:
-                    return "1970-01-01"
-            recent = sorted(all_trans, key=parse_date, reverse=True)[:5]
-            recent_dicts = [t.to_dict() if hasattr(t, 'to_dict') else vars(t) for t in recent]
-        except Exception:
-            recent_dicts = []
+        recent_dicts = self._memo("recent", (tv,), self._recent_dicts)
+
+        # --- 4b. Giao dịch định kỳ sắp tới + dự kiến thu/chi (không tính vào số dư thật) ---
+        upcoming_dicts, forecast = self._memo("upcoming", (tv, today_str), lambda: self._upcoming(today_str))
 
         # --- 5. Dữ liệu Lịch (Todo + Notes) ---
-        try:
-            calendar_todos = self.calendar_engine.get_todos(today_str) or []
-            calendar_notes = self.calendar_engine.get_notes(today_str) or []
-        except Exception:
-            calendar_todos = []
-            calendar_notes = []
+        calendar_todos, calendar_notes = self._memo(
+            "today_calendar", (self.calendar_engine.version, today_str), lambda: self._today_calendar(today_str))
 
         # --- 6. Tính toán tài sản ròng ---
         net_worth = balance + total_savings + debt_net
@@ -203,31 +467,207 @@ class DataManager(QObject):
             "savings": total_savings,
             "net_worth": net_worth,
             "recent_transactions": recent_dicts,
+            "upcoming_recurring": upcoming_dicts,
+            "forecast": forecast,
             "calendar_todos": calendar_todos,   # ← Đã đổi tên để rõ nghĩa
             "calendar_notes": calendar_notes    # ← Mới: ghi chú hôm nay
         }
+
+    def _trans_summary(self):
+        try:
+            trans_sum = self.trans_engine.summary()  # {income, expense, balance}
+            return trans_sum.get("income", 0), trans_sum.get("expense", 0), trans_sum.get("balance", 0)
+        except Exception:
+            return 0, 0, 0
+
+    def _debt_summary(self):
+        try:
+            debt_sum = self.debt_engine.summary()  # {i_owe, they_owe, net}
+            return debt_sum.get("i_owe", 0), debt_sum.get("they_owe", 0), debt_sum.get("net", 0)
+        except Exception:
+            return 0, 0, 0
+
+    def _savings(self):
+        try:
+            funds = self.funds or []
+            return sum(getattr(fund, 'current', 0) for fund in funds)
+        except Exception:
+            return 0
+
+    def _recent_dicts(self):
+        try:
+            # Đọc đuôi DateIndex (đã sắp theo ngày) -> không cần nạp/sắp cả sổ
+            recent = self.trans_engine.latest(5)
+            return [t.to_dict() if hasattr(t, 'to_dict') else vars(t) for t in recent]
+        except Exception:
+            return []
+
+    def _upcoming(self, today_str):
+        try:
+            today = date.fromisoformat(today_str)
+            horizon_from = (today + timedelta(days=1)).isoformat()
+            horizon_to = (today + timedelta(days=UPCOMING_DAYS)).isoformat()
+            upcoming = self.trans_engine.occurrences(horizon_from, horizon_to)
+            return ([t.to_dict() for t in upcoming[:UPCOMING_LIMIT]],
+                    self.trans_engine.forecast(horizon_from, horizon_to))
+        except Exception:
+            return [], {"income": 0, "expense": 0, "balance": 0}
+
+    def _today_calendar(self, today_str):
+        try:
+            # Chép ra list mới: list trong cache của CalendarEngine bị sửa tại chỗ khi tick/xóa
+            return (list(self.calendar_engine.get_todos(today_str) or []),
+                    list(self.calendar_engine.get_notes(today_str) or []))
+        except Exception:
+            return [], []
     
     # ==========================================
     # 4. NOTIFICATION & UTILS
     # ==========================================
-    def notify_change(self):
-        """Bắn tín hiệu để toàn bộ UI cập nhật"""
-        print("📢 DataManager: Dữ liệu thay đổi -> Notify UI")
+    def notify_change(self, *changes):
+        """
+        Bắn các Change cho UI. Không truyền gì = thay đổi không rõ chi tiết (vd: import xong)
+        -> mọi miền dựng lại như trước.
+        """
+        changes = list(changes) or [Change.reload()]
+        if self._tx_depth:
+            # Đang trong transaction(): gộp lại, bắn 1 lần khi commit
+            self._tx_changes.extend(changes)
+            return
+        self._emit_changes(changes)
+
+    def _emit_changes(self, changes):
+        """
+        Không bắn ngay: xếp vào hàng đợi và hẹn 1 lần bắn ở lượt event loop kế tiếp.
+        Nhiều notify trong cùng 1 lượt (vd: dialog thêm giao dịch rồi sửa quỹ) -> UI refresh 1 lần.
+        """
+        if not self._pending_changes:
+            QTimer.singleShot(0, self.flush_notifications)
+        self._pending_changes.extend(changes)
+
+    def flush_notifications(self):
+        """Bắn ngay các Change đang chờ (gọi tay khi cần UI cập nhật đồng bộ, vd: script không có event loop)"""
+        changes, self._pending_changes = self._pending_changes, []
+        if not changes:
+            return
+        print(f"📢 DataManager: {len(changes)} thay đổi -> Notify UI")
+        self.changes.emit(changes)
+        by_domain = group_by_domain(changes)
+        signals = {
+            DOMAIN_TRANSACTIONS: self.transactions_changed,
+            DOMAIN_DEBTS: self.debts_changed,
+            DOMAIN_FUNDS: self.funds_changed,
+            DOMAIN_CALENDAR: self.calendar_changed,
+        }
+        for domain, items in by_domain.items():
+            signals[domain].emit(items)
         self.data_changed.emit()
 
+    @contextmanager
+    def transaction(self):
+        """
+        Unit-of-work cho thao tác ghép nhiều bước trên nhiều Engine:
+
+            with dm.transaction():
+                dm.update_debt(debt)
+                dm.add_transaction(t)
+
+        - Giao dịch: gom lại, commit bằng 1 lần ghi journal (1 transaction SQL với SQLite).
+        - File JSON (nợ, quỹ...): WriteBehind giữ lại tới khi commit rồi ghi cùng lúc.
+        - data_changed chỉ bắn 1 lần, sau khi commit.
+        - Có exception: RAM của mọi Engine trở về như trước, không ghi gì, không notify.
+          Engine chỉ chụp các object thật sự bị đụng tới; object bị sửa tại chỗ trước khi
+          gọi update_* thì phải truyền before=detach(obj) chụp trước khi sửa.
+        Lồng nhau được: khối trong gộp vào khối ngoài.
+        """
+        if self._tx_depth:
+            self._tx_depth += 1
+            try:
+                yield self
+            finally:
+                self._tx_depth -= 1
+            return
+
+        engines = (self.trans_engine, self.debt_engine, self.budget_engine)
+        writer = WriteBehind.instance()
+        writer.hold()
+        self._tx_depth = 1
+        self._tx_changes = []
+        try:
+            for engine in engines:
+                engine.begin()
+            try:
+                yield self
+            except BaseException:
+                for engine in engines:
+                    try:
+                        engine.rollback()
+                    except Exception as e:
+                        print(f"❌ DataManager: lỗi rollback {type(engine).__name__}: {e}")
+                self._tx_changes = []
+                raise
+            for engine in engines:
+                engine.commit()
+        finally:
+            self._tx_depth = 0
+            writer.release()
+
+        if self._tx_changes:
+            changes, self._tx_changes = self._tx_changes, []
+            self._emit_changes(changes)
+
+    def flush_all(self):
+        """Ghi ngay mọi thay đổi còn treo của tất cả Engine (gọi khi đóng app)"""
+        self.wait_ready()   # Không để thread nạp còn chạy khi thoát
+        WriteBehind.instance().flush()
+        try:
+            self.trans_engine.flush()
+        except Exception as e:
+            print(f"❌ DataManager: lỗi flush giao dịch: {e}")
+
+    def data_files(self):
+        """Toàn bộ file dữ liệu cần backup: {tên logic: đường dẫn}"""
+        from services.buget_mgr.engine import FILE_FUNDS, FILE_GOALS
+        return {
+            **self.trans_engine.data_files(),
+            "debts": self.debt_engine.file,
+            "budget_personal": FILE_FUNDS,
+            "budget_group": FILE_GOALS,
+            "todos": self.calendar_engine.todo_file,
+            "notes": self.calendar_engine.note_file,
+            "payment_log": self.debt_engine.payment_file,
+        }
+
     def create_backup(self):
-        """Sao lưu toàn bộ dữ liệu"""
-        if not BACKUP_DIR.exists():
-            BACKUP_DIR.mkdir(parents=True)
-        
-        # Gọi từng Engine thực hiện backup của riêng nó
-        t_backup = self.trans_engine.backup()
-        # d_backup = self.debt_engine.backup() # Cần implement hàm backup trong DebtEngine
-        
-        if t_backup:
-            print(f"✅ Backup Transaction tại: {t_backup}")
+        """
+        Sao lưu toàn bộ dữ liệu vào kho backup tăng dần (backups/chunks + backups/manifests).
+        Chỉ phần byte đã đổi mới được ghi thêm; bản cũ được dọn theo chính sách giữ lại.
+        """
+        try:
+            # Không gọi flush_all(): gộp journal = ghi lại cả CSV trên GUI thread.
+            # Backup lấy thẳng CSV gốc + journal (load sẽ replay), chỉ cần ghi nốt các file JSON còn treo.
+            self.wait_ready()
+            WriteBehind.instance().flush()
+            store = BackupStore(BACKUP_DIR)
+            with self.trans_engine.files_locked():
+                manifest = store.snapshot(self.data_files())
+            store.prune()
+        except Exception as e:
+            print(f"❌ DataManager: Backup lỗi: {e}")
+            return False
+
+        if manifest:
+            print(f"✅ Backup tại: {manifest}")
             return True
         return False
+
+    def _on_setting_changed(self, key, value):
+        if key != "auto_backup":
+            return
+        if value:
+            self._auto_backup_timer.start()
+        else:
+            self._auto_backup_timer.stop()
     
 
     
@@ -237,17 +677,25 @@ class DataManager(QObject):
         """Lấy danh sách quỹ cá nhân từ Engine"""
         return self.budget_engine.funds
     
+    # Engine quỹ so id dạng chuỗi -> key của dict before cũng là str(id)
+    def _funds_by_id(self, ids):
+        ids = {str(i) for i in ids}
+        return {str(f.id): detach(f) for f in self.budget_engine.funds if str(f.id) in ids}
+
+    def _goals_by_id(self, ids):
+        ids = {str(i) for i in ids}
+        return {str(g.id): detach(g) for g in self.budget_engine.goals if str(g.id) in ids}
+
+    @staticmethod
+    def _with_before(known, items, before):
+        """Thay giá trị đọc từ Engine bằng `before` (list song song với items) do bên gọi chụp sẵn"""
+        if before is not None:
+            known.update((str(x.id), b) for x, b in zip(items, before) if str(x.id) in known)
+        return known
+
     def add_fund(self, f):
         self.budget_engine.add_fund(f)
-        self.notify_change()
-        
-    def update_fund(self, f):
-        self.budget_engine.update_fund(f)
-        self.notify_change()
-
-    def delete_fund(self, fid: int): # <--- Bổ sung cái này cho đủ bộ
-        self.budget_engine.delete_fund(fid)
-        self.notify_change()
+        self.notify_change(Change.added(KIND_FUND, [f]))
 
     # --- GOALS (NHÓM) ---
     @property
@@ -258,19 +706,61 @@ class DataManager(QObject):
     def add_goal(self, g):
         """Thêm quỹ nhóm mới"""
         self.budget_engine.add_goal(g)
-        self.notify_change() 
+        self.notify_change(Change.added(KIND_GOAL, [g]))
 
-    def update_goal(self, g):
+    def update_goal(self, g, before=None):
         """
         Cập nhật thông tin quỹ nhóm (Tên, Target, Members, Node Positions...)
+        Quỹ bị sửa tại chỗ trước khi gọi thì truyền `before` (bản sao trước khi sửa) cho change feed.
         """
-        self.budget_engine.update_goal(g)
-        self.notify_change()
+        if before is None:
+            before = self._goals_by_id([g.id]).get(str(g.id))
+        self.budget_engine.update_goal(g, before)
+        self.notify_change(Change.updated(KIND_GOAL, [before], [g]))
 
     def delete_goal(self, gid: int):
         """Xóa quỹ nhóm"""
+        before = self._goals_by_id([gid])
         self.budget_engine.delete_goal(gid)
-        self.notify_change()
+        if before:
+            self.notify_change(Change.deleted(KIND_GOAL, [gid], list(before.values())))
+
+    # --- FUNDS / GOALS HÀNG LOẠT (mỗi file ghi 1 lần, notify 1 lần) ---
+    def add_funds(self, funds):
+        funds = list(funds)
+        if self.budget_engine.add_many(funds=funds):
+            self.notify_change(Change.added(KIND_FUND, funds))
+
+    def update_funds(self, funds, before=None):
+        funds = list(funds)
+        known = self._funds_by_id(f.id for f in funds)
+        before = self._with_before(known, funds, before)
+        if self.budget_engine.update_many(funds=funds, before=before):
+            funds = [f for f in funds if str(f.id) in before]
+            self.notify_change(Change.updated(KIND_FUND, [before[str(f.id)] for f in funds], funds))
+
+    def delete_funds(self, fund_ids):
+        before = self._funds_by_id(fund_ids)
+        if self.budget_engine.delete_many(fund_ids=list(before)):
+            self.notify_change(Change.deleted(KIND_FUND, list(before), list(before.values())))
+
+    def add_goals(self, goals):
+        goals = list(goals)
+        if self.budget_engine.add_many(goals=goals):
+            self.notify_change(Change.added(KIND_GOAL, goals))
+
+    def update_goals(self, goals, before=None):
+        goals = list(goals)
+        known = self._goals_by_id(g.id for g in goals)
+        before = self._with_before(known, goals, before)
+        if self.budget_engine.update_many(goals=goals, before=before):
+            goals = [g for g in goals if str(g.id) in before]
+            self.notify_change(Change.updated(KIND_GOAL, [before[str(g.id)] for g in goals], goals))
+
+    def delete_goals(self, goal_ids):
+        before = self._goals_by_id(goal_ids)
+        if self.budget_engine.delete_many(goal_ids=list(before)):
+            self.notify_change(Change.deleted(KIND_GOAL, list(before), list(before.values())))
     # Nhớ đảm bảo đã import các thư viện này ở đầu file data_manager.py
     # import uuid
     # from datetime import datetime, date
@@ -292,73 +782,68 @@ class DataManager(QObject):
         current_time = datetime.now().strftime("%Y-%m-%d %H:%M")
         
         if is_deposit:
-            # Nạp tiền: Hũ tăng tiền
-            fund.current += amount
-            
-            # History của Hũ
+            # Nạp tiền: Hũ tăng tiền, Ví mất tiền (Expense)
+            delta = amount
             hist_type = "in"
-            
-            # Giao dịch của Ví
-            trans_type = "expense"        # Ví mất tiền
+            trans_type = "expense"
             trans_cat = "Tiết kiệm & Đầu tư"
             prefix = "Nạp quỹ"
         else:
-            # Rút tiền: Hũ giảm tiền
-            fund.current -= amount
-            
-            # History của Hũ
+            # Rút tiền: Hũ giảm tiền, Ví nhận lại tiền (Income)
+            delta = -amount
             hist_type = "out"
-            
-            # Giao dịch của Ví
-            trans_type = "income"         # Ví nhận lại tiền
+            trans_type = "income"
             trans_cat = "Chi tiêu từ quỹ" # Hoặc "Thu nhập khác"
             prefix = "Rút quỹ"
 
-        # 3. CẬP NHẬT LỊCH SỬ QUỸ (BUDGET ENGINE)
-        if not hasattr(fund, 'history') or fund.history is None: 
-            fund.history = []
-            
-        fund.history.append({
-            "date": current_time,
-            "amount": amount,
-            "note": note,
-            "type": hist_type
-        })
-        
-        # Lưu thay đổi của Quỹ xuống ổ cứng ngay lập tức
-        self.budget_engine.save()
-
-        # 4. TẠO GIAO DỊCH TRONG VÍ (TRANSACTION ENGINE)
-        # Import uuid ở đây hoặc đầu file
         import uuid
-        
-        new_trans = Transaction(
-            id=str(uuid.uuid4()),
-            date=date.today().isoformat(), # YYYY-MM-DD
-            category=trans_cat,
-            amount=amount,
-            type=trans_type, 
-            role="CaNhan",
-            description=f"[{prefix}] {fund.name}: {note}",
-            is_recurring=False,
-            cycle="" # Trường này cần nếu Model Transaction yêu cầu
-        )
-        
-        self.trans_engine.add_transaction(new_trans)
 
-        # 5. THÔNG BÁO UI CẬP NHẬT
+        # 3 + 4. QUỸ VÀ VÍ TRONG CÙNG 1 UNIT-OF-WORK:
+        # lỗi giữa chừng thì cả hai đều như cũ; thành công thì ghi 1 lần + notify 1 lần
+        with self.transaction():
+            before = detach(fund)
+            fund.current += delta
+            if not hasattr(fund, 'history') or fund.history is None: 
+                fund.history = []
+            fund.history.append({
+                "date": current_time,
+                "amount": amount,
+                "note": note,
+                "type": hist_type
+            })
+            self.update_fund(fund, before)
+
+            self.add_transaction(Transaction(
+                id=str(uuid.uuid4()),
+                date=date.today().isoformat(), # YYYY-MM-DD
+                category=trans_cat,
+                amount=amount,
+                type=trans_type, 
+                role="CaNhan",
+                description=f"[{prefix}] {fund.name}: {note}",
+                is_recurring=False,
+                cycle="" # Trường này cần nếu Model Transaction yêu cầu
+            ))
+
+        # 5. UI đã được notify đúng 1 lần khi transaction() commit
         print(f"✅ DataManager: Đã xử lý {prefix} {amount:,.0f}đ -> {fund.name}")
-        self.data_changed.emit() # Refresh toàn bộ Dashboard và UI
 
 
 # --- THÊM VÀO CLASS DataManager ---
     
-    def update_fund(self, fund):
-        """Cập nhật thông tin quỹ (Tên, Target, Icon...)"""
-        self.budget_engine.update_fund(fund)
-        self.notify_change() # Báo cho UI refresh
+    def update_fund(self, fund, before=None):
+        """
+        Cập nhật thông tin quỹ (Tên, Target, Icon...).
+        Quỹ bị sửa tại chỗ trước khi gọi thì truyền `before` (bản sao trước khi sửa) cho change feed.
+        """
+        if before is None:
+            before = self._funds_by_id([fund.id]).get(str(fund.id))
+        self.budget_engine.update_fund(fund, before)
+        self.notify_change(Change.updated(KIND_FUND, [before], [fund])) # Báo cho UI refresh
 
     def delete_fund(self, fund_id: str):
         """Xóa quỹ vĩnh viễn"""
+        before = self._funds_by_id([fund_id])
         self.budget_engine.delete_fund(fund_id)
-        self.notify_change() # Báo cho UI refresh
\ No newline at end of file
+        if before:
+            self.notify_change(Change.deleted(KIND_FUND, [fund_id], list(before.values()))) # Báo cho UI refresh
\ No newline at end of file
@@ -0,0 +1,71 @@
+"""
+Refresh theo trang đang hiện.
+
+FinanceApp giữ mọi trang sống trong QStackedLayout; nếu trang nào cũng refresh ngay khi
+DataManager bắn thay đổi thì sửa 1 giao dịch sẽ vẽ lại cả 5 trang dù chỉ 1 trang đang hiện.
+`connect_when_visible(page, signal, slot)`:
+  - Trang đang hiện -> gọi slot ngay như connect thường.
+  - Trang đang ẩn -> chỉ đánh dấu "bẩn" và gom các Change lại; lần tới trang được hiện
+    (QStackedLayout chuyển sang, dialog mở lại...) mới gọi slot đúng 1 lần với các Change đã gom.
+"""
+import inspect
+
+from PyQt6.QtCore import QEvent, QObject
+
+from core.change_feed import Change
+
+# Gom quá nhiều Change khi trang ẩn lâu -> đổi thành 1 reload của các miền đó (giới hạn RAM)
+MAX_PENDING_CHANGES = 256
+
+
+def _takes_changes(slot) -> bool:
+    """Slot có nhận tham số (list[Change]) không; refresh() không tham số thì gọi không truyền gì"""
+    try:
+        return bool(inspect.signature(slot).parameters)
+    except (TypeError, ValueError):
+        return True
+
+
+class _VisibleGate(QObject):
+    def __init__(self, page, slot):
+        super().__init__(page)
+        self._page = page
+        self._slot = slot
+        self._with_changes = _takes_changes(slot)
+        self._pending = None          # None = sạch; list = bẩn, chờ hiện
+        page.installEventFilter(self)
+
+    @property
+    def dirty(self) -> bool:
+        return self._pending is not None
+
+    def on_changes(self, changes=None):
+        changes = list(changes or [Change.reload()])
+        if self._page.isVisible():
+            self._call(changes)
+            return
+        if self._pending is None:
+            self._pending = []
+        self._pending.extend(changes)
+        if len(self._pending) > MAX_PENDING_CHANGES:
+            kinds = {c.kind for c in self._pending}
+            self._pending = [Change.reload(k) for k in kinds]
+
+    def eventFilter(self, obj, event):
+        if obj is self._page and event.type() == QEvent.Type.Show and self._pending is not None:
+            changes, self._pending = self._pending, None
+            self._call(changes)
+        return False
+
+    def _call(self, changes):
+        if self._with_changes:
+            self._slot(changes)
+        else:
+            self._slot()
+
+
+def connect_when_visible(page, signal, slot) -> _VisibleGate:
+    """Nối `signal` (list[Change]) vào `slot` của `page`, hoãn tới khi page hiện. Trả về gate (xem .dirty)."""
+    gate = _VisibleGate(page, slot)
+    signal.connect(gate.on_changes)
+    return gate
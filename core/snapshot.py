@@ -0,0 +1,32 @@
+"""
+Ảnh chụp dữ liệu bất biến cho phân tích chạy nền.
+
+`DataManager.snapshot()` trả về 1 `DataSnapshot` gắn với version hiện tại của các Engine:
+  - rows: id -> FrozenTransaction (MappingProxyType copy-on-write của TransactionEngine,
+    các dòng dùng chung giữa các snapshot, Engine sửa tiếp cũng không làm đổi snapshot đã phát).
+  - rollup: bản sao cube tổng hợp; debts / funds / goals: tuple bản sao.
+  - `snapshot(transactions=False)`: rows / rollup = None, chỉ có phần nợ / quỹ (rẻ, không chạm sổ giao dịch).
+Dữ liệu chưa đổi thì gọi lại nhận đúng object cũ (không tốn gì). Snapshot chỉ để đọc nên
+truyền sang QThread / worker bất kỳ mà không cần khóa.
+"""
+from dataclasses import dataclass
+from functools import cached_property
+from typing import Mapping, Optional, Tuple
+
+
+@dataclass(frozen=True, eq=False)
+class DataSnapshot:
+    versions: Mapping[str, int]
+    rows: Optional[Mapping]    # id -> FrozenTransaction (None: snapshot không gồm giao dịch)
+    rollup: Optional[object]   # RollupCube (bản sao riêng của snapshot)
+    debts: Tuple = ()
+    funds: Tuple = ()
+    goals: Tuple = ()
+
+    @cached_property
+    def transactions(self) -> Tuple:
+        """Các giao dịch theo thứ tự trong sổ (dựng lười ở thread đọc)"""
+        return tuple(self.rows.values()) if self.rows is not None else ()
+
+    def __len__(self):
+        return len(self.rows) if self.rows is not None else 0
@@ -0,0 +1,59 @@
+"""
+Undo theo từng object cho unit-of-work (DataManager.transaction) của các Engine lưu dạng list.
+
+Thay vì chụp bản sao sâu cả list ở begin(), Engine gọi `remember(items, key)` trước lần
+đầu thêm / sửa / xóa 1 object trong khối: chỉ object đó được chụp (kèm vị trí trong list).
+Object bị UI sửa tại chỗ trước khi gọi Engine thì truyền `before` (bản chụp trước khi sửa).
+rollback: gỡ mọi object đã đụng tới rồi chèn lại bản chụp đúng vị trí cũ -> list y như lúc begin().
+Vị trí lưu luôn là vị trí lúc begin() (kể cả khi trong khối đã có object đứng trước bị xóa).
+"""
+import copy
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+class UndoLog:
+    def __init__(self, key: Callable[[Any], Any] = lambda x: x.id):
+        self._key = key
+        self._saved: Dict[Any, Tuple[int, Optional[Any]]] = {}   # key -> (vị trí, bản sao | None = chưa tồn tại)
+
+    def __len__(self):
+        return len(self._saved)
+
+    def remember(self, items: List, key, before=None):
+        """Chụp object `key` (chỉ lần đầu trong khối). O(n) để tìm vị trí, không chép gì khác."""
+        if key in self._saved:
+            return
+        seen = set()
+        for i, x in enumerate(items):
+            k = self._key(x)
+            if k == key:
+                self._saved[key] = (self._original_index(i, seen), copy.deepcopy(before if before is not None else x))
+                return
+            seen.add(k)
+        self._saved[key] = (len(items), None)
+
+    def _original_index(self, i: int, seen) -> int:
+        """
+        Vị trí lúc bắt đầu khối của object đang ở vị trí i (object chưa bị đụng tới).
+        Phía trước nó chỉ có object gốc (thêm mới luôn nằm cuối list); các object đã chụp mà không còn
+        đứng trước nó (đã xóa / xóa rồi thêm lại ở cuối) thì cộng lại vị trí gốc của chúng.
+        """
+        gone = sorted(idx for k, (idx, old) in self._saved.items() if old is not None and k not in seen)
+        for idx in gone:
+            if idx > i:
+                break
+            i += 1
+        return i
+
+    def restore(self, items: List) -> bool:
+        """Trả `items` (sửa tại chỗ) về lúc bắt đầu. True nếu có object cần hoàn tác."""
+        if not self._saved:
+            return False
+        # Engine chỉ append / thay tại chỗ / lọc bỏ -> các object không bị đụng giữ nguyên thứ tự
+        result = [x for x in items if self._key(x) not in self._saved]
+        for i, old in sorted(((i, old) for i, old in self._saved.values() if old is not None),
+                             key=lambda p: p[0]):
+            result.insert(i, old)
+        items[:] = result
+        self._saved = {}
+        return True
@@ -0,0 +1,172 @@
+"""
+Dịch vụ ghi trễ (write-behind) dùng chung cho mọi Engine.
+
+Engine không ghi file ngay trên GUI thread nữa mà gọi `mark_dirty(key, snapshot, path, encode)`:
+  - Nhiều thay đổi liên tiếp trong cửa sổ DELAY được gộp thành 1 lần ghi
+    (vd: tick 10 todo liền nhau -> ghi todos.json đúng 1 lần).
+  - Việc encode (json.dumps...) + ghi file chạy trên 1 thread nền, ghi nguyên tử (file .tmp + os.replace).
+  - flush() ghi ngay mọi thứ còn treo (gọi khi đóng FinanceApp, trước khi backup...).
+  - hold()/release() bao 1 unit-of-work: thread nền không ghi, flush() gọi giữa chừng cũng được
+    hoãn tới release() cuối cùng -> không bao giờ ghi ra trạng thái mới áp dụng 1 nửa.
+
+`snapshot()` chạy ngay trên thread gọi mark_dirty (GUI thread, trong khóa hàng đợi) và trả về
+bản sao độc lập của dữ liệu (list/dict thuần). Thread nền chỉ encode bản sao đó -> không bao giờ
+đọc object đang bị GUI sửa dở (file ghi ra luôn là 1 trạng thái trọn vẹn). Lần mark_dirty sau thay
+bản sao cũ nên bản cuối cùng trên đĩa luôn là trạng thái mới nhất.
+"""
+import atexit
+import os
+import pathlib
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple, Union
+
+# Chờ thêm thay đổi trong khoảng này trước khi ghi (giây)
+DELAY = 0.5
+# Sửa liên tục cũng không được để dữ liệu nằm trong RAM quá lâu
+MAX_DELAY = 3.0
+
+Encoder = Callable[[Any], Union[str, bytes]]
+
+
+def atomic_write(path: pathlib.Path, data: Union[str, bytes]):
+    """Ghi ra file tạm rồi os.replace -> không bao giờ để lại file ghi dở"""
+    path = pathlib.Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+class WriteBehind:
+    _instance = None
+
+    @classmethod
+    def instance(cls) -> "WriteBehind":
+        if cls._instance is None:
+            cls._instance = cls()
+            atexit.register(cls._instance.flush)
+        return cls._instance
+
+    def __init__(self, delay: float = DELAY, max_delay: float = MAX_DELAY):
+        self.delay = delay
+        self.max_delay = max_delay
+        # key -> (bản sao dữ liệu, encode, path hoặc hàm ghi, hạn ghi, lần đánh dấu đầu tiên)
+        self._pending: Dict[str, Tuple[Any, Optional[Encoder], object, float, float]] = {}
+        self._cond = threading.Condition()
+        self._io_lock = threading.Lock()     # 1 lần ghi tại 1 thời điểm (thread nền hoặc flush)
+        self._thread: Optional[threading.Thread] = None
+        self._holds = 0                       # > 0: đang trong unit-of-work, chưa được ghi gì
+        self._deferred: Optional[set] = None  # flush() gọi trong lúc hold: {key | None = tất cả}
+        self.writes = 0                       # Đếm số lần ghi thật (để theo dõi hiệu quả gộp)
+
+    # ==========================
+    # API
+    # ==========================
+    def mark_dirty(self, key: str, snapshot: Callable[[], Any], target, encode: Optional[Encoder] = None):
+        """
+        Đánh dấu `key` cần ghi. snapshot() được gọi ngay tại đây (thread gọi) và phải trả về bản sao
+        không dùng chung object với Engine; encode(bản sao) chạy ở thread nền (None = bản sao đã là str/bytes).
+        `target` là đường dẫn file (ghi nguyên tử) hoặc 1 hàm tự ghi (vd: backend.save_all) nhận kết quả encode.
+        """
+        now = time.monotonic()
+        with self._cond:
+            data = snapshot()
+            old = self._pending.get(key)
+            first = old[4] if old else now
+            due = min(now + self.delay, first + self.max_delay)
+            self._pending[key] = (data, encode, target, due, first)
+            self._ensure_thread()
+            self._cond.notify()
+
+    def flush(self, key: Optional[str] = None):
+        """
+        Ghi ngay (đồng bộ) mọi thứ đang treo, hoặc chỉ `key`.
+        Đang hold() (giữa 1 unit-of-work) -> chỉ ghi nhận, release() cuối cùng sẽ flush thay.
+        """
+        # Lấy khỏi hàng đợi và ghi trong cùng _io_lock: không lần ghi nào (nền hay flush)
+        # có thể chen vào giữa rồi bị bản cũ hơn đè lên
+        with self._io_lock:
+            with self._cond:
+                if self._holds:
+                    if self._deferred is None:
+                        self._deferred = set()
+                    self._deferred.add(key)
+                    return
+                items = self._take(None if key is None else [key])
+            for k, (data, encode, target, _, _) in items:
+                self._write(k, data, encode, target)
+
+    def hold(self):
+        """Tạm giữ mọi lần ghi (lồng được) -> các file của 1 unit-of-work được ghi cùng lúc sau release()"""
+        with self._cond:
+            self._holds += 1
+
+    def release(self):
+        with self._cond:
+            self._holds = max(0, self._holds - 1)
+            deferred = None
+            if not self._holds:
+                deferred, self._deferred = self._deferred, None
+            self._cond.notify()
+        if deferred:
+            if None in deferred:
+                self.flush()
+            else:
+                for key in deferred:
+                    self.flush(key)
+
+    def is_dirty(self, key: Optional[str] = None) -> bool:
+        with self._cond:
+            return bool(self._pending) if key is None else key in self._pending
+
+    # ==========================
+    # THREAD NỀN
+    # ==========================
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+            self._thread.start()
+
+    def _take(self, keys=None):
+        """Gỡ các mục khỏi hàng đợi (gọi khi giữ _cond); keys=None -> tất cả"""
+        if keys is None:
+            keys = list(self._pending)
+        return [(k, self._pending.pop(k)) for k in keys if k in self._pending]
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending or self._holds:
+                    self._cond.wait()
+                now = time.monotonic()
+                due = min(item[3] for item in self._pending.values())
+                if due > now:
+                    self._cond.wait(due - now)
+                    continue
+            # Thứ tự khóa giống flush(): _io_lock rồi mới _cond. Chọn lại mục đến hạn sau khi có
+            # _io_lock vì flush() có thể vừa ghi xong / hold() vừa bắt đầu trong lúc chờ.
+            with self._io_lock:
+                with self._cond:
+                    if self._holds:
+                        continue
+                    now = time.monotonic()
+                    # Gỡ khỏi hàng đợi TRƯỚC khi ghi: thay đổi mới trong lúc ghi sẽ được xếp lại
+                    ready = self._take([k for k, v in self._pending.items() if v[3] <= now])
+                for k, (data, encode, target, _, _) in ready:
+                    self._write(k, data, encode, target)
+
+    def _write(self, key: str, data, encode: Optional[Encoder], target):
+        try:
+            if encode is not None:
+                data = encode(data)
+            if callable(target):
+                target(data)
+            else:
+                atomic_write(target, data)
+            self.writes += 1
+        except Exception as e:
+            print(f"❌ WriteBehind: lỗi ghi {key}: {e}")
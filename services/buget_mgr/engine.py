@@ -1,9 +1,12 @@
+import copy
 import json
 import pathlib
 import uuid
-from typing import List, Optional, Dict, Any
+from typing import Iterable, List, Optional, Dict, Any
 
 from models._budget import Fund, Goal
+from core.write_behind import WriteBehind
+from core.undo import UndoLog
 
 
 # ĐỊNH NGHĨA ĐƯỜNG DẪN FILE
@@ -16,6 +19,10 @@ class BudgetEngine:
     def __init__(self):
         self.funds: List[Fund] = []
         self.goals: List[Goal] = []
+        # Undo theo từng quỹ trong unit-of-work: (quỹ cá nhân, quỹ nhóm), None = không trong khối
+        self._undo: Optional[tuple] = None
+        # Tăng mỗi lần quỹ / quỹ nhóm đổi -> DataManager cache số liệu theo version
+        self.version = 0
         
         # Đảm bảo thư mục data tồn tại
         if not (BASE_DIR / "data").exists():
@@ -29,14 +36,43 @@ class BudgetEngine:
     # ======================================================
     def load(self):
         """Đọc dữ liệu từ file JSON lên RAM"""
+        self.version += 1
         self._load_funds()
         self._load_goals()
 
     def save(self):
-        """Lưu toàn bộ dữ liệu từ RAM xuống file JSON"""
+        """Lưu toàn bộ dữ liệu từ RAM xuống file JSON (ghi trễ, xem WriteBehind)"""
         self._save_funds()
         self._save_goals()
 
+    def flush(self):
+        """Ghi ngay nếu còn thay đổi chưa xuống đĩa"""
+        WriteBehind.instance().flush(str(FILE_FUNDS))
+        WriteBehind.instance().flush(str(FILE_GOALS))
+
+    # --- UNIT OF WORK (DataManager.transaction) ---
+    def begin(self):
+        # Chỉ quỹ nào bị đụng tới mới được chụp (xem _remember); id so dạng chuỗi như các hàm CRUD
+        self._undo = (UndoLog(lambda f: str(f.id)), UndoLog(lambda g: str(g.id)))
+
+    def commit(self):
+        self._undo = None
+
+    def rollback(self):
+        undo, self._undo = self._undo, None
+        if undo is None:
+            return
+        # Sửa tại chỗ theo slice: các màn hình đang giữ tham chiếu tới list (DataManager.funds) vẫn đúng
+        if undo[0].restore(self.funds):
+            self._save_funds()
+        if undo[1].restore(self.goals):
+            self._save_goals()
+
+    def _remember(self, items: List, item_id, before=None):
+        """Trong unit-of-work: chụp quỹ trước lần sửa đầu tiên (quỹ bị sửa tại chỗ thì truyền `before`)"""
+        if self._undo is not None:
+            self._undo[0 if items is self.funds else 1].remember(items, str(item_id), before)
+
     # --- PRIVATE HELPERS CHO FUNDS ---
     def _load_funds(self):
         self.funds = []
@@ -55,13 +91,20 @@ class BudgetEngine:
                 print(f"❌ Lỗi load Funds: {e}")
 
     def _save_funds(self):
-        try:
-            # Ưu tiên dùng to_dict(), fallback về __dict__
-            data = [f.to_dict() if hasattr(f, "to_dict") else f.__dict__ for f in self.funds]
-            FILE_FUNDS.write_text(json.dumps(data, ensure_ascii=False, indent=4), encoding='utf-8')
-            # print("💾 Saved Funds.")
-        except Exception as e:
-            print(f"❌ Lỗi save Funds: {e}")
+        # Chỉ đánh dấu: WriteBehind gộp các lần sửa liên tiếp rồi ghi ở thread nền
+        self.version += 1
+        WriteBehind.instance().mark_dirty(str(FILE_FUNDS), lambda: self._snapshot(self.funds), FILE_FUNDS,
+                                          self._encode)
+
+    @staticmethod
+    def _snapshot(items: List) -> List[Dict]:
+        # Ưu tiên dùng to_dict(), fallback về __dict__. to_dict() trả về chính __dict__ (history là list sống)
+        # -> chép sâu ngay trên GUI thread, thread nền chỉ encode bản sao
+        return copy.deepcopy([x.to_dict() if hasattr(x, "to_dict") else x.__dict__ for x in items])
+
+    @staticmethod
+    def _encode(data: List[Dict]) -> str:
+        return json.dumps(data, ensure_ascii=False, indent=4)
 
     # --- PRIVATE HELPERS CHO GOALS ---
     def _load_goals(self):
@@ -79,11 +122,9 @@ class BudgetEngine:
                 print(f"❌ Lỗi load Goals: {e}")
 
     def _save_goals(self):
-        try:
-            data = [g.to_dict() if hasattr(g, "to_dict") else g.__dict__ for g in self.goals]
-            FILE_GOALS.write_text(json.dumps(data, ensure_ascii=False, indent=4), encoding='utf-8')
-        except Exception as e:
-            print(f"❌ Lỗi save Goals: {e}")
+        self.version += 1
+        WriteBehind.instance().mark_dirty(str(FILE_GOALS), lambda: self._snapshot(self.goals), FILE_GOALS,
+                                          self._encode)
 
     # ======================================================
     # 2. PUBLIC API - GIAO TIẾP VỚI DATA MANAGER
@@ -134,11 +175,13 @@ class BudgetEngine:
         # Nếu chưa có ID, tự tạo UUID
         if not fund.id: 
             fund.id = str(uuid.uuid4())
+        self._remember(self.funds, fund.id)
         self.funds.append(fund)
         self._save_funds()
         print(f"✅ Đã thêm quỹ: {fund.name}")
 
-    def update_fund(self, updated_fund: Fund):
+    def update_fund(self, updated_fund: Fund, before: Optional[Fund] = None):
+        self._remember(self.funds, updated_fund.id, before)
         for i, f in enumerate(self.funds):
             if str(f.id) == str(updated_fund.id):
                 self.funds[i] = updated_fund
@@ -147,6 +190,7 @@ class BudgetEngine:
         print(f"❌ Update thất bại: Không tìm thấy Fund {updated_fund.id}")
 
     def delete_fund(self, fund_id: str):
+        self._remember(self.funds, fund_id)
         original_len = len(self.funds)
         self.funds = [f for f in self.funds if str(f.id) != str(fund_id)]
         if len(self.funds) < original_len:
@@ -156,10 +200,12 @@ class BudgetEngine:
     # --- GOALS (Tương tự) ---
     def add_goal(self, goal: Goal):
         if not goal.id: goal.id = str(uuid.uuid4())
+        self._remember(self.goals, goal.id)
         self.goals.append(goal)
         self._save_goals()
 
-    def update_goal(self, updated_goal: Goal):
+    def update_goal(self, updated_goal: Goal, before: Optional[Goal] = None):
+        self._remember(self.goals, updated_goal.id, before)
         for i, g in enumerate(self.goals):
             if str(g.id) == str(updated_goal.id):
                 self.goals[i] = updated_goal
@@ -167,5 +213,75 @@ class BudgetEngine:
                 return
 
     def delete_goal(self, goal_id: str):
+        self._remember(self.goals, goal_id)
         self.goals = [g for g in self.goals if str(g.id) != str(goal_id)]
-        self._save_goals()
\ No newline at end of file
+        self._save_goals()
+
+    # ======================================================
+    # 4. BULK METHODS (HÀNG LOẠT: MỖI FILE CHỈ GHI 1 LẦN)
+    # ======================================================
+    def _replace_by_id(self, items: List, updates: Iterable, before: Dict[str, Any]) -> List:
+        """Thay phần tử cùng id, O(n + m). Trả về các phần tử đã thay."""
+        pos = {str(x.id): i for i, x in enumerate(items)}
+        replaced = []
+        for u in updates:
+            i = pos.get(str(u.id))
+            if i is None:
+                print(f"❌ Update thất bại: Không tìm thấy ID {u.id}")
+                continue
+            self._remember(items, u.id, before.get(str(u.id)))
+            items[i] = u
+            replaced.append(u)
+        return replaced
+
+    def add_many(self, funds: Iterable[Fund] = (), goals: Iterable[Goal] = ()) -> int:
+        """Thêm nhiều quỹ cá nhân / quỹ nhóm. Trả về số mục đã thêm."""
+        funds, goals = list(funds), list(goals)
+        for item in funds + goals:
+            if not item.id:
+                item.id = str(uuid.uuid4())
+        for f in funds:
+            self._remember(self.funds, f.id)
+        for g in goals:
+            self._remember(self.goals, g.id)
+        if funds:
+            self.funds.extend(funds)
+            self._save_funds()
+        if goals:
+            self.goals.extend(goals)
+            self._save_goals()
+        return len(funds) + len(goals)
+
+    def update_many(self, funds: Iterable[Fund] = (), goals: Iterable[Goal] = (),
+                    before: Optional[Dict[str, Any]] = None) -> int:
+        """before: {str(id): bản chụp trước khi sửa} cho các quỹ bị sửa tại chỗ (dùng cho rollback)"""
+        before = before or {}
+        n_funds = len(self._replace_by_id(self.funds, funds, before))
+        n_goals = len(self._replace_by_id(self.goals, goals, before))
+        if n_funds:
+            self._save_funds()
+        if n_goals:
+            self._save_goals()
+        return n_funds + n_goals
+
+    def delete_many(self, fund_ids: Iterable[str] = (), goal_ids: Iterable[str] = ()) -> int:
+        fund_ids = {str(i) for i in fund_ids}
+        goal_ids = {str(i) for i in goal_ids}
+        removed = 0
+        for fid in fund_ids:
+            self._remember(self.funds, fid)
+        for gid in goal_ids:
+            self._remember(self.goals, gid)
+        if fund_ids:
+            before = len(self.funds)
+            self.funds = [f for f in self.funds if str(f.id) not in fund_ids]
+            if len(self.funds) < before:
+                removed += before - len(self.funds)
+                self._save_funds()
+        if goal_ids:
+            before = len(self.goals)
+            self.goals = [g for g in self.goals if str(g.id) not in goal_ids]
+            if len(self.goals) < before:
+                removed += before - len(self.goals)
+                self._save_goals()
+        return removed
@@ -12,6 +12,7 @@ from PyQt6.QtGui import *
 from models._tran import Transaction
 from models._budget import Goal # Import model Goal
 from core.data_manager import DataManager
+from core.change_feed import detach
 # ======================
 # 1. CẤU HÌNH THEME
 # ======================
@@ -436,8 +437,7 @@ class GroupFundMgr(QMainWindow):
         g2 = Goal(name="Quỹ Ăn Uống", target=5000)
         
         # Gọi hàm save của DataManager
-        self.data_mgr.add_goal(g1)
-        self.data_mgr.add_goal(g2)
+        self.data_mgr.add_goals([g1, g2])
 
 
 
@@ -660,6 +660,7 @@ class GroupFundMgr(QMainWindow):
         
         # Lấy object hiện tại
         goal = self.goals[self.current_goal_index]
+        before = detach(goal)   # Bản cũ cho change feed (object bị sửa tại chỗ ngay dưới)
         
         # Cập nhật thuộc tính object
         goal.name = self.ed_name.text()
@@ -667,7 +668,7 @@ class GroupFundMgr(QMainWindow):
         except: pass
         
         # --- QUAN TRỌNG: GỌI UPDATE ĐỂ LƯU XUỐNG Ổ CỨNG ---
-        self.data_mgr.update_goal(goal)
+        self.data_mgr.update_goal(goal, before)
         # --------------------------------------------------
         
         self.update_detail_stats()
@@ -691,10 +692,11 @@ class GroupFundMgr(QMainWindow):
         
         # 2. Cập nhật vào Object Goal
         goal = self.goals[self.current_goal_index]
+        before = detach(goal)
         goal.members = m_data
         
         # 3. GỌI DATA MANAGER ĐỂ LƯU JSON
-        self.data_mgr.update_goal(goal)
+        self.data_mgr.update_goal(goal, before)
 
     def back_to_dashboard(self):
         self.save_current_scene() # Save positions & data
@@ -868,20 +870,13 @@ class GroupFundMgr(QMainWindow):
 
                 # --- XỬ LÝ LOGIC ---
                 
-                # 1. Nếu chọn Ghi đè -> Xóa sạch dữ liệu cũ trong Engine
-                if msg.clickedButton() == btn_replace:
-                    # Copy list ID ra để xóa (tránh lỗi xóa khi đang duyệt)
-                    ids_to_remove = [g.id for g in self.data_mgr.goals]
-                    for gid in ids_to_remove:
-                        self.data_mgr.delete_goal(gid)
-
-                # 2. DUYỆT TỪNG ITEM VÀ THÊM VÀO (QUAN TRỌNG)
-                count = 0
+                # 1. DUYỆT TỪNG ITEM, GOM LẠI RỒI THÊM 1 LẦN (QUAN TRỌNG)
+                new_goals = []
+                valid_keys = Goal.__init__.__code__.co_varnames
                 for item_dict in imported_list_dicts:
                     try:
                         # FIX LỖI "AttributeError": Convert Dict -> Object Goal
                         # Lọc các trường hợp lệ để tránh lỗi key lạ
-                        valid_keys = Goal.__init__.__code__.co_varnames
                         clean_data = {k: v for k, v in item_dict.items() if k in valid_keys}
                         
                         new_goal_obj = Goal(**clean_data)
@@ -895,14 +890,20 @@ class GroupFundMgr(QMainWindow):
                         import uuid
                         new_goal_obj.id = str(uuid.uuid4())
 
-                        # GỌI DATA MANAGER ĐỂ LƯU VÀO DATABASE CHÍNH
-                        self.data_mgr.add_goal(new_goal_obj)
-                        count += 1
+                        new_goals.append(new_goal_obj)
                         
                     except Exception as e:
                         print(f"⚠️ Bỏ qua 1 mục lỗi: {e}")
 
-                # 3. Refresh UI
+                # GỌI DATA MANAGER ĐỂ LƯU VÀO DATABASE CHÍNH
+                # Ghi đè = xóa + thêm trong 1 unit-of-work: ghi file 1 lần, UI refresh 1 lần
+                with self.data_mgr.transaction():
+                    if msg.clickedButton() == btn_replace:
+                        self.data_mgr.delete_goals([g.id for g in self.data_mgr.goals])
+                    self.data_mgr.add_goals(new_goals)
+                count = len(new_goals)
+
+                # 2. Refresh UI
                 self.refresh_dashboard()
                 QMessageBox.information(self, "Thành công", f"Đã nhập {count} quỹ vào hệ thống!")
 
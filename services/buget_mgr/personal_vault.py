@@ -12,7 +12,9 @@ from PyQt6.QtGui import *
 
 from models._tran import Transaction  # hoặc đường dẫn đúng
 from datetime import date
-from core.data_manager import DataManager 
+from core.data_manager import DataManager
+from core.page_refresh import connect_when_visible
+from core.change_feed import detach
 
 # --- CẤU HÌNH ---
 DATA_FILE = Path("budget_data.json")
@@ -306,6 +308,7 @@ class FundDetailDialog(QDialog):
     # --- LOGIC SỬA / XÓA (MỚI) ---
     def edit_fund(self):
         """Hàm chỉnh sửa: Tên, Mục tiêu và Icon"""
+        before = detach(self.fund)   # Bản cũ cho change feed (các bước dưới sửa tại chỗ)
         
         # 1. Sửa Tên
         new_name, ok = QInputDialog.getText(self, "Sửa tên", "Tên hũ:", text=self.fund.name)
@@ -330,7 +333,7 @@ class FundDetailDialog(QDialog):
             self.fund.icon = icon_dlg.get_icon()
 
         # 4. Lưu xuống DataManager
-        self.data_mgr.update_fund(self.fund)
+        self.data_mgr.update_fund(self.fund, before)
 
         # 5. Cập nhật UI ngay lập tức
         self.lbl_name.setText(self.fund.name)
@@ -465,7 +468,7 @@ class BudgetApp(QMainWindow):
         
         # self.init_data()
         self.data_mgr = DataManager.instance()
-        self.data_mgr.data_changed.connect(self.on_data_changed)
+        connect_when_visible(self, self.data_mgr.funds_changed, self.on_data_changed)
         self.refresh_funds_list()
         self.init_ui()
         self.overlay = Overlay(self.centralWidget())
@@ -620,7 +623,7 @@ class BudgetApp(QMainWindow):
             # Hãy để DataManager làm việc đó để đảm bảo đồng bộ
             self.data_mgr.add_fund(new_fund)
             
-            # UI sẽ tự cập nhật nhờ signal data_changed, 
+            # UI sẽ tự cập nhật nhờ signal funds_changed, 
             # nhưng gọi thêm render_cards() để phản hồi tức thì cho mượt
             self.render_cards()
 
@@ -10,7 +10,9 @@ from PyQt6.QtCore import *
 from PyQt6.QtGui import *
 
 # --- IMPORT CORE ---
-from core.data_manager import DataManager 
+from core.data_manager import DataManager
+from core.change_feed import DOMAIN_CALENDAR, DOMAIN_DEBTS, DOMAIN_TRANSACTIONS, changed_dates
+from core.page_refresh import connect_when_visible
 
 # --- 1. THƯ VIỆN BỔ TRỢ ---
 try:
@@ -223,6 +225,7 @@ class CalendarCell(QFrame):
         if data.get('has_event'): top.addWidget(self.dot("#1976D2", "Google"))
         if data.get('has_trans'): top.addWidget(self.dot("#9C27B0", "TC"))
         if data.get('has_debt'): top.addWidget(self.dot("#E64A19", "Nợ"))
+        if data.get('has_recurring'): top.addWidget(self.dot("#00897B", "Định kỳ"))
         top.addStretch(); lay.addLayout(top)
         
         mid = QHBoxLayout(); mid.setSpacing(1)
@@ -282,9 +285,9 @@ class CalendarMgr(QMainWindow):
         
         # --- KẾT NỐI DATA MANAGER ---
         self.data_mgr = DataManager.instance()
-        # Khi DataManager báo có thay đổi (từ bất kỳ đâu), reload lịch và chi tiết
-        self.data_mgr.data_changed.connect(self.reload_calendar)
-        self.data_mgr.data_changed.connect(lambda: self.load_details(self.sel_date))
+        # Chỉ nghe giao dịch / nợ / todo-note (quỹ không hiện trên lịch), vẽ lại đúng các ngày bị đổi
+        # Trang đang ẩn thì gom lại, vẽ khi được hiện
+        connect_when_visible(self, self.data_mgr.changes, self.on_changes)
         
         self.google_svc = GoogleService()
         self.curr_date = datetime.date.today().replace(day=1)
@@ -368,33 +371,65 @@ class CalendarMgr(QMainWindow):
             self.grid.addWidget(l, 0, i)
             
         # DATA SOURCES (Lấy từ Data Manager)
-        trans_dates = {t.date for t in self.data_mgr.transactions}
-        debt_dates = {d.due_date for d in self.data_mgr.debts if hasattr(d,'due_date')}
-        
         first = self.curr_date.replace(day=1); start_w = first.weekday()
         days_n = (first.replace(month=first.month%12+1, day=1) - datetime.timedelta(days=1)).day
-        r, c = 1, start_w; today = datetime.date.today()
+        sources = self._month_sources(first.isoformat(), first.replace(day=days_n).isoformat())
+        r, c = 1, start_w
         
         for d in range(1, days_n+1):
-            dt = datetime.date(self.curr_date.year, self.curr_date.month, d); s_dt = dt.isoformat()
-            
-            # [REFACTORED] Kiểm tra dữ liệu qua Data Manager
-            check = self.data_mgr.check_has_data(s_dt)
-            
-            data = {
-                'has_note': check['has_note'],
-                'has_todo': check['has_todo'],
-                'has_event': s_dt in self.google_cache,
-                'has_trans': s_dt in trans_dates,
-                'has_debt': s_dt in debt_dates,
-                'lunar': get_lunar_string(dt)
-            }
-            cell = CalendarCell(dt, data, THEMES[self.current_theme], is_today=(dt == today))
-            cell.clicked.connect(self.load_details); 
-            if s_dt == self.sel_date: cell.set_selected(True)
+            dt = datetime.date(self.curr_date.year, self.curr_date.month, d)
+            cell = self._make_cell(dt, sources)
             self.grid.addWidget(cell, r, c); self.cells.append(cell)
             c += 1; 
             if c > 6: c = 0; r += 1
+
+    def _month_sources(self, date_from, date_to):
+        """(ngày có giao dịch, ngày có định kỳ, ngày đáo hạn nợ) trong [date_from, date_to]"""
+        # Ngày ISO so sánh được như chuỗi -> lấy cả khoảng bằng 1 range
+        trans_dates = {t.date for t in self.data_mgr.query_transactions(date_from=date_from, date_to=date_to)}
+        recurring_dates = {o.date for o in self.data_mgr.get_recurring_occurrences(date_from, date_to)}
+        debt_dates = {d.due_date for d in self.data_mgr.debts if hasattr(d,'due_date')}
+        return trans_dates, recurring_dates, debt_dates
+
+    def _make_cell(self, dt, sources):
+        trans_dates, recurring_dates, debt_dates = sources
+        s_dt = dt.isoformat()
+        # [REFACTORED] Kiểm tra dữ liệu qua Data Manager
+        check = self.data_mgr.check_has_data(s_dt)
+        data = {
+            'has_note': check['has_note'],
+            'has_todo': check['has_todo'],
+            'has_event': s_dt in self.google_cache,
+            'has_trans': s_dt in trans_dates,
+            'has_debt': s_dt in debt_dates,
+            'has_recurring': s_dt in recurring_dates,
+            'lunar': get_lunar_string(dt)
+        }
+        cell = CalendarCell(dt, data, THEMES[self.current_theme], is_today=(dt == datetime.date.today()))
+        cell.clicked.connect(self.load_details)
+        if s_dt == self.sel_date: cell.set_selected(True)
+        return cell
+
+    def on_changes(self, changes):
+        """Vẽ lại đúng các ô ngày bị ảnh hưởng; không xác định được ngày (import, định kỳ...) -> vẽ lại cả tháng"""
+        changes = [c for c in changes if {DOMAIN_CALENDAR, DOMAIN_DEBTS, DOMAIN_TRANSACTIONS} & set(c.domains)]
+        if not changes:
+            return
+        dates = changed_dates(changes)
+        if dates is None:
+            self.reload_calendar()
+            self.load_details(self.sel_date)
+            return
+        for i, old in enumerate(self.cells):
+            if old.date_str not in dates:
+                continue
+            s_dt = old.date_str
+            row, col, _, _ = self.grid.getItemPosition(self.grid.indexOf(old))
+            cell = self._make_cell(datetime.date.fromisoformat(s_dt), self._month_sources(s_dt, s_dt))
+            old.setParent(None); old.deleteLater()
+            self.grid.addWidget(cell, row, col); self.cells[i] = cell
+        if self.sel_date in dates:
+            self.load_details(self.sel_date)
             
     def load_details(self, date_str):
         self.sel_date = date_str
@@ -408,9 +443,10 @@ class CalendarMgr(QMainWindow):
                 t_str = e.get('start', {}).get('dateTime', 'All')[11:16]
                 self.add_evt(e.get('summary','No Title'), f"Google: {t_str}", "📅", "#1976D2", e.get('id'))
         # 2. Finance
-        for t in self.data_mgr.transactions:
-            if t.date == date_str:
-                self.add_evt(f"{t.category}: {format_money(t.amount)}", t.description or "", "💸" if t.type=="expense" else "💰", "#D32F2F" if t.type=="expense" else "#388E3C")
+        for t in self.data_mgr.query_transactions(date_from=date_str, date_to=date_str):
+            self.add_evt(f"{t.category}: {format_money(t.amount)}", t.description or "", "💸" if t.type=="expense" else "💰", "#D32F2F" if t.type=="expense" else "#388E3C")
+        for o in self.data_mgr.get_recurring_occurrences(date_str, date_str):
+            self.add_evt(f"{o.category}: {format_money(o.amount)}", f"Định kỳ ({o.cycle}) {o.description or ''}", "🔁", "#00897B")
         for d in self.data_mgr.debts:
             if hasattr(d, 'due_date') and d.due_date == date_str:
                 side = getattr(d, 'side', 'unknown')
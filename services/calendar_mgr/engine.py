@@ -1,8 +1,11 @@
 # File: services/calendar_mgr/engine.py
+import copy
 import json
 import pathlib
 import os
 
+from core.write_behind import WriteBehind
+
 class CalendarEngine:
     def __init__(self):
         # Xác định đường dẫn file (từ thư mục gốc project)
@@ -16,10 +19,13 @@ class CalendarEngine:
         
         self.todos_cache = {}
         self.notes_cache = {}
+        # Tăng mỗi lần todo/note đổi -> DataManager cache số liệu theo version
+        self.version = 0
         self.load_data()
 
     def load_data(self):
         """Load dữ liệu từ ổ cứng lên RAM"""
+        self.version += 1
         self.todos_cache = self._read_json(self.todo_file)
         self.notes_cache = self._read_json(self.note_file)
 
@@ -33,8 +39,20 @@ class CalendarEngine:
         return {}
 
     def _save_json(self, data, path):
-        with open(path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
+        """Ghi trễ: tick nhiều todo liên tiếp chỉ ghi file 1 lần (xem WriteBehind)"""
+        self.version += 1
+        # Chép sâu cache ngay trên GUI thread; thread nền chỉ json.dumps bản sao
+        WriteBehind.instance().mark_dirty(
+            str(path),
+            lambda: copy.deepcopy(data),
+            path,
+            lambda snap: json.dumps(snap, indent=2, ensure_ascii=False),
+        )
+
+    def flush(self):
+        """Ghi ngay nếu còn thay đổi chưa xuống đĩa"""
+        WriteBehind.instance().flush(str(self.todo_file))
+        WriteBehind.instance().flush(str(self.note_file))
 
     # --- TODO METHODS ---
     def get_todos(self, date_str):
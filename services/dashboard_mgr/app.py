@@ -482,6 +482,59 @@ class SettingsPage(QWidget):
         idx = self.combo_season.currentIndex()
         self.apply_callback(keys[idx])
 
+class DeferredPage(QStackedWidget):
+    """
+    Khung chờ cho 1 trang: hiện skeleton (vài khối xám + "Đang tải...") cho tới khi các Engine
+    trang cần đã nạp xong ở background, rồi mới dựng trang thật (factory) và chuyển sang.
+    """
+    def __init__(self, factory, needs, title=""):
+        super().__init__()
+        from core.data_manager import DataManager
+        self.factory = factory
+        self.needs = tuple(needs)
+        self.page = None
+        self.data_mgr = DataManager.instance()
+        self.addWidget(self._skeleton(title))
+        if self.data_mgr.is_ready(*self.needs):
+            self._build()
+        else:
+            self.data_mgr.engine_ready.connect(self._on_engine_ready)
+
+    def _skeleton(self, title):
+        box = QWidget()
+        layout = QVBoxLayout(box)
+        layout.setContentsMargins(30, 30, 30, 30)
+        layout.setSpacing(15)
+        lbl = QLabel(f"⏳ {title} - Đang tải dữ liệu..." if title else "⏳ Đang tải dữ liệu...")
+        lbl.setStyleSheet("font-size: 16px; color: gray; font-style: italic;")
+        layout.addWidget(lbl)
+        # Hàng thẻ + bảng giả, cùng bố cục với trang thật để lúc dữ liệu tới không bị "giật"
+        cards = QHBoxLayout()
+        for _ in range(3):
+            card = QFrame()
+            card.setFixedHeight(90)
+            card.setStyleSheet("background-color: rgba(0, 0, 0, 0.06); border-radius: 12px;")
+            cards.addWidget(card)
+        layout.addLayout(cards)
+        for _ in range(6):
+            row = QFrame()
+            row.setFixedHeight(28)
+            row.setStyleSheet("background-color: rgba(0, 0, 0, 0.04); border-radius: 6px;")
+            layout.addWidget(row)
+        layout.addStretch()
+        return box
+
+    def _on_engine_ready(self, name):
+        if self.page is None and self.data_mgr.is_ready(*self.needs):
+            self.data_mgr.engine_ready.disconnect(self._on_engine_ready)
+            self._build()
+
+    def _build(self):
+        self.page = self.factory()
+        self.addWidget(self.page)
+        self.setCurrentWidget(self.page)
+
+
 # --- MAIN APP ---
 class FinanceApp(QMainWindow):
     def __init__(self):
@@ -592,11 +645,12 @@ class FinanceApp(QMainWindow):
         # __all__ = ["CalendarMgr", "DebtManager", "TransactionMgr", "MainDashboard", "FinanceApp"]
         from services import MainDashboard, CalendarMgr, DebtManager, TransactionMgr, BudgetMgr
 
-        self.pages.addWidget(MainDashboard())
-        self.pages.addWidget(TransactionMgr())
-        self.pages.addWidget(DebtManager())
-        self.pages.addWidget(BudgetMgr())
-        self.pages.addWidget(CalendarMgr())
+        # Engine nạp ở background; mỗi trang hiện khung chờ tới khi đủ dữ liệu nó cần
+        self.pages.addWidget(DeferredPage(MainDashboard, ("transactions", "debts", "budget", "calendar"), "Thống Kê"))
+        self.pages.addWidget(DeferredPage(TransactionMgr, ("transactions",), "Thu Chi"))
+        self.pages.addWidget(DeferredPage(DebtManager, ("debts", "transactions"), "Sổ Nợ"))
+        self.pages.addWidget(DeferredPage(BudgetMgr, ("budget", "transactions"), "Ngân Sách"))
+        self.pages.addWidget(DeferredPage(CalendarMgr, ("calendar", "debts", "transactions"), "Lịch"))
 
         # 3 trang đầu demo
         # for name in ["Thống Kê", "Sổ Nợ", "Lịch"]:
@@ -680,6 +734,12 @@ class FinanceApp(QMainWindow):
             new_y = self.height() - 80
             self.bot_btn.move(new_x, new_y)
 
+    def closeEvent(self, event):
+        # Ghi nốt mọi thay đổi còn treo trong WriteBehind trước khi thoát
+        from core.data_manager import DataManager
+        DataManager.instance().flush_all()
+        super().closeEvent(event)
+
     def toggle_sidebar(self):
             # 1. Lấy chiều rộng hiện tại
             width = self.sidebar.width()
@@ -12,7 +12,9 @@ from PyQt6.QtCharts import *
 
 # --- IMPORT CORE CỦA BẠN ---
 # Đảm bảo bạn đã có file core/data_manager.py
-from core.data_manager import DataManager 
+from core.data_manager import DataManager
+from core.change_feed import DOMAIN_CALENDAR, changed_dates
+from core.page_refresh import connect_when_visible
 
 # ======================
 # 1. CẤU HÌNH & PATH
@@ -130,7 +132,9 @@ class MainDashboard(QMainWindow):
         
         # --- KẾT NỐI DATA MANAGER (Của bạn) ---
         self.data_mgr = DataManager.instance()
-        self.data_mgr.data_changed.connect(self.refresh_data)
+        # Đang ẩn (trang khác của FinanceApp) -> chỉ đánh dấu bẩn, refresh khi được hiện
+        connect_when_visible(self, self.data_mgr.changes, self.on_changes)
+        self._upcoming, self._forecast = [], {}
 
         self.current_theme = "spring"
         self.init_ui()
@@ -207,24 +211,38 @@ class MainDashboard(QMainWindow):
         self.bar_view.setStyleSheet("background: transparent;")
         self.refresh_data()
 
+    def on_changes(self, changes):
+        """
+        Chỉ todo/note thay đổi -> không tính lại số liệu, chỉ vẽ lại danh sách việc hôm nay
+        (và bỏ qua luôn nếu không phải ngày hôm nay). Còn lại -> refresh toàn bộ.
+        """
+        if all(c.domains == (DOMAIN_CALENDAR,) for c in changes):
+            dates = changed_dates(changes)
+            today = date.today().isoformat()
+            if dates is not None and today not in dates:
+                return
+            cal = self.data_mgr.calendar_engine
+            self._fill_todo_list(cal.get_todos(today), cal.get_notes(today), self._upcoming, self._forecast)
+            return
+        self.refresh_data()
+
     def refresh_data(self):
         """Cập nhật toàn bộ dữ liệu Dashboard từ DataManager (Singleton)"""
         
         # --- LẤY DỮ LIỆU TỪ DATA MANAGER ---
         data = self.data_mgr.get_dashboard_summary()
         
-        # Trích xuất các chỉ số tài chính
-        inc = data.get("income", 0)
-        exp = data.get("expense", 0)
-        bal = data.get("balance", 0)
-        owe = data.get("debt_owe", 0)
-        recv = data.get("debt_recv", 0)
-        saved = data.get("savings", 0)
-        net_worth = data.get("net_worth", 0)
-        recent = data.get("recent_transactions", [])
         todos_list = data.get("calendar_todos", [])   # ← ĐÃ ĐỔI TÊN
         notes_list = data.get("calendar_notes", [])   # ← MỚI THÊM
+        upcoming = data.get("upcoming_recurring", [])  # Giao dịch định kỳ 30 ngày tới
+        forecast = data.get("forecast", {})
+        # Giữ lại để on_changes vẽ lại danh sách việc mà không phải tính lại cả summary
+        self._upcoming, self._forecast = upcoming, forecast
+
+        self._fill_todo_list(todos_list, notes_list, upcoming, forecast)
+        self._fill_cards_and_charts(data)
 
+    def _fill_todo_list(self, todos_list, notes_list, upcoming, forecast):
         # --- CẬP NHẬT TODO & NOTES (PHÂN TÁCH RÕ RÀNG) ---
         self.list_todo.clear()
         has_todos = len(todos_list) > 0
@@ -274,10 +292,39 @@ class MainDashboard(QMainWindow):
                     widget_item.setFont(QFont("Segoe UI", 10, italic=True))
                     self.list_todo.addItem(widget_item)
 
+        # --- PHẦN 3: GIAO DỊCH ĐỊNH KỲ SẮP TỚI ---
+        if upcoming:
+            if has_todos or has_notes:
+                self.list_todo.addItem(QListWidgetItem(""))
+
+            title_item = QListWidgetItem(
+                f"🔁 ĐỊNH KỲ 30 NGÀY TỚI (Thu: {forecast.get('income', 0):,.0f} | Chi: {forecast.get('expense', 0):,.0f})")
+            title_item.setForeground(QColor("#2c3e50"))
+            title_item.setFont(QFont("Segoe UI", 10, QFont.Weight.Bold))
+            self.list_todo.addItem(title_item)
+
+            for item in upcoming:
+                sign = "+" if item.get("type") == "income" else "-"
+                label = item.get("description") or item.get("category", "")
+                widget_item = QListWidgetItem(f"{item.get('date', '')[5:]}  {label}  {sign}{item.get('amount', 0):,.0f}đ")
+                widget_item.setForeground(QColor("#00897B"))
+                self.list_todo.addItem(widget_item)
+
         # --- TRƯỜNG HỢP KHÔNG CÓ GÌ ---
-        if not has_todos and not has_notes:
+        if not has_todos and not has_notes and not upcoming:
             self.list_todo.addItem(QListWidgetItem("Không có việc hay ghi chú hôm nay!"))
 
+    def _fill_cards_and_charts(self, data):
+        # Trích xuất các chỉ số tài chính
+        inc = data.get("income", 0)
+        exp = data.get("expense", 0)
+        bal = data.get("balance", 0)
+        owe = data.get("debt_owe", 0)
+        recv = data.get("debt_recv", 0)
+        saved = data.get("savings", 0)
+        net_worth = data.get("net_worth", 0)
+        recent = data.get("recent_transactions", [])
+
         # --- CẬP NHẬT CARDS ---
         while self.cards_layout.count():
             child = self.cards_layout.takeAt(0)
@@ -15,6 +15,8 @@ from . import DebtEngine
 from models import Transaction # Import để tạo transaction trả nợ
 from models import Debt
 from core.data_manager import DataManager
+from core.change_feed import Change, KIND_DEBT, detach
+from core.page_refresh import connect_when_visible
 
 from agent import BotChatAgentAPI, LLMWorker
 from style import THEMES, SeasonalOverlay
@@ -229,7 +231,7 @@ class DebtStatsDialog(QDialog):
         
         # --- KẾT NỐI DATA MANAGER ---
         self.data_manager = DataManager.instance()
-        self.data_manager.data_changed.connect(self.populate_data)
+        connect_when_visible(self, self.data_manager.debts_changed, self.populate_data)
         
         # Theme mở rộng
         self.theme = {
@@ -516,8 +518,8 @@ class DebtManager(QMainWindow):
         
         # --- 1. KẾT NỐI DATA MANAGER ---
         self.data_manager = DataManager.instance()
-        # Lắng nghe thay đổi dữ liệu để tự refresh UI
-        self.data_manager.data_changed.connect(self.refresh)
+        # Lắng nghe thay đổi của sổ nợ để tự refresh UI (trang ẩn thì refresh khi được hiện)
+        connect_when_visible(self, self.data_manager.debts_changed, self.refresh)
 
         self.current_theme = "spring"
 
@@ -742,15 +744,18 @@ class DebtManager(QMainWindow):
         )
         if not ok or amount <= 0: return
 
-        # 1. Cập nhật Debt
-        debt.paid_back += amount
-        self.data_manager.update_debt(debt)
+        # Cả 3 bước trong 1 unit-of-work: 1 lần ghi, UI refresh 1 lần, lỗi thì không bước nào được áp dụng
+        with self.data_manager.transaction():
+            # 1. Cập nhật Debt (chụp bản cũ trước khi sửa tại chỗ cho change feed)
+            before = detach(debt)
+            debt.paid_back += amount
+            self.data_manager.update_debt(debt, before)
 
-        # 2. Tự động ghi log vào Transaction (GỌI QUA DATA MANAGER)
-        self._create_repay_transaction(debt, amount)
+            # 2. Tự động ghi log vào Transaction (GỌI QUA DATA MANAGER)
+            self._create_repay_transaction(debt, amount)
 
-        # 3. Ghi log trả nợ riêng (nếu cần)
-        self._log_payment(debt_id, amount)
+            # 3. Ghi log trả nợ riêng (nếu cần)
+            self._log_payment(debt_id, amount)
         
         QMessageBox.information(self, "OK", f"Đã trả {amount:,.0f} đ\nĐã ghi sổ chi tiêu!")
 
@@ -805,7 +810,7 @@ class DebtManager(QMainWindow):
             try:
                 # Gọi Engine thông qua Manager
                 count = self.data_manager.debt_engine.import_csv(path)
-                self.data_manager.notify_change()
+                self.data_manager.notify_change(Change.reload(KIND_DEBT))
                 QMessageBox.information(self, "OK", f"Import thành công {count} khoản nợ!")
             except Exception as e:
                 QMessageBox.critical(self, "Lỗi", str(e))
@@ -892,43 +897,14 @@ class DebtManager(QMainWindow):
 
 
     def _log_payment(self, debt_id: int, amount: float):
-        log = []
-        # Kiểm tra file tồn tại và đọc (Thêm try-except để an toàn hơn)
-        if PAYMENT_LOG.exists():
-            try:
-                log = json.loads(PAYMENT_LOG.read_text(encoding="utf8"))
-            except: 
-                log = [] # Nếu file lỗi thì reset thành list rỗng
-
-        # --- SỬA LỖI TẠI ĐÂY ---
-        # Thay self.engine.get_debts() bằng self.data_manager.debts
         # Thêm default=None để tránh crash nếu không tìm thấy ID
         debt = next((d for d in self.data_manager.debts if d.id == debt_id), None)
-        
         if debt:
-            log.append({
-                "debt_id": debt_id,
-                "counterparty": debt.counterparty,
-                "date": date.today().isoformat(),
-                "amount": amount,
-                "remain": debt.outstanding()
-            })
-            log = log[-20:]  # Giữ 20 dòng gần nhất
-            
-            # Ghi file
-            PAYMENT_LOG.write_text(json.dumps(log, ensure_ascii=False, indent=2), encoding="utf8")
-            
-            # Load lại bảng hiển thị
-            self._load_payment_log()
+            # DebtEngine giữ log trong RAM (20 dòng gần nhất) và ghi file qua WriteBehind
+            self.data_manager.log_debt_payment(debt, amount)
 
     def _load_payment_log(self):
-        if not PAYMENT_LOG.exists():
-            return
-        
-        try:
-            log = json.loads(PAYMENT_LOG.read_text(encoding="utf8"))
-        except:
-            return # File lỗi thì bỏ qua
+        log = self.data_manager.payment_log
 
         self.tab_history.setRowCount(0)
         # Đảo ngược list để hiện cái mới nhất lên đầu (log[::-1])
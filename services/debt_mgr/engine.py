@@ -1,22 +1,33 @@
 import csv
 import json
-import shutil
 import pathlib
-from datetime import datetime
 from dataclasses import asdict
-from typing import List, Dict
+from typing import Iterable, List, Dict, Optional
 
 # Import Model
 from models._debt import Debt
+from core.parallel_csv import parallel_parse, parse_debt_range, should_parallelize
+from core.write_behind import WriteBehind
+from core.backup import BackupStore
+from core.undo import UndoLog
 
 # Đường dẫn mặc định (Để fallback nếu không truyền vào)
 DEFAULT_FILE = pathlib.Path(__file__).parent.parent.parent / "debts.json"
 BACKUP_FOLDER = pathlib.Path(__file__).parent.parent.parent / "backups"
+# Log trả nợ (đường dẫn tương đối như bên debt.py), chỉ giữ N lần gần nhất
+PAYMENT_LOG = pathlib.Path("payment_log.json")
+PAYMENT_LOG_KEEP = 20
 
 class DebtEngine:
-    def __init__(self, file: pathlib.Path = DEFAULT_FILE):
+    def __init__(self, file: pathlib.Path = DEFAULT_FILE, payment_file: pathlib.Path = PAYMENT_LOG):
         self.file = file
+        self.payment_file = payment_file
         self._debts: List[Debt] = []
+        self._payments: Optional[List[Dict]] = None   # Đọc lười ở lần dùng đầu tiên
+        self._undo: Optional[UndoLog] = None          # Undo theo từng khoản nợ trong unit-of-work
+        self._saved_payments = None                   # Log trả nợ lúc trước lần ghi log đầu tiên trong khối
+        # Tăng mỗi lần dữ liệu đổi (nợ hoặc log trả nợ) -> DataManager cache số liệu theo version
+        self.version = 0
         self._load()
 
     def _load(self):
@@ -36,15 +47,48 @@ class DebtEngine:
                 self._debts = []
 
     def _save(self):
-        try:
-            # Tạo thư mục cha nếu chưa có
-            self.file.parent.mkdir(parents=True, exist_ok=True)
-            
-            # Convert Object -> Dict
-            data = [asdict(d) for d in self._debts]
-            self.file.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf8")
-        except Exception as e:
-            print(f"❌ DebtEngine Save Error: {e}")
+        """Đánh dấu cần ghi; WriteBehind gộp các lần sửa liên tiếp và ghi ở thread nền"""
+        self.version += 1
+        WriteBehind.instance().mark_dirty(str(self.file), self._snapshot, self.file, self._encode)
+
+    def _snapshot(self) -> List[Dict]:
+        # Convert Object -> Dict ngay trên GUI thread (asdict chép sâu) -> thread nền không đụng Debt đang sửa
+        return [asdict(d) for d in self._debts]
+
+    @staticmethod
+    def _encode(data: List[Dict]) -> str:
+        return json.dumps(data, ensure_ascii=False, indent=2)
+
+    def flush(self):
+        """Ghi ngay nếu còn thay đổi chưa xuống đĩa"""
+        WriteBehind.instance().flush(str(self.file))
+        WriteBehind.instance().flush(str(self.payment_file))
+
+    # ==========================
+    # UNIT OF WORK (DataManager.transaction)
+    # ==========================
+    def begin(self):
+        # Không chụp gì ở đây: mỗi khoản nợ bị đụng tới mới được chụp (xem _remember)
+        self._undo = UndoLog()
+        self._saved_payments = None
+
+    def commit(self):
+        self._undo = None
+        self._saved_payments = None
+
+    def rollback(self):
+        undo, payments = self._undo, self._saved_payments
+        self._undo = self._saved_payments = None
+        if undo is not None and undo.restore(self._debts):
+            self._save()
+        if payments is not None:
+            self._payments = payments
+            self._save_payments()
+
+    def _remember(self, _id, before: Optional[Debt] = None):
+        """Trong unit-of-work: chụp khoản nợ trước lần sửa đầu tiên (UI sửa tại chỗ thì truyền `before`)"""
+        if self._undo is not None:
+            self._undo.remember(self._debts, _id, before)
 
     # ==========================
     # CRUD
@@ -53,10 +97,12 @@ class DebtEngine:
         return max([d.id for d in self._debts], default=0) + 1
 
     def add_debt(self, d: Debt):
+        self._remember(d.id)
         self._debts.append(d)
         self._save()
 
-    def update_debt(self, d: Debt):
+    def update_debt(self, d: Debt, before: Optional[Debt] = None):
+        self._remember(d.id, before)
         for idx, old in enumerate(self._debts):
             if old.id == d.id:
                 self._debts[idx] = d
@@ -64,9 +110,86 @@ class DebtEngine:
         self._save()
 
     def delete_debt(self, _id: int):
+        self._remember(_id)
         self._debts = [d for d in self._debts if d.id != _id]
         self._save()
 
+    # --- HÀNG LOẠT: cả lô chỉ ghi file 1 lần ---
+    def add_many(self, items: Iterable[Debt]) -> List[Debt]:
+        items = list(items)
+        for d in items:
+            self._remember(d.id)
+        if items:
+            self._debts.extend(items)
+            self._save()
+        return items
+
+    def update_many(self, items: Iterable[Debt], before: Optional[Dict[int, Debt]] = None) -> List[Debt]:
+        """
+        Thay các khoản nợ cùng id (O(n + m) qua map id -> vị trí), id lạ bị bỏ qua.
+        before: {id: bản chụp trước khi sửa} cho các khoản bị sửa tại chỗ (dùng cho rollback).
+        """
+        pos = {d.id: idx for idx, d in enumerate(self._debts)}
+        updated = []
+        for d in items:
+            idx = pos.get(d.id)
+            if idx is None:
+                continue
+            self._remember(d.id, (before or {}).get(d.id))
+            self._debts[idx] = d
+            updated.append(d)
+        if updated:
+            self._save()
+        return updated
+
+    def delete_many(self, ids: Iterable[int]) -> int:
+        ids = set(ids)
+        for _id in ids:
+            self._remember(_id)
+        before = len(self._debts)
+        self._debts = [d for d in self._debts if d.id not in ids]
+        removed = before - len(self._debts)
+        if removed:
+            self._save()
+        return removed
+
+    # ==========================
+    # LOG TRẢ NỢ
+    # ==========================
+    @property
+    def payments(self) -> List[Dict]:
+        """Các lần trả nợ gần nhất (cũ -> mới)"""
+        if self._payments is None:
+            self._payments = []
+            if self.payment_file.exists():
+                try:
+                    self._payments = json.loads(self.payment_file.read_text(encoding="utf8"))
+                except Exception:
+                    self._payments = []   # File lỗi thì bắt đầu lại
+        return self._payments
+
+    def log_payment(self, debt: Debt, amount: float, day: str):
+        log = self.payments
+        if self._undo is not None and self._saved_payments is None:
+            self._saved_payments = list(log)   # Log tối đa PAYMENT_LOG_KEEP dòng, chép nông là đủ
+        log.append({
+            "debt_id": debt.id,
+            "counterparty": debt.counterparty,
+            "date": day,
+            "amount": amount,
+            "remain": debt.outstanding()
+        })
+        del log[:-PAYMENT_LOG_KEEP]
+        self._save_payments()
+
+    def _save_payments(self):
+        self.version += 1
+        WriteBehind.instance().mark_dirty(
+            str(self.payment_file),
+            lambda: [dict(p) for p in self._payments or ()],
+            self.payment_file,
+            self._encode)
+
     def get_debts(self, active_only=False) -> List[Debt]:
         if active_only:
             return [d for d in self._debts if d.outstanding() > 0]
@@ -97,49 +220,53 @@ class DebtEngine:
             print(f"Export Error: {e}")
             return False
 
-    def import_csv(self, path: str):
+    def import_csv(self, path: str, parallel: Optional[bool] = None):
+        """
+        Import khoản nợ từ CSV. File rất lớn (hoặc parallel=True) được parse
+        song song bằng nhiều process, thứ tự và ID vẫn giống hệt đọc tuần tự.
+        """
         try:
-            with open(path, "r", encoding="utf-8-sig") as f:
-                reader = csv.DictReader(f)
-                imported_count = 0
-                for r in reader:
-                    # Xử lý an toàn cho boolean và None
-                    is_compound = str(r.get("compound", "")).lower() in ("true", "1", "yes")
-                    due = r.get("due_date")
-                    if not due or due == "None" or due == "":
-                        due = None
-
-                    new_debt = Debt(
-                        id=int(r.get("id", self.next_id() + imported_count)), # Tự sinh ID nếu trùng
-                        counterparty=r["counterparty"],
-                        side=r["side"],
-                        amount=float(r["amount"]),
-                        paid_back=float(r["paid_back"]),
-                        interest_rate=float(r["interest_rate"]),
-                        term_months=int(r["term_months"]),
-                        start_date=r["start_date"],
-                        due_date=due,
-                        purpose=r["purpose"],
-                        compound=is_compound
-                    )
-                    self._debts.append(new_debt)
+            if should_parallelize(path, parallel):
+                batches = (batch for batch, _, _ in parallel_parse(path, parse_debt_range))
+            else:
+                batches = self._iter_debt_rows(path)
+
+            imported_count = 0
+            next_free = self.next_id()
+            for batch in batches:
+                for row in batch:
+                    # Tự sinh ID nếu file không có cột id
+                    _id = row[0] if row[0] is not None else next_free
+                    next_free = max(next_free, _id + 1)
+                    self._remember(_id)
+                    self._debts.append(Debt(_id, *row[1:]))
                     imported_count += 1
-                self._save()
-                return imported_count
+            self._save()
+            return imported_count
         except Exception as e:
             print(f"Import Error: {e}")
             raise e
 
+    def _iter_debt_rows(self, path: str):
+        """Parse tuần tự (file nhỏ): cùng định dạng lô với parse_debt_range"""
+        with open(path, "r", encoding="utf-8-sig") as f:
+            header = next(csv.reader(f), None)
+        if not header:
+            return   # File rỗng / không có dòng header -> không có gì để import
+        size = pathlib.Path(path).stat().st_size
+        with open(path, "rb") as f:
+            f.readline()
+            start = f.tell()
+        yield parse_debt_range((path, header, start, size))
+
     def backup(self):
         """Hàm này CẦN PHẢI CÓ để DataManager gọi"""
         try:
-            BACKUP_FOLDER.mkdir(parents=True, exist_ok=True)
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            backup_file = BACKUP_FOLDER / f"debts_backup_{timestamp}.json"
-            
+            # Backup tăng dần vào kho khối dùng chung (chỉ lưu phần đã đổi)
+            self.flush()
             if self.file.exists():
-                shutil.copy(self.file, backup_file)
-                return str(backup_file)
+                manifest = BackupStore(BACKUP_FOLDER).snapshot({"debts": self.file})
+                return str(manifest) if manifest else None
         except Exception as e:
             print(f"Backup Debt Error: {e}")
             return None
\ No newline at end of file
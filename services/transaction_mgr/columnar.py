@@ -0,0 +1,257 @@
+from array import array
+from datetime import date
+from itertools import compress
+from typing import Dict, Iterator, List, Optional
+
+from models import Transaction
+
+# Mã dành riêng cho dòng đã xóa (tombstone) trong cột type
+_DEAD = 0xFFFF
+# Số giá trị tối đa của 1 cột array('H')
+_MAX_CODES = 0x10000
+
+
+class _Dictionary:
+    """Mã hóa từ điển: chuỗi lặp lại nhiều (danh mục, thành viên, loại...) -> số nguyên nhỏ"""
+    __slots__ = ("values", "codes", "limit")
+
+    def __init__(self, limit: int = _MAX_CODES):
+        self.values: List[str] = []
+        self.codes: Dict[str, int] = {}
+        self.limit = limit
+
+    def encode(self, value: str) -> int:
+        code = self.codes.get(value)
+        if code is None:
+            code = len(self.values)
+            if code >= self.limit:
+                raise ValueError(f"Quá nhiều giá trị khác nhau (tối đa {self.limit}), không mã hóa được: {value!r}")
+            self.codes[value] = code
+            self.values.append(value)
+        return code
+
+
+def _date_to_ordinal(value: str) -> int:
+    try:
+        return date.fromisoformat(value).toordinal()
+    except (TypeError, ValueError):
+        return 0
+
+
+class TransactionRow:
+    """
+    View nhẹ (chỉ 2 slot) trỏ vào 1 dòng của ColumnarStore.
+    Có đủ thuộc tính như Transaction nên UI dùng y hệt, nhưng chỉ đọc:
+    muốn sửa thì tạo Transaction mới rồi gọi update_transaction().
+    """
+    __slots__ = ("_store", "_slot")
+
+    def __init__(self, store: "ColumnarStore", slot: int):
+        self._store = store
+        self._slot = slot
+
+    @property
+    def id(self):
+        return self._store.ids[self._slot]
+
+    @property
+    def date(self):
+        return self._store.date_str(self._slot)
+
+    @property
+    def category(self):
+        return self._store.category_dict.values[self._store.categories[self._slot]]
+
+    @property
+    def amount(self):
+        return self._store.amounts[self._slot]
+
+    @property
+    def type(self):
+        return self._store.type_dict.values[self._store.types[self._slot]]
+
+    @property
+    def role(self):
+        return self._store.role_dict.values[self._store.roles[self._slot]]
+
+    @property
+    def description(self):
+        return self._store.descriptions[self._slot]
+
+    @property
+    def expiry_date(self):
+        return self._store.expiry.get(self._slot, "")
+
+    @property
+    def is_recurring(self):
+        return bool(self._store.recurring[self._slot])
+
+    @property
+    def cycle(self):
+        return self._store.cycle_dict.values[self._store.cycles[self._slot]]
+
+    def to_dict(self):
+        return Transaction.to_dict(self)
+
+    def to_transaction(self) -> Transaction:
+        """Tách ra 1 Transaction độc lập (để sửa trên form)"""
+        return Transaction(**self.to_dict())
+
+    def __repr__(self):
+        return f"TransactionRow({self.id!r}, {self.date!r}, {self.amount!r})"
+
+
+class ColumnarStore:
+    """
+    Kho giao dịch dạng cột (tùy chọn) thay cho dict id -> Transaction.
+    - date    : array('i') ordinal
+    - amount  : array('d')
+    - type/category/role/cycle : array('H') mã hóa từ điển (type 0xFFFF = dòng đã xóa)
+    Có giao diện giống dict (get/pop/values/__setitem__...) nên TransactionEngine
+    dùng thay thế trực tiếp được. Thứ tự dòng giữ nguyên như dict: update ghi đè tại chỗ,
+    delete để lại tombstone (dọn khi gọi vacuum()).
+    """
+    def __init__(self):
+        self.ids: List[Optional[str]] = []
+        self.dates = array("i")
+        self.amounts = array("d")
+        self.types = array("H")
+        self.categories = array("H")
+        self.roles = array("H")
+        self.cycles = array("H")
+        self.recurring = bytearray()
+        self.descriptions: List[str] = []
+        self.expiry: Dict[int, str] = {}      # Thưa: đa số giao dịch không có hạn
+        self.raw_dates: Dict[int, str] = {}   # Ngày không đúng định dạng ISO (giữ nguyên chuỗi gốc)
+
+        self.type_dict = _Dictionary(limit=_DEAD)   # Mã _DEAD dành cho tombstone
+        self.category_dict = _Dictionary()
+        self.role_dict = _Dictionary()
+        self.cycle_dict = _Dictionary()
+
+        self._slots: Dict[str, int] = {}
+        self._dead = 0
+
+    # ==========================
+    # GIAO DIỆN KIỂU DICT
+    # ==========================
+    def __len__(self):
+        return len(self._slots)
+
+    def __contains__(self, tid):
+        return tid in self._slots
+
+    def __getitem__(self, tid) -> TransactionRow:
+        return TransactionRow(self, self._slots[tid])
+
+    def get(self, tid, default=None):
+        slot = self._slots.get(tid)
+        return default if slot is None else TransactionRow(self, slot)
+
+    def __setitem__(self, tid, t):
+        slot = self._slots.get(tid)
+        if slot is None:
+            self._append(t)
+        else:
+            self._write(slot, t)
+
+    def pop(self, tid, default=None):
+        slot = self._slots.pop(tid, None)
+        if slot is None:
+            return default
+        # Trả về Transaction tách rời vì slot sắp thành tombstone
+        row = TransactionRow(self, slot).to_transaction()
+        self.ids[slot] = None
+        self.types[slot] = _DEAD
+        self.expiry.pop(slot, None)
+        self.raw_dates.pop(slot, None)
+        self._dead += 1
+        return row
+
+    def values(self) -> Iterator[TransactionRow]:
+        for slot, tid in enumerate(self.ids):
+            if tid is not None:
+                yield TransactionRow(self, slot)
+
+    def keys(self):
+        return self._slots.keys()
+
+    # ==========================
+    # GHI CỘT
+    # ==========================
+    def _append(self, t):
+        self.type_dict.encode(t.type)   # Hết mã thì lỗi ngay, trước khi thêm dòng dở dang
+        slot = len(self.ids)
+        self.ids.append(t.id)
+        self.dates.append(0)
+        self.amounts.append(0.0)
+        self.types.append(0)
+        self.categories.append(0)
+        self.roles.append(0)
+        self.cycles.append(0)
+        self.recurring.append(0)
+        self.descriptions.append("")
+        self._slots[t.id] = slot
+        self._write(slot, t)
+
+    def _write(self, slot: int, t):
+        self.dates[slot] = _date_to_ordinal(t.date)
+        if not self.dates[slot]:
+            self.raw_dates[slot] = t.date
+        else:
+            self.raw_dates.pop(slot, None)
+        self.amounts[slot] = float(t.amount)
+        self.types[slot] = self.type_dict.encode(t.type)
+        self.categories[slot] = self.category_dict.encode(t.category)
+        self.roles[slot] = self.role_dict.encode(t.role)
+        self.cycles[slot] = self.cycle_dict.encode(getattr(t, "cycle", "Tháng"))
+        self.recurring[slot] = 1 if t.is_recurring else 0
+        self.descriptions[slot] = t.description or ""
+        if t.expiry_date:
+            self.expiry[slot] = t.expiry_date
+        else:
+            self.expiry.pop(slot, None)
+
+    def date_str(self, slot: int) -> str:
+        ordinal = self.dates[slot]
+        if not ordinal:
+            return self.raw_dates.get(slot, "")
+        return date.fromordinal(ordinal).isoformat()
+
+    def vacuum(self) -> "ColumnarStore":
+        """Trả về kho mới đã dọn tombstone. View cũ vẫn trỏ vào kho cũ nên không bị sai dữ liệu."""
+        if not self._dead:
+            return self
+        fresh = ColumnarStore()
+        for row in self.values():
+            fresh._append(row)
+        return fresh
+
+    @property
+    def dead_ratio(self) -> float:
+        return self._dead / len(self.ids) if self.ids else 0.0
+
+    # ==========================
+    # TỔNG HỢP (QUÉT CỘT)
+    # ==========================
+    def type_mask(self, type_name: str) -> bytes:
+        """Mặt nạ 0/1 theo loại, tạo bằng map(code.__eq__) (vòng lặp ở tầng C)"""
+        code = self.type_dict.codes.get(type_name)
+        if code is None:
+            return bytes(len(self.types))
+        return bytes(map(code.__eq__, self.types))
+
+    def sum_amount(self, type_name: str) -> float:
+        return sum(compress(self.amounts, self.type_mask(type_name)))
+
+    def group_sum(self, column: str, type_name: str) -> Dict[str, float]:
+        """Tổng tiền theo 'category' | 'role' cho 1 loại giao dịch"""
+        codes, dictionary = {
+            "category": (self.categories, self.category_dict),
+            "role": (self.roles, self.role_dict),
+        }[column]
+        mask = self.type_mask(type_name)
+        totals = [0.0] * len(dictionary.values)
+        for code, amount in zip(compress(codes, mask), compress(self.amounts, mask)):
+            totals[code] += amount
+        return {dictionary.values[c]: v for c, v in enumerate(totals) if v}
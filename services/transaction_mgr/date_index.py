@@ -0,0 +1,142 @@
+from bisect import bisect_left, bisect_right, insort
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Khóa trong index: (ngày "yyyy-mm-dd", số thứ tự chèn, id)
+# Số thứ tự giữ các giao dịch cùng ngày theo đúng thứ tự trong sổ.
+DateKey = Tuple[str, int, str]
+
+# Lô thêm lớn hơn tỉ lệ này so với index hiện có thì nối vào rồi sort lại (Timsort) thay vì insort từng dòng
+_BULK_RATIO = 0.125
+
+
+class DateIndex:
+    """
+    Index phụ sắp theo ngày cho TransactionEngine.
+    Ngày dạng ISO nên so sánh chuỗi = so sánh ngày -> range() chỉ cần 2 lần bisect,
+    chi phí O(log n + k) thay vì quét toàn bộ sổ.
+    """
+    def __init__(self):
+        self._keys: List[DateKey] = []
+        self._by_id: Dict[str, Tuple[str, int]] = {}
+        self._seq = 0
+
+    @classmethod
+    def build(cls, transactions: Iterable) -> "DateIndex":
+        index = cls()
+        keys = index._keys
+        for seq, t in enumerate(transactions):
+            keys.append((t.date, seq, t.id))
+            index._by_id[t.id] = (t.date, seq)
+        keys.sort()
+        index._seq = len(keys)
+        return index
+
+    def __len__(self):
+        return len(self._keys)
+
+    # ==========================
+    # CẬP NHẬT
+    # ==========================
+    def add(self, tid: str, date: str, seq: Optional[int] = None):
+        """
+        Thêm mới / đổi ngày. Giao dịch đã có giữ nguyên số thứ tự (vị trí trong sổ không đổi).
+        seq: đặt lại số thứ tự cũ (hoàn tác xóa trong rollback -> về đúng vị trí trong sổ).
+        """
+        old = self._by_id.get(tid)
+        if old is not None:
+            if old[0] == date and seq in (None, old[1]):
+                return
+            self._discard((old[0], old[1], tid))
+            if seq is None:
+                seq = old[1]
+        elif seq is None:
+            seq = self._seq
+            self._seq += 1
+        self._by_id[tid] = (date, seq)
+        insort(self._keys, (date, seq, tid))
+
+    def add_many(self, items: Iterable[Tuple[str, str]]):
+        """Thêm / đổi ngày nhiều (id, ngày) cùng lúc (import, sửa hàng loạt)"""
+        items = list(dict(items).items())   # id lặp lại -> lấy ngày cuối cùng
+        if len(items) < len(self._keys) * _BULK_RATIO:
+            for tid, date in items:
+                self.add(tid, date)
+            return
+        stale = set()
+        fresh = []
+        for tid, date in items:
+            old = self._by_id.get(tid)
+            if old is not None:
+                stale.add((old[0], old[1], tid))
+                seq = old[1]
+            else:
+                seq = self._seq
+                self._seq += 1
+            self._by_id[tid] = (date, seq)
+            fresh.append((date, seq, tid))
+        if stale:
+            # Lô lớn: lọc 1 lần O(n) thay vì xóa từng khóa khỏi list
+            self._keys = [k for k in self._keys if k not in stale]
+        self._keys.extend(fresh)
+        self._keys.sort()
+
+    def seq_of(self, tid: str) -> Optional[int]:
+        """Số thứ tự (vị trí trong sổ) của 1 id, None nếu không có"""
+        old = self._by_id.get(tid)
+        return None if old is None else old[1]
+
+    def remove(self, tid: str):
+        old = self._by_id.pop(tid, None)
+        if old is not None:
+            self._discard((old[0], old[1], tid))
+
+    def remove_many(self, tids: Iterable[str]):
+        tids = list(tids)
+        if len(tids) < len(self._keys) * _BULK_RATIO:
+            for tid in tids:
+                self.remove(tid)
+            return
+        stale = set()
+        for tid in tids:
+            old = self._by_id.pop(tid, None)
+            if old is not None:
+                stale.add((old[0], old[1], tid))
+        if stale:
+            self._keys = [k for k in self._keys if k not in stale]
+
+    def _discard(self, key: DateKey):
+        i = bisect_left(self._keys, key)
+        if i < len(self._keys) and self._keys[i] == key:
+            del self._keys[i]
+
+    # ==========================
+    # TRUY VẤN
+    # ==========================
+    def range_keys(self, start: Optional[str] = None, end: Optional[str] = None) -> List[DateKey]:
+        """Các khóa có start <= ngày <= end (None = không giới hạn), đã sắp theo ngày"""
+        keys = self._keys
+        lo = 0 if start is None else bisect_left(keys, (start,))
+        # (end, +vô cực) đứng sau mọi khóa cùng ngày end
+        hi = len(keys) if end is None else bisect_right(keys, (end, float("inf")))
+        return keys[lo:hi]
+
+    def sort_ids(self, ids: Iterable[str], by_date: bool = False) -> List[str]:
+        """Sắp 1 tập id theo đúng thứ tự trong sổ (dùng số thứ tự chèn đã lưu), hoặc theo ngày"""
+        by_id = self._by_id
+        key = (lambda tid: by_id[tid]) if by_date else (lambda tid: by_id[tid][1])
+        return sorted((tid for tid in ids if tid in by_id), key=key)
+
+    def count(self, start: Optional[str] = None, end: Optional[str] = None) -> int:
+        """Số giao dịch trong khoảng ngày, O(log n) (dùng để ước lượng độ chọn lọc)"""
+        keys = self._keys
+        lo = 0 if start is None else bisect_left(keys, (start,))
+        hi = len(keys) if end is None else bisect_right(keys, (end, float("inf")))
+        return max(hi - lo, 0)
+
+    def range(self, start: Optional[str] = None, end: Optional[str] = None) -> List[str]:
+        """Id các giao dịch trong khoảng ngày [start, end], sắp theo ngày"""
+        return [k[2] for k in self.range_keys(start, end)]
+
+    def last(self, n: int) -> List[str]:
+        """Id của n giao dịch có ngày mới nhất, mới -> cũ (O(n), không sao chép cả index)"""
+        return [k[2] for k in reversed(self._keys[-n:])] if n > 0 else []
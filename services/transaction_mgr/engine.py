@@ -1,157 +1,773 @@
-import csv
 import pathlib
-import shutil
-import random
-from typing import List, Dict
+from typing import Callable, Iterable, List, Dict, Mapping, Optional, Tuple
 from datetime import datetime
-from PyQt6.QtCore import QDateTime
 
 # Import Model (Giả sử bạn đã có file models.py chứa Transaction class)
 from models import Transaction 
+from .columnar import ColumnarStore
+from .storage import make_backend, partition_key, rekey, _to_row, _from_row
+from .importer import iter_csv_batches
+from .exporter import write_export
+from core.backup import BackupStore
+from .rollup import RollupCube, rollup_key
+from .date_index import DateIndex
+from .text_index import TextIndex
+from .recurrence import RecurrenceIndex
+from .topk import TOP_K, TopAmountIndex
+from .frozen import ExportPin, FrozenTransaction, SnapshotIndex, freeze
+from .query import QueryResult, TransactionQuery
 
 # Cấu hình đường dẫn file
 DATA_FILE = pathlib.Path(__file__).parent.parent.parent / "transactions.csv"
+SQLITE_FILE = pathlib.Path(__file__).parent.parent.parent / "transactions.db"
+PARTITION_DIR = pathlib.Path(__file__).parent.parent.parent / "transactions.parts"
 BACKUP_FOLDER = pathlib.Path(__file__).parent.parent.parent / "backups"
 
+# Backend lưu trữ mặc định: "csv" (transactions.csv + journal) | "sqlite" (transactions.db)
+# | "partitioned" (transactions.parts/: mỗi năm 1 file, năm cũ chỉ nạp khi cần)
+STORAGE_BACKEND = "csv"
+
+# Bật kho dạng cột (ColumnarStore) thay cho dict id -> Transaction (tiết kiệm RAM cho sổ lớn)
+USE_COLUMNAR_STORE = False
+# Tỉ lệ dòng đã xóa trong ColumnarStore vượt ngưỡng này thì dọn lại khi save/compact
+VACUUM_RATIO = 0.3
+# Id tự cấp (import thiếu id / trùng id) đếm tăng dần từ số này, bỏ qua id đã có
+NEW_ID_START = 100000
+
 class TransactionEngine:
     """
     Class chịu trách nhiệm duy nhất: Đọc/Ghi/Xử lý file transactions.csv
     Không dính dáng gì đến PyQt Widget.
     """
-    def __init__(self, file_path: pathlib.Path = DATA_FILE):
+    def __init__(self, file_path: pathlib.Path = None, columnar: bool = USE_COLUMNAR_STORE, backend=None):
+        if file_path is None:
+            file_path = {"sqlite": SQLITE_FILE, "partitioned": PARTITION_DIR}.get(STORAGE_BACKEND, DATA_FILE)
         self.file_path = file_path
-        self._transactions: List[Transaction] = []
+        self.columnar = columnar
+        # Backend lưu trữ: CSV + journal (mặc định) hoặc SQLite (file .db), xem storage.py
+        # Lần đầu chuyển sang SQLite / phân vùng sẽ tự nạp dữ liệu từ transactions.csv cũ.
+        self.backend = backend or make_backend(file_path, migrate_from=DATA_FILE)
+        # Backend phân vùng: RAM chỉ giữ các năm đã nạp, xem _ensure()
+        self._partitioned = getattr(self.backend, "partitioned", False)
+        # Kho chính: id -> Transaction (dict giữ nguyên thứ tự chèn => thứ tự hiển thị như cũ)
+        # Nhờ vậy update/delete/get_by_id đều O(1), không phụ thuộc độ lớn sổ.
+        # Khi columnar=True thì là ColumnarStore (cùng giao diện dict, trả về TransactionRow).
+        self._by_id: Dict[str, Transaction] = self._new_store()
+        # List dựng lại lười (lazy) cho get_all(), bị hủy mỗi khi dữ liệu thay đổi
+        self._list_cache: Optional[List[Transaction]] = None
+        # Tăng mỗi lần sổ đổi (nạp/đẩy phân vùng không tính) -> DataManager cache số liệu theo version
+        self.version = 0
+        # Tổng tiền cộng dồn theo loại (income/expense...), cập nhật ở mỗi thao tác ghi
+        # => summary()/total() là O(1), không phải quét lại toàn bộ sổ.
+        self._totals: Dict[str, float] = {}
+        # Cube tổng hợp (tháng x danh mục x thành viên x loại) cho biểu đồ/thống kê, xem rollup.py
+        self.rollup = RollupCube()
+        # Index phụ sắp theo ngày -> range(start, end) bằng bisect, xem date_index.py
+        self._dates = DateIndex()
+        # Index trigram cho ô tìm kiếm, dựng lười ở lần tìm đầu tiên (không làm chậm lúc mở app)
+        self._text: Optional[TextIndex] = None
+        # Giao dịch định kỳ -> sinh các lần phát sinh theo khoảng ngày, cũng dựng lười, xem recurrence.py
+        self._recur: Optional[RecurrenceIndex] = None
+        # Top-K theo amount của từng loại (vd: 5 khoản chi lớn nhất), dựng lười ở lần hỏi đầu, xem topk.py
+        self._tops: Dict[str, TopAmountIndex] = {}
+        # Bảng dòng bất biến copy-on-write cho snapshot(), dựng lười ở lần chụp đầu, xem frozen.py
+        self._snap: Optional[SnapshotIndex] = None
+        # Các export đang chạy ở worker: giữ giá trị cũ của dòng bị sửa trong lúc export, xem export_reader()
+        self._export_pins: tuple = ()
+        # Unit-of-work (begin/commit/rollback): thay đổi chờ ghi + giá trị cũ để hoàn tác
+        self._pending_ops: Optional[List] = None
+        self._undo: Optional[Dict[str, Optional[Tuple[Transaction, Optional[int]]]]] = None   # id -> (bản sao, số thứ tự)
+        # Bộ đếm cho _new_id(): cùng sổ + cùng file import -> cùng id (không phụ thuộc random / số process parse)
+        self._id_seq = NEW_ID_START - 1
         self.load()
 
     # ==========================
     # CORE: LOAD & SAVE
     # ==========================
+    def _new_store(self):
+        return ColumnarStore() if self.columnar else {}
+
+    def _vacuum(self):
+        """Dọn tombstone của ColumnarStore (nếu có) trước khi ghi file gốc"""
+        if isinstance(self._by_id, ColumnarStore) and self._by_id.dead_ratio > VACUUM_RATIO:
+            self._by_id = self._by_id.vacuum()
+            self._list_cache = None
+
+    def _snapshot_rows(self) -> List[Dict]:
+        """Ảnh chụp toàn bộ dữ liệu dạng dict để backend ghi xuống đĩa"""
+        self._vacuum()
+        return [_to_row(t) for t in self._by_id.values()]
+
     def load(self):
-        self._transactions = []
-        if not self.file_path.exists():
-            return
-        
-        try:
-            with open(self.file_path, encoding="utf-8-sig") as f:
-                reader = csv.DictReader(f)
-                for row in reader:
-                    t = Transaction(
-                        id=row["id"],
-                        date=row["date"],
-                        category=row["category"],
-                        amount=float(row["amount"]),
-                        type=row["type"],
-                        role=row["role"],
-                        description=row.get("description", ""),
-                        expiry_date=row.get("expiry_date", ""),
-                        is_recurring=row.get("is_recurring", "False") == "True",
-                        cycle=row.get("cycle", "Tháng")
-                    )
-                    self._transactions.append(t)
-        except Exception as e:
-            print(f"❌ Error loading transactions: {e}")
+        self._by_id = self._new_store()
+        self._changed()
+        self.backend.load_into(self._by_id)
+        self._rebuild_aggregates()
+        self._dates = DateIndex.build(self._by_id.values())
+        self._text = None
+        self._recur = None
+        self._tops = {}
+        self._snap = None
 
     def save(self):
+        """
+        Ghi lại toàn bộ dữ liệu ở background (write-behind), không chặn GUI thread.
+        Ảnh chụp lấy ngay trên thread gọi; các thay đổi sau đó vẫn nằm an toàn trong journal.
+        Cần chắc chắn đã ghi xong (thoát app, backup...) thì gọi flush().
+        """
         try:
-            # Tạo thư mục nếu chưa có
-            self.file_path.parent.mkdir(parents=True, exist_ok=True)
-            
-            # Lấy tên trường từ Transaction Model (hoặc hardcode list cho chuẩn)
-            fieldnames = ["id", "date", "category", "amount", "type", "role", 
-                          "description", "expiry_date", "is_recurring", "cycle"]
-            
-            with open(self.file_path, "w", encoding="utf-8-sig", newline="") as f:
-                writer = csv.DictWriter(f, fieldnames=fieldnames)
-                writer.writeheader()
-                for t in self._transactions:
-                    # Convert Object -> Dict
-                    row = {
-                        "id": t.id,
-                        "date": t.date,
-                        "category": t.category,
-                        "amount": t.amount,
-                        "type": t.type,
-                        "role": t.role,
-                        "description": t.description,
-                        "expiry_date": t.expiry_date,
-                        "is_recurring": "True" if t.is_recurring else "False",
-                        "cycle": getattr(t, "cycle", "Tháng")
-                    }
-                    writer.writerow(row)
+            self.backend.compact(self._snapshot_rows)
         except Exception as e:
             print(f"❌ Error saving transactions: {e}")
 
+    def _changed(self):
+        """Gọi sau mỗi thao tác làm đổi dữ liệu: hủy list cache + tăng version"""
+        self._list_cache = None
+        self.version += 1
+
+    def _log(self, op: str, t: Transaction = None, tid: str = None):
+        """Ghi 1 thay đổi xuống backend (1 dòng journal / 1 câu SQL) thay vì ghi lại cả file"""
+        row = _to_row(t) if t is not None else None
+        if self._pending_ops is not None:
+            self._pending_ops.append((op, row, tid))
+            return
+        self.backend.write(op, row, tid, self._snapshot_rows)
+
+    def _log_many(self, op: str, rows: Optional[List[Dict]] = None, tids: Optional[List[str]] = None):
+        """Ghi cả lô xuống backend bằng 1 lần ghi (trong unit-of-work thì chỉ gom lại)"""
+        if self._pending_ops is not None:
+            if tids is not None:
+                self._pending_ops.extend((op, None, tid) for tid in tids)
+            else:
+                self._pending_ops.extend((op, row, None) for row in rows)
+            return
+        self.backend.write_many(op, rows, tids, self._snapshot_rows)
+
+    def compact(self, wait: bool = False):
+        """Gộp journal vào file gốc ở background (chỉ có ý nghĩa với CSV backend)"""
+        self.backend.compact(self._snapshot_rows, wait)
+
+    def flush(self):
+        """Đảm bảo file gốc chứa đủ mọi thay đổi (trước khi backup/copy file)"""
+        self.backend.flush(self._snapshot_rows)
+
+    def close(self):
+        self.backend.close()
+
+    @property
+    def partitioned(self) -> bool:
+        """Backend phân vùng theo năm: nạp cả sổ (get_all) sẽ kéo cả các năm cũ lên RAM"""
+        return self._partitioned
+
     # ==========================
     # CRUD METHODS
     # ==========================
     def get_all(self) -> List[Transaction]:
-        return self._transactions
+        """Cả sổ (phân vùng: nạp đủ mọi năm). Màn hình chỉ cần 1 khoảng ngày thì dùng query()/range()."""
+        self._ensure()
+        if self._list_cache is None:
+            self._list_cache = list(self._by_id.values())
+        return self._list_cache
+
+    def get_by_id(self, tid: str) -> Optional[Transaction]:
+        """Tra cứu O(1) theo id"""
+        t = self._by_id.get(tid)
+        if t is None and self._partitioned:
+            # Id nằm ở năm chưa nạp: manifest biết năm nào -> chỉ nạp đúng năm đó
+            self._ensure_ids((tid,))
+            t = self._by_id.get(tid)
+        return t
+
+    def __len__(self):
+        if self._partitioned:
+            return len(self._by_id) + self.backend.cold_rows()
+        return len(self._by_id)
+
+    def _has_id(self, tid: str) -> bool:
+        """Id đã có trong sổ chưa (phân vùng: tính cả các năm chưa nạp, tra trong manifest)"""
+        if tid in self._by_id:
+            return True
+        if not self._partitioned:
+            return False
+        key = self.backend.partition_of(tid)
+        return key is not None and not self.backend.is_loaded(key)
+
+    def _new_id(self) -> str:
+        """Id mới xác định: số đếm tăng dần, gặp id đã có (kể cả ở năm chưa nạp) thì đếm tiếp"""
+        self._id_seq += 1
+        while self._has_id(str(self._id_seq)):
+            self._id_seq += 1
+        return str(self._id_seq)
 
     def add_transaction(self, t: Transaction):
-        self._transactions.append(t)
-        self.save()
+        # Ghi đè id đang nằm ở năm chưa nạp -> nạp năm đó để gỡ bản cũ (không để 2 dòng cùng id trên đĩa)
+        self._ensure_ids((t.id,))
+        self._ensure_dates((t.date,))
+        self._remember(t.id)
+        old = self._by_id.get(t.id)
+        if old is not None:
+            self._account(rollup_key(old), old.amount, -1)
+        self._by_id[t.id] = t
+        self._account(rollup_key(t), t.amount)
+        self._dates.add(t.id, t.date)
+        for index in self._lazy_indexes():
+            index.add(t.id, t)
+        self._changed()
+        self._log("add", t)
 
-    def update_transaction(self, new_t: Transaction):
-        for i, t in enumerate(self._transactions):
-            if t.id == new_t.id:
-                self._transactions[i] = new_t
-                break
-        self.save()
+    def update_transaction(self, new_t: Transaction, before: Optional[Transaction] = None):
+        """
+        before: bản chụp trước khi sửa, khi object trong sổ đã bị sửa tại chỗ
+        (dùng để trừ giá trị cũ khỏi tổng/cube và cho rollback).
+        """
+        old = self.get_by_id(new_t.id)
+        if old is None:
+            print(f"⚠️ Update thất bại: Không tìm thấy Transaction {new_t.id}")
+            return
+        self._ensure_dates((new_t.date,))
+        self._remember(new_t.id, before)
+        # Đọc giá trị cũ TRƯỚC khi ghi (TransactionRow của ColumnarStore là view sống)
+        prev = before if before is not None else old
+        old_key, old_amount = rollup_key(prev), prev.amount
+        # Gán lại theo key => giữ nguyên vị trí trong dict
+        self._by_id[new_t.id] = new_t
+        if old is new_t and before is None:
+            # Object đã bị sửa tại chỗ mà không có bản chụp -> không còn biết giá trị cũ, tính lại từ đầu
+            self._rebuild_aggregates()
+        else:
+            self._account(old_key, old_amount, -1)
+            self._account(rollup_key(new_t), new_t.amount)
+        self._dates.add(new_t.id, new_t.date)
+        for index in self._lazy_indexes():
+            index.add(new_t.id, new_t)
+        self._changed()
+        self._log("update", new_t)
 
     def delete_transaction(self, tid: str):
-        self._transactions = [t for t in self._transactions if t.id != tid]
-        self.save()
+        if self.get_by_id(tid) is None:
+            return
+        self._remember(tid)
+        old = self._by_id.pop(tid, None)
+        if old is None:
+            return
+        self._account(rollup_key(old), old.amount, -1)
+        self._dates.remove(tid)
+        for index in self._lazy_indexes():
+            index.remove(tid)
+        self._changed()
+        self._log("delete", tid=tid)
+
+    # ==========================
+    # UNIT OF WORK (DataManager.transaction)
+    # ==========================
+    def begin(self):
+        """Bắt đầu gom thay đổi: chưa ghi gì xuống backend cho tới commit()"""
+        self._pending_ops = []
+        self._undo = {}
+
+    def commit(self):
+        """Ghi mọi thay đổi đã gom bằng 1 lần ghi backend (1 lần write journal / 1 transaction SQL)"""
+        ops, self._pending_ops, self._undo = self._pending_ops, None, None
+        if ops:
+            self.backend.write_batch(ops, self._snapshot_rows)
+
+    def rollback(self):
+        """Trả RAM (sổ + tổng + index) về lúc begin(); backend chưa nhận thay đổi nào nên không cần ghi"""
+        undo, self._undo = self._undo or {}, None
+        revived: Dict[str, int] = {}
+        for tid, saved in undo.items():
+            if saved is None:
+                self.delete_transaction(tid)
+                continue
+            old, seq = saved
+            if seq is not None and self._dates.seq_of(tid) != seq:
+                revived[tid] = seq   # Bị xóa (có thể đã thêm lại ở cuối sổ) -> phải về vị trí cũ
+            self.add_transaction(old)
+        if revived:
+            self._restore_order(revived)
+        self._pending_ops = None
+
+    def _restore_order(self, revived: Dict[str, int]):
+        """
+        Dòng bị xóa trong khối (rồi hoàn tác / thêm lại) đang nằm ở cuối sổ:
+        trả về đúng vị trí cũ (số thứ tự lúc begin() trong DateIndex) rồi xếp lại kho theo thứ tự đó.
+        O(n log n) nhưng chỉ chạy khi rollback có hoàn tác xóa.
+        """
+        for tid, seq in revived.items():
+            self._dates.add(tid, self._by_id[tid].date, seq)
+        store = self._new_store()
+        old_store = self._by_id
+        for tid in self._dates.sort_ids(old_store.keys()):
+            store[tid] = old_store[tid]
+        self._by_id = store
+        # Index phụ có phụ thuộc thứ tự (top-K xếp hòa theo thứ tự thêm, snapshot theo thứ tự sổ) -> dựng lại lười
+        self._tops = {}
+        self._snap = None
+        self._changed()
+
+    def _remember(self, tid: str, before: Optional[Transaction] = None):
+        """
+        Gọi TRƯỚC mỗi lần thêm/sửa/xóa 1 id: giữ giá trị cũ cho các export đang chạy, và trong
+        unit-of-work thì lưu bản sao giá trị trước lần sửa đầu tiên của id (None = chưa tồn tại).
+        """
+        if self._export_pins:
+            old = before if before is not None else self._by_id.get(tid)
+            for pin in self._export_pins:
+                pin.keep(tid, old)
+        if self._undo is None or tid in self._undo:
+            return
+        old = before if before is not None else self._by_id.get(tid)
+        # Sao chép ra Transaction độc lập: TransactionRow của ColumnarStore là view sống.
+        # Giữ cả số thứ tự trong sổ: rollback một lần xóa phải trả dòng về đúng vị trí cũ
+        self._undo[tid] = None if old is None else (_from_row(_to_row(old)), self._dates.seq_of(tid))
+
+    # ==========================
+    # BULK (CẢ LÔ = 1 LẦN GHI)
+    # ==========================
+    def add_many(self, items: Iterable[Transaction]) -> List[Transaction]:
+        """Thêm nhiều giao dịch: cập nhật RAM + index cho cả lô, ghi xuống backend đúng 1 lần"""
+        items = list(items)
+        if not items:
+            return items
+        self._ensure_ids(t.id for t in items)
+        self._ensure_dates(t.date for t in items)
+        for t in items:
+            self._remember(t.id)
+            old = self._by_id.get(t.id)
+            if old is not None:
+                self._account(rollup_key(old), old.amount, -1)
+            self._by_id[t.id] = t
+            self._account(rollup_key(t), t.amount)
+        self._dates.add_many((t.id, t.date) for t in items)
+        for index in self._lazy_indexes():
+            for t in items:
+                index.add(t.id, t)
+        self._changed()
+        self._log_many("add", [_to_row(t) for t in items])
+        return items
+
+    def update_many(self, items: Iterable[Transaction],
+                    before: Optional[Dict[str, Transaction]] = None) -> List[Transaction]:
+        """
+        Sửa nhiều giao dịch (bỏ qua id không tồn tại), ghi 1 lần. Trả về các giao dịch đã sửa.
+        before: {id: bản chụp trước khi sửa} cho các dòng bị sửa tại chỗ (tổng/cube trừ theo bản chụp).
+        """
+        before = before or {}
+        updated: List[Transaction] = []
+        rebuild = False
+        items = list(items)
+        self._ensure_dates(t.date for t in items)
+        for t in items:
+            old = self.get_by_id(t.id)
+            if old is None:
+                print(f"⚠️ Update thất bại: Không tìm thấy Transaction {t.id}")
+                continue
+            prev = before.get(t.id)
+            self._remember(t.id, prev)
+            if prev is None:
+                prev = old
+            old_key, old_amount = rollup_key(prev), prev.amount
+            self._by_id[t.id] = t
+            if old is t and t.id not in before:
+                rebuild = True
+            else:
+                self._account(old_key, old_amount, -1)
+                self._account(rollup_key(t), t.amount)
+            updated.append(t)
+        if not updated:
+            return updated
+        if rebuild:
+            self._rebuild_aggregates()
+        self._dates.add_many((t.id, t.date) for t in updated)
+        for index in self._lazy_indexes():
+            for t in updated:
+                index.add(t.id, t)
+        self._changed()
+        self._log_many("update", [_to_row(t) for t in updated])
+        return updated
+
+    def delete_many(self, tids: Iterable[str]) -> List[str]:
+        """Xóa nhiều giao dịch, ghi 1 lần. Trả về các id đã xóa thật."""
+        removed: List[str] = []
+        tids = list(tids)
+        self._ensure_ids(tids)
+        for tid in tids:
+            self._remember(tid)
+            old = self._by_id.pop(tid, None)
+            if old is None:
+                continue
+            self._account(rollup_key(old), old.amount, -1)
+            removed.append(tid)
+        if not removed:
+            return removed
+        self._dates.remove_many(removed)
+        for index in self._lazy_indexes():
+            for tid in removed:
+                index.remove(tid)
+        self._changed()
+        self._log_many("delete", tids=removed)
+        return removed
 
     # ==========================
     # UTILS (Import/Export/Backup)
     # ==========================
-    def import_csv(self, path: str):
+    def import_csv(self, path: str, parallel: Optional[bool] = None):
+        """
+        Import đồng bộ (đọc theo lô, ghi xuống backend 1 lần ở cuối).
+        parallel=None: file rất lớn tự động parse song song bằng nhiều process.
+        """
+        added: List[Transaction] = []
         try:
-            with open(path, encoding="utf-8-sig") as f:
-                reader = csv.DictReader(f)
-                imported_count = 0
-                for row in reader:
-                    # Tự tạo ID mới nếu import
-                    new_id = str(random.randint(100000, 999999))
-                    t = Transaction(
-                        id=row.get("id", new_id),
-                        date=row["date"],
-                        category=row["category"],
-                        amount=float(row["amount"]),
-                        type=row["type"],
-                        role=row["role"],
-                        description=row.get("description", ""),
-                        expiry_date=row.get("expiry_date", ""),
-                        is_recurring=row.get("is_recurring", "False").lower() == "true",
-                        cycle=row.get("cycle", "Tháng")
-                    )
-                    self._transactions.append(t)
-                    imported_count += 1
-                self.save()
-                return imported_count
-        except Exception as e:
-            raise e
+            for batch, _ in iter_csv_batches(path, parallel=parallel):
+                added.extend(self.import_batch(batch))
+        except Exception:
+            self.rollback_import(added)
+            raise
+        self.commit_import(added)
+        return len(added)
+
+    def import_batch(self, batch: List[Transaction]) -> List[Transaction]:
+        """
+        Thêm 1 lô giao dịch vào RAM (chưa ghi đĩa). Dùng cho ImportWorker:
+        gọi trên GUI thread mỗi khi worker parse xong 1 lô.
+        """
+        self._ensure_dates(t.date for t in batch)
+        for t in batch:
+            # Tự tạo ID mới nếu import thiếu id hoặc trùng id đã có (kể cả id ở năm chưa nạp)
+            if not t.id or self._has_id(t.id):
+                t.id = self._new_id()
+            self._remember(t.id)
+            self._by_id[t.id] = t
+            self._account(rollup_key(t), t.amount)
+        self._dates.add_many((t.id, t.date) for t in batch)
+        for index in self._lazy_indexes():
+            for t in batch:
+                index.add(t.id, t)
+        self._changed()
+        return batch
+
+    def commit_import(self, added: List[Transaction]):
+        """Ghi toàn bộ các lô đã import xuống backend bằng 1 lần ghi"""
+        if added:
+            self._log_many("add", [_to_row(t) for t in added])
+
+    def rollback_import(self, added: List[Transaction]):
+        """Hủy import: gỡ các lô đã thêm vào RAM (chưa có gì được ghi xuống đĩa)"""
+        for t in added:
+            for pin in self._export_pins:
+                pin.keep(t.id, self._by_id.get(t.id))
+            if self._by_id.pop(t.id, None) is not None:
+                self._account(rollup_key(t), t.amount, -1)
+                self._dates.remove(t.id)
+                for index in self._lazy_indexes():
+                    index.remove(t.id)
+        self._changed()
+
+    def export_ids(self, q: Optional[TransactionQuery] = None) -> List[str]:
+        """Id cần export (q=None: cả sổ, theo thứ tự trong sổ). Gọi trên GUI thread trước khi chạy ExportWorker."""
+        if q is None:
+            self._ensure()
+            return list(self._by_id.keys())
+        return list(self.query(q).ids())
+
+    def export_reader(self, ids: List[str]) -> Callable[[List[str]], List[Dict]]:
+        """
+        Hàm đọc từng lô cho ExportWorker, chốt giá trị ngay lúc bắt đầu export (gọi trên GUI thread, O(1)):
+        - đã có snapshot() thì dùng luôn bảng bất biến đó;
+        - chưa có thì đăng ký 1 ExportPin: worker freeze từng lô khi đọc, dòng nào GUI sửa/xóa trong lúc
+          export thì giá trị cũ được giữ lại trước khi sửa. Năm đang export không bị đẩy khỏi RAM tới close().
+        GUI sửa/xóa/đẩy phân vùng trong lúc export không lẫn vào file. write_export() tự gọi close().
+        """
+        if self._snap is not None:
+            rows = self.snapshot()
 
-    def export_csv(self, path: str):
-        if not path.endswith(".csv"): path += ".csv"
-        # Chỉ cần gọi lại hàm save nhưng đổi path tạm thời
-        temp_engine = TransactionEngine(pathlib.Path(path))
-        temp_engine._transactions = self._transactions
-        temp_engine.save()
+            def read(batch: List[str]) -> List[Dict]:
+                return [_to_row(t) for t in map(rows.get, batch) if t is not None]
+            return read
+
+        pin = ExportPin(lambda tid: self._by_id.get(tid), self._unpin, _to_row)
+        self._export_pins = self._export_pins + (pin,)
+        return pin
+
+    def _unpin(self, pin: ExportPin):
+        # Gán tuple mới (không sửa tại chỗ): worker gọi khi xong, GUI thread có thể đang duyệt tuple cũ
+        self._export_pins = tuple(p for p in self._export_pins if p is not pin)
+
+    def export(self, path: str, q: Optional[TransactionQuery] = None, progress=None) -> int:
+        """
+        Export đồng bộ (CSV / JSON Lines / .npz theo đuôi file), ghi từng lô thẳng ra file,
+        không dựng Engine tạm và không chép cả sổ. GUI dùng ExportWorker để chạy nền.
+        """
+        ids = self.export_ids(q)
+        return write_export(path, ids, self.export_reader(ids), progress=progress)
+
+    def export_csv(self, path: str, q: Optional[TransactionQuery] = None) -> int:
+        if not path.lower().endswith(".csv"): path += ".csv"
+        return self.export(path, q)
+
+    def data_files(self) -> Dict[str, pathlib.Path]:
+        """Các file dữ liệu cần backup: {tên logic: đường dẫn} (gồm cả journal chưa gộp)"""
+        return self.backend.data_files()
+
+    def files_locked(self):
+        """Context giữ các file của data_files() đứng yên trong lúc backup đọc"""
+        return self.backend.files_locked()
 
     def backup(self):
+        """Backup tăng dần vào kho khối dùng chung (chỉ lưu phần đã đổi), trả về đường dẫn manifest"""
         try:
-            BACKUP_FOLDER.mkdir(exist_ok=True)
-            timestamp = QDateTime.currentDateTime().toString("yyyyMMdd_HHmmss")
-            backup_file = BACKUP_FOLDER / f"transactions_backup_{timestamp}.csv"
-            shutil.copy(self.file_path, backup_file)
-            return str(backup_file)
+            # Đọc thẳng file gốc + journal, không ép ghi lại cả CSV
+            with self.files_locked():
+                manifest = BackupStore(BACKUP_FOLDER).snapshot(self.data_files())
+            return str(manifest) if manifest else None
         except Exception as e:
             print(f"Backup error: {e}")
             return None
         
     def summary(self):
-            """Tính tổng thu chi cho Dashboard"""
-            inc = sum(t.amount for t in self._transactions if t.type == "income")
-            exp = sum(t.amount for t in self._transactions if t.type == "expense")
-            return {"income": inc, "expense": exp, "balance": inc - exp}
\ No newline at end of file
+            """Tổng thu chi cho Dashboard (O(1): đọc từ tổng cộng dồn)"""
+            inc = self.total("income")
+            exp = self.total("expense")
+            return {"income": inc, "expense": exp, "balance": inc - exp}
+
+    # ==========================
+    # QUERY (CHỌN INDEX + PUSHDOWN)
+    # ==========================
+    def query(self, q: Optional[TransactionQuery] = None, **filters) -> QueryResult:
+        """
+        Truy vấn khai báo, trả về QueryResult lười (lặp / count / total / group_sum / rollup).
+        Ví dụ: engine.query(date_from="2025-01-01", type_name="expense", roles={"Bố"}).total()
+        Các trường lọc xem TransactionQuery.
+        """
+        return QueryResult(self, q if q is not None else TransactionQuery.make(**filters))
+
+    def _execute(self, q: TransactionQuery):
+        """
+        Chọn nguồn ứng viên nhỏ nhất rồi kiểm tra các điều kiện còn lại trên từng dòng:
+          - backend có index (SQLite): đẩy loại/ngày/thành viên/danh mục xuống SQL
+          - từ khóa: tập id từ index trigram
+          - khoảng ngày: bisect trên index ngày, O(log n + k)
+          - không có gì: duyệt cả sổ
+        """
+        self._ensure(q.date_from, q.date_to)
+        by_id = self._by_id
+        matched = self.search_ids(q.text)
+        if matched is not None and not matched:
+            return
+
+        skip = frozenset()
+        if q.type_name or q.has_date or q.roles or q.categories:
+            pushed = self.backend.query_ids(type_name=q.type_name, date_from=q.date_from, date_to=q.date_to,
+                                            roles=q.roles, categories=q.categories)
+        else:
+            pushed = None
+
+        if pushed is not None:
+            skip = frozenset(("type", "date", "roles", "categories"))
+            ids = (i for i in pushed if i in by_id and (matched is None or i in matched))
+            if q.order == "date":
+                ids = self._dates.sort_ids(ids, by_date=True)
+            candidates = (by_id[i] for i in ids)
+        elif q.has_date and (matched is None or self._dates.count(q.date_from, q.date_to) <= len(matched)):
+            skip = frozenset(("date",))
+            keys = self._dates.range_keys(q.date_from, q.date_to)
+            if q.order != "date":
+                keys = sorted(keys, key=lambda k: k[1])
+            candidates = (by_id[k[2]] for k in keys if matched is None or k[2] in matched)
+        elif matched is not None:
+            candidates = (by_id[i] for i in self._dates.sort_ids(matched, by_date=q.order == "date"))
+        elif q.order == "date":
+            candidates = (by_id[i] for i in self._dates.range())
+        else:
+            candidates = iter(self.get_all())
+
+        check = q.predicate(skip)
+        if check is None:
+            yield from candidates
+        else:
+            yield from filter(check, candidates)
+
+    def filter(self, keyword: str = "", type_name: Optional[str] = None,
+               date_from: Optional[str] = None, date_to: Optional[str] = None) -> List[Transaction]:
+        """Lọc theo từ khóa / loại / khoảng ngày (dạng rút gọn của query()), giữ đúng thứ tự trong sổ"""
+        return self.query(text=keyword, type_name=type_name, date_from=date_from, date_to=date_to).list()
+
+    def search_ids(self, keyword: str):
+        """Id các giao dịch có description/category/role chứa từ khóa. None = từ khóa rỗng."""
+        if not keyword:
+            return None
+        self._ensure()
+        if self._text is None:
+            self._text = TextIndex.build(self._by_id.values())
+        return self._text.search(keyword)
+
+    def _lazy_indexes(self):
+        """Các index dựng lười đã được dựng (cần cập nhật theo mỗi thay đổi)"""
+        return [i for i in (self._text, self._recur, self._snap) if i is not None] + list(self._tops.values())
+
+    # ==========================
+    # GIAO DỊCH ĐỊNH KỲ
+    # ==========================
+    def occurrences(self, start: str, end: str) -> List[Transaction]:
+        """
+        Các lần phát sinh (không lưu trong sổ) của giao dịch định kỳ trong [start, end], sắp theo ngày.
+        id dạng "<id mẫu>@<ngày>". Lần gọi đầu dựng index mẫu O(n), sau đó chỉ duyệt các mẫu (có cache).
+        """
+        if self._recur is None:
+            templates = list(self._by_id.values())
+            if self._partitioned:
+                # Mẫu định kỳ ở năm chưa nạp lấy từ manifest, không cần nạp cả năm
+                templates += self.backend.cold_templates()
+            self._recur = RecurrenceIndex.build(templates)
+        return self._recur.occurrences(start, end)
+
+    def forecast(self, start: str, end: str) -> Dict[str, float]:
+        """Dự kiến thu/chi từ giao dịch định kỳ trong [start, end]: {income, expense, balance}"""
+        totals: Dict[str, float] = {}
+        for o in self.occurrences(start, end):
+            totals[o.type] = totals.get(o.type, 0.0) + o.amount
+        inc, exp = totals.get("income", 0.0), totals.get("expense", 0.0)
+        return {"income": inc, "expense": exp, "balance": inc - exp}
+
+    def range(self, start: Optional[str] = None, end: Optional[str] = None) -> List[Transaction]:
+        """Giao dịch có start <= date <= end (ISO, None = không giới hạn), sắp theo ngày. O(log n + k)."""
+        self._ensure(start, end)
+        return [self._by_id[tid] for tid in self._dates.range(start, end)]
+
+    def latest(self, n: int) -> List[Transaction]:
+        """n giao dịch mới nhất theo ngày (mới -> cũ). Phân vùng: chỉ nạp năm cũ khi các năm đã nạp không đủ n dòng."""
+        if self._partitioned and len(self._dates) < n and self.backend.has_cold():
+            self._ensure()
+        return [self._by_id[tid] for tid in self._dates.last(n)]
+
+    def largest(self, n: int = TOP_K, type_name: str = "expense") -> List[FrozenTransaction]:
+        """
+        n giao dịch `type_name` có amount lớn nhất (lớn -> nhỏ), dạng bất biến. Index top-K được giữ cập nhật
+        theo mỗi thao tác ghi -> O(K) mỗi lần hỏi, không sort cả sổ (chỉ lần đầu / khi xóa quá nhiều mới quét lại).
+        Trả thẳng bản lưu trong index: dòng ở năm đã bị đẩy ra không bị nạp lại.
+        """
+        index = self._tops.get(type_name)
+        if index is None:
+            index = self._tops[type_name] = TopAmountIndex(type_name, self._all_rows)
+        return index.rows(n)
+
+    def snapshot(self) -> Mapping[str, FrozenTransaction]:
+        """
+        Ảnh chụp bất biến id -> FrozenTransaction của cả sổ (thứ tự như get_all()).
+        O(1) sau lần đầu: các lần ghi sau chỉ chép bảng khi đã có ảnh chụp đang được giữ (copy-on-write).
+        """
+        if self._snap is None:
+            self._snap = SnapshotIndex.build(self._all_rows())
+        return self._snap.view()
+
+    def _all_rows(self) -> List[Transaction]:
+        """Mọi giao dịch (phân vùng: nạp đủ các năm) cho các index cần quét lại cả sổ"""
+        self._ensure()
+        return list(self._by_id.values())
+
+    # ==========================
+    # PHÂN VÙNG (BACKEND "partitioned")
+    # ==========================
+    def _ensure(self, date_from: Optional[str] = None, date_to: Optional[str] = None):
+        """Nạp các năm chưa nạp giao với [date_from, date_to] (None = không giới hạn) trước khi đọc"""
+        if not self._partitioned:
+            return
+        needed = self.backend.partitions_for(date_from, date_to)
+        loaded_any = False
+        for key in needed:
+            if not self.backend.is_loaded(key):
+                self._load_partition(key)
+                loaded_any = True
+        if loaded_any:
+            self._evict(keep=needed)
+
+    def _ensure_dates(self, dates: Iterable[str]):
+        """Trước khi ghi: năm của dòng mới phải đang nạp (compaction ghi lại cả năm từ RAM)"""
+        if not self._partitioned:
+            return
+        on_disk = set(self.backend.partitions_for())
+        for key in {partition_key(d) for d in dates}:
+            if key in on_disk and not self.backend.is_loaded(key):
+                self._load_partition(key)
+
+    def _ensure_ids(self, ids: Iterable[str]):
+        """Nạp các năm chưa nạp đang chứa các id này (tra manifest, không nạp năm nào khác)"""
+        if not self._partitioned:
+            return
+        keys = {self.backend.partition_of(tid) for tid in ids if tid not in self._by_id}
+        for key in sorted(k for k in keys if k is not None and not self.backend.is_loaded(k)):
+            self._load_partition(key)
+
+    def _load_partition(self, key: str):
+        fresh = []
+        for t in self.backend.load_partition(key):
+            if t.id in self._by_id:
+                # Trùng id với dòng ở năm khác (dữ liệu cũ / file sửa tay): không bỏ dòng nào trên đĩa,
+                # đổi id dòng này và ghi lại năm đó (tổng/cube đã tính cả 2 dòng, giữ nguyên)
+                old_id, t.id = t.id, rekey(t.id, key, self._has_id)
+                self.backend.touch(key)
+                print(f"⚠️ Phân vùng {key}: id {old_id} bị trùng, đổi thành {t.id}")
+            self._by_id[t.id] = t
+            fresh.append(t)
+        self._dates.add_many((t.id, t.date) for t in fresh)
+        for index in self._lazy_indexes():
+            for t in fresh:
+                index.add(t.id, t)
+        self._list_cache = None
+        print(f"📂 TransactionEngine: nạp phân vùng {key} ({len(fresh)} giao dịch)")
+
+    def _evict(self, keep: Iterable[str]):
+        """Vượt ngân sách RAM -> đẩy các năm ít dùng nhất ra (tổng/cube vẫn giữ nhờ manifest)"""
+        if self._pending_ops is not None:
+            return   # Đang trong unit-of-work (thay đổi chưa được ghi): không được đẩy ra
+        if self._export_pins:
+            return   # Export đang đọc thẳng từ kho sống: để lần nạp sau mới đẩy ra
+        for key in self.backend.evictable(keep):
+            ids = [k[2] for k in self._dates.range_keys(key, key + "\uffff")]
+            for tid in ids:
+                self._by_id.pop(tid, None)
+            self._dates.remove_many(ids)
+            # Index định kỳ giữ nguyên: mẫu ở năm lạnh vẫn cần cho occurrences()
+            if self._text is not None:
+                for tid in ids:
+                    self._text.remove(tid)
+            self.backend.unload(key)
+            self._list_cache = None
+
+    # ==========================
+    # AGGREGATION
+    # ==========================
+    def _account(self, key, amount: float, sign: int = 1):
+        """Cộng (sign=1) / trừ (sign=-1) 1 giao dịch vào tổng cộng dồn và cube"""
+        type_name = key[3]
+        self._totals[type_name] = self._totals.get(type_name, 0.0) + sign * amount
+        self.rollup.add(key, sign * amount, sign)
+        if sign < 0 and self._partitioned:
+            # Dòng rời khỏi năm cũ (sửa ngày / xóa) -> năm đó phải được ghi lại, chưa được đẩy ra khỏi RAM
+            self.backend.touch(partition_key(key[0]))
+
+    def _rebuild_aggregates(self):
+        """Tính lại tổng cộng dồn + cube từ đầu (sau load, hoặc khi không biết giá trị cũ)"""
+        self.rollup = RollupCube.from_transactions(self._by_id.values())
+        if self._partitioned:
+            # Năm chưa nạp: cộng các ô cube đã tính sẵn trong manifest
+            for key, amount, count in self.backend.cold_cells():
+                self.rollup.add(key, amount, count)
+        self._totals = self.rollup.sum_by("type")
+
+    def total(self, type_name: str) -> float:
+        """Tổng tiền theo loại ('income' | 'expense'), O(1)"""
+        return self._totals.get(type_name, 0.0)
+
+    def group_sum(self, column: str, type_name: str) -> Dict[str, float]:
+        """Tổng tiền theo 'category' | 'role' cho 1 loại giao dịch"""
+        if self._partitioned:
+            return self.rollup.sum_by(column, type=type_name)
+        if isinstance(self._by_id, ColumnarStore):
+            return self._by_id.group_sum(column, type_name)
+        totals: Dict[str, float] = {}
+        for t in self._by_id.values():
+            if t.type == type_name:
+                key = getattr(t, column)
+                totals[key] = totals.get(key, 0) + t.amount
+        return totals
\ No newline at end of file
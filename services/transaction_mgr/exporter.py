@@ -0,0 +1,244 @@
+import csv
+import json
+import os
+import pathlib
+import shutil
+import struct
+import tempfile
+import zipfile
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from PyQt6.QtCore import QThread, pyqtSignal
+
+from .storage import FIELDNAMES
+
+# Số dòng mỗi lô khi export (mỗi lô = 1 lần đọc Engine + 1 lần báo tiến độ)
+EXPORT_CHUNK_SIZE = 5000
+
+# Đuôi file -> định dạng
+EXPORT_FORMATS = {
+    ".csv": "CSV",
+    ".jsonl": "JSON Lines",
+    ".npz": "NumPy (.npz)",
+}
+# Bộ lọc cho QFileDialog
+EXPORT_FILE_FILTER = "CSV Files (*.csv);;JSON Lines (*.jsonl);;NumPy Archive (*.npz)"
+
+# Kiểu cột trong .npz (số -> mảng số, còn lại -> chuỗi unicode độ dài cố định)
+_NUMERIC_COLUMNS = {"amount": "<f8", "is_recurring": "|b1"}
+
+RowsReader = Callable[[List[str]], List[Dict]]
+
+
+def export_format(path: str) -> str:
+    """Đuôi file đã chuẩn hóa ('.csv' | '.jsonl' | '.npz'); không có đuôi -> '.csv'"""
+    suffix = pathlib.Path(path).suffix.lower()
+    if not suffix:
+        return ".csv"
+    if suffix not in EXPORT_FORMATS:
+        raise ValueError(f"Không hỗ trợ export định dạng {suffix} (chỉ có {', '.join(EXPORT_FORMATS)})")
+    return suffix
+
+
+def _typed(row: Dict) -> Dict:
+    """Dòng dạng CSV (chuỗi) -> giá trị có kiểu cho JSON Lines"""
+    out = dict(row)
+    out["amount"] = float(row["amount"])
+    out["is_recurring"] = str(row["is_recurring"]) == "True"
+    return out
+
+
+def iter_export_chunks(ids: List[str], read_rows: RowsReader,
+                       chunk_size: int = EXPORT_CHUNK_SIZE) -> Iterator[Tuple[List[Dict], int]]:
+    """
+    Đọc giá trị theo từng lô id (không chép cả sổ ra RAM).
+    Yield (các dòng của lô, phần trăm đã xong). Id đã bị xóa giữa chừng thì bỏ qua.
+    """
+    total = len(ids) or 1
+    for start in range(0, len(ids), chunk_size):
+        end = min(start + chunk_size, len(ids))
+        yield read_rows(ids[start:end]), end * 100 // total
+
+
+# ==========================
+# WRITER TỪNG ĐỊNH DẠNG
+# ==========================
+class _CsvWriter:
+    def __init__(self, f):
+        self._writer = csv.DictWriter(f, fieldnames=FIELDNAMES)
+        self._writer.writeheader()
+
+    def write(self, rows: List[Dict]):
+        self._writer.writerows(rows)
+
+
+class _JsonLinesWriter:
+    def __init__(self, f):
+        self._f = f
+
+    def write(self, rows: List[Dict]):
+        self._f.write("".join(json.dumps(_typed(r), ensure_ascii=False) + "\n" for r in rows))
+
+
+class _NpzWriter:
+    """
+    File .npz = zip gồm mỗi cột 1 file .npy (đọc được bằng numpy.load, không cần numpy để ghi).
+    Header .npy cần biết số dòng và độ dài chuỗi dài nhất, nên từng cột được ghi tạm ra đĩa
+    trong lúc stream rồi mới gói lại ở close() -> RAM chỉ giữ 1 lô.
+    """
+    def __init__(self, tmp_dir: pathlib.Path):
+        self._dir = tmp_dir
+        self._files = {}
+        try:
+            for name in FIELDNAMES:
+                self._files[name] = open(tmp_dir / name, "wb")
+        except OSError:
+            self.discard()
+            raise
+        self._width = {name: 1 for name in FIELDNAMES if name not in _NUMERIC_COLUMNS}
+        self.count = 0
+
+    def write(self, rows: List[Dict]):
+        if not rows:
+            return
+        self.count += len(rows)
+        for name, f in self._files.items():
+            if name == "amount":
+                f.write(struct.pack(f"<{len(rows)}d", *(float(r["amount"]) for r in rows)))
+            elif name == "is_recurring":
+                f.write(bytes(str(r["is_recurring"]) == "True" for r in rows))
+            else:
+                values = [str(r[name] or "") for r in rows]
+                self._width[name] = max(self._width[name], max(len(v) for v in values))
+                f.write("".join(json.dumps(v, ensure_ascii=False) + "\n" for v in values).encode("utf-8"))
+
+    @staticmethod
+    def _npy_header(descr: str, count: int) -> bytes:
+        """Header .npy v1.0, căn lề 64 byte như numpy"""
+        header = "{'descr': '%s', 'fortran_order': False, 'shape': (%d,), }" % (descr, count)
+        pad = 64 - (10 + len(header) + 1) % 64
+        header = (header + " " * pad + "\n").encode("latin1")
+        return b"\x93NUMPY\x01\x00" + struct.pack("<H", len(header)) + header
+
+    def discard(self):
+        """Hủy / lỗi giữa chừng: đóng và xóa các file cột tạm (gọi nhiều lần cũng được)"""
+        for f in self._files.values():
+            f.close()
+        for name in self._files:
+            (self._dir / name).unlink(missing_ok=True)
+
+    def close(self, path: pathlib.Path):
+        for f in self._files.values():
+            f.close()
+        with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED, allowZip64=True) as zf:
+            for name in FIELDNAMES:
+                src = self._dir / name
+                with zf.open(f"{name}.npy", "w", force_zip64=True) as out:
+                    if name in _NUMERIC_COLUMNS:
+                        out.write(self._npy_header(_NUMERIC_COLUMNS[name], self.count))
+                        with open(src, "rb") as f:
+                            shutil.copyfileobj(f, out)
+                        continue
+                    width = self._width[name]
+                    out.write(self._npy_header(f"<U{width}", self.count))
+                    with open(src, encoding="utf-8") as f:
+                        batch = []
+                        for line in f:
+                            # Unicode độ dài cố định của numpy = UTF-32 LE, đệm \0 tới đủ width ký tự
+                            batch.append(json.loads(line).ljust(width, "\0"))
+                            if len(batch) >= EXPORT_CHUNK_SIZE:
+                                out.write("".join(batch).encode("utf-32-le"))
+                                batch = []
+                        out.write("".join(batch).encode("utf-32-le"))
+
+
+def write_export(path: str, ids: List[str], read_rows: RowsReader,
+                 progress: Optional[Callable[[int], None]] = None,
+                 cancelled: Optional[Callable[[], bool]] = None) -> int:
+    """
+    Ghi các giao dịch `ids` ra `path` theo định dạng của đuôi file, từng lô một.
+    Ghi vào file tạm rồi os.replace -> hủy / lỗi giữa chừng không để lại file dở.
+    `read_rows` có close() (vd: ExportPin của Engine) thì được gọi khi xong / hủy / lỗi.
+    Trả về số dòng đã ghi (-1 nếu bị hủy).
+    """
+    try:
+        return _write_export(path, ids, read_rows, progress, cancelled)
+    finally:
+        close = getattr(read_rows, "close", None)
+        if close is not None:
+            close()
+
+
+def _write_export(path: str, ids: List[str], read_rows: RowsReader,
+                  progress: Optional[Callable[[int], None]],
+                  cancelled: Optional[Callable[[], bool]]) -> int:
+    fmt = export_format(path)
+    target = pathlib.Path(path if pathlib.Path(path).suffix else path + fmt)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp = target.with_name(target.name + ".tmp")
+    work_dir = pathlib.Path(tempfile.mkdtemp(prefix="export_")) if fmt == ".npz" else None
+    writer = None
+    count = 0
+    try:
+        if work_dir is not None:
+            writer = _NpzWriter(work_dir)
+            f = None
+        else:
+            # utf-8-sig giống file CSV của app (Excel đọc đúng tiếng Việt)
+            f = open(tmp, "w", encoding="utf-8-sig" if fmt == ".csv" else "utf-8", newline="")
+            writer = _CsvWriter(f) if fmt == ".csv" else _JsonLinesWriter(f)
+        try:
+            for rows, percent in iter_export_chunks(ids, read_rows):
+                if cancelled is not None and cancelled():
+                    return -1
+                writer.write(rows)
+                count += len(rows)
+                if progress is not None:
+                    progress(min(99, percent))
+        finally:
+            if f is not None:
+                f.close()
+        if work_dir is not None:
+            writer.close(tmp)
+        os.replace(tmp, target)
+        if progress is not None:
+            progress(100)
+        return count
+    finally:
+        if tmp.exists():
+            tmp.unlink()
+        if work_dir is not None:
+            if writer is not None:
+                writer.discard()
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+
+class ExportWorker(QThread):
+    """
+    Ghi file export ở thread riêng. Danh sách id và giá trị (TransactionEngine.export_reader) được chốt
+    trên GUI thread trước khi start (O(1)), worker chỉ đọc giá trị đã chốt nên GUI vẫn sửa sổ được trong lúc export.
+    """
+    progress = pyqtSignal(int)
+    failed = pyqtSignal(str)
+
+    def __init__(self, path: str, ids: List[str], read_rows: RowsReader):
+        super().__init__()
+        self.path = path
+        self.ids = ids
+        self.read_rows = read_rows
+        self.exported = 0
+        self._cancelled = False
+
+    def cancel(self):
+        self._cancelled = True
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled
+
+    def run(self):
+        try:
+            self.exported = write_export(self.path, self.ids, self.read_rows,
+                                         progress=self.progress.emit, cancelled=lambda: self._cancelled)
+        except Exception as e:
+            self.failed.emit(str(e))
@@ -0,0 +1,114 @@
+import threading
+from types import MappingProxyType
+from typing import Callable, Dict, Iterable, List, Mapping, NamedTuple, Optional
+
+
+class FrozenTransaction(NamedTuple):
+    """Bản bất biến của 1 giao dịch (cùng tên thuộc tính như Transaction) -> đọc được từ mọi thread"""
+    id: str
+    date: str
+    category: str
+    amount: float
+    type: str
+    role: str
+    description: str = ""
+    expiry_date: str = ""
+    is_recurring: bool = False
+    cycle: str = "Tháng"
+
+    def to_dict(self):
+        return self._asdict()
+
+
+def freeze(t) -> FrozenTransaction:
+    """Transaction / TransactionRow (view sống) -> bản bất biến"""
+    if isinstance(t, FrozenTransaction):
+        return t
+    return FrozenTransaction(t.id, t.date, t.category, t.amount, t.type, t.role, t.description or "",
+                             t.expiry_date or "", bool(t.is_recurring), t.cycle)
+
+
+class SnapshotIndex:
+    """
+    Bảng id -> FrozenTransaction, copy-on-write.
+    - view() trả về MappingProxyType trỏ thẳng vào dict hiện tại: O(1), không chép gì.
+    - Lần ghi đầu tiên sau khi đã phát view thì chép dict (chỉ chép con trỏ, các dòng bất biến
+      được dùng chung) rồi mới sửa -> view đã phát không bao giờ đổi, thread khác đọc không cần khóa.
+    """
+    def __init__(self):
+        self._rows: Dict[str, FrozenTransaction] = {}
+        self._shared = False
+
+    @classmethod
+    def build(cls, transactions: Iterable) -> "SnapshotIndex":
+        index = cls()
+        index._rows = {t.id: freeze(t) for t in transactions}
+        return index
+
+    def __len__(self):
+        return len(self._rows)
+
+    def _own(self):
+        if self._shared:
+            self._rows = dict(self._rows)
+            self._shared = False
+
+    def add(self, tid: str, t):
+        row = freeze(t)
+        if self._rows.get(tid) == row:
+            return   # Nạp lại phân vùng / sửa không đổi giá trị -> khỏi chép
+        self._own()
+        self._rows[tid] = row
+
+    def remove(self, tid: str):
+        if tid in self._rows:
+            self._own()
+            del self._rows[tid]
+
+    def view(self) -> Mapping[str, FrozenTransaction]:
+        self._shared = True
+        return MappingProxyType(self._rows)
+
+
+class ExportPin:
+    """
+    Chốt giá trị của 1 lần export mà không chép trước cả sổ (bắt đầu export là O(1) trên GUI thread).
+    - Engine gọi keep(id, dòng cũ) TRƯỚC mỗi lần sửa / xóa 1 id trong lúc export còn chạy -> giữ bản bất biến cũ.
+    - Worker đọc từng lô: id đã được giữ thì lấy bản cũ, còn lại freeze thẳng từ kho sống
+      (dòng đó chưa bị đụng tới kể từ lúc bắt đầu). Hai phía cùng khóa nên không bao giờ đọc dòng đang sửa dở.
+    Chỉ các dòng bị sửa trong lúc export mới tốn thêm RAM.
+    """
+    def __init__(self, source: Callable[[str], Optional[object]], on_close: Callable[["ExportPin"], None],
+                 convert: Callable[[FrozenTransaction], object] = lambda t: t):
+        self._source = source                 # id -> dòng trong kho sống (None: không có)
+        self._on_close = on_close
+        self._convert = convert               # Định dạng trả cho worker (vd: dòng dict như CSV)
+        self._lock = threading.Lock()
+        self._kept: Dict[str, Optional[FrozenTransaction]] = {}   # id -> giá trị lúc bắt đầu (None: chưa tồn tại)
+
+    def keep(self, tid: str, old):
+        """Gọi trên GUI thread trước khi đổi `tid` (old = giá trị hiện tại, None nếu chưa có)"""
+        with self._lock:
+            if tid not in self._kept:
+                self._kept[tid] = None if old is None else freeze(old)
+
+    def read(self, batch: List[str]) -> List[FrozenTransaction]:
+        """Gọi ở worker: giá trị lúc bắt đầu export của 1 lô id (id không còn / chưa có thì bỏ qua)"""
+        out = []
+        with self._lock:
+            for tid in batch:
+                if tid in self._kept:
+                    row = self._kept.pop(tid)   # Mỗi id chỉ đọc 1 lần -> bỏ luôn bản giữ
+                else:
+                    row = self._source(tid)
+                    row = None if row is None else freeze(row)
+                if row is not None:
+                    out.append(row)
+        return out
+
+    def __call__(self, batch: List[str]) -> List:
+        """Dùng trực tiếp làm hàm đọc từng lô cho write_export / ExportWorker"""
+        return [self._convert(t) for t in self.read(batch)]
+
+    def close(self):
+        self._on_close(self)
@@ -0,0 +1,97 @@
+import csv
+import io
+import os
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from PyQt6.QtCore import QThread, pyqtSignal
+
+from models import Transaction
+from core.parallel_csv import parallel_parse, parse_transaction_range, should_parallelize
+
+# Số dòng mỗi lô khi import (mỗi lô = 1 lần bắn signal về GUI)
+IMPORT_CHUNK_SIZE = 5000
+
+
+def normalize_import_row(row: Dict) -> Transaction:
+    """Chuẩn hóa 1 dòng CSV bên ngoài (file ngân hàng, file export cũ...) thành Transaction"""
+    return Transaction(
+        id=row.get("id") or "",
+        date=row["date"],
+        category=row["category"],
+        amount=float(row["amount"]),
+        type=row["type"],
+        role=row["role"],
+        description=row.get("description") or "",
+        expiry_date=row.get("expiry_date") or "",
+        is_recurring=str(row.get("is_recurring", "False")).lower() == "true",
+        cycle=row.get("cycle") or "Tháng",
+    )
+
+
+def iter_csv_batches(path: str, chunk_size: int = IMPORT_CHUNK_SIZE,
+                     parallel: Optional[bool] = None) -> Iterator[Tuple[List[Transaction], int]]:
+    """
+    Đọc CSV theo từng lô, không nạp cả file vào RAM.
+    Yield (lô Transaction, phần trăm đã đọc theo byte).
+    File rất lớn (hoặc parallel=True) được parse song song bằng nhiều process,
+    thứ tự lô vẫn giữ đúng như trong file.
+    """
+    if should_parallelize(path, parallel):
+        yield from _iter_parallel_batches(path)
+        return
+
+    total = os.path.getsize(path) or 1
+    with open(path, "rb") as raw:
+        text = io.TextIOWrapper(raw, encoding="utf-8-sig", newline="")
+        batch: List[Transaction] = []
+        for row in csv.DictReader(text):
+            batch.append(normalize_import_row(row))
+            if len(batch) >= chunk_size:
+                yield batch, min(99, raw.tell() * 100 // total)
+                batch = []
+        yield batch, 100
+
+
+def _iter_parallel_batches(path: str) -> Iterator[Tuple[List[Transaction], int]]:
+    for cols, done, total in parallel_parse(path, parse_transaction_range):
+        ids, dates, cats, amounts, types, roles, descs, expiry, recurring, cycles = cols
+        batch = [
+            Transaction(*row[:8], is_recurring=bool(row[8]), cycle=row[9])
+            for row in zip(ids, dates, cats, amounts, types, roles, descs, expiry, recurring, cycles)
+        ]
+        yield batch, min(99, done * 100 // total) if done < total else 100
+
+
+class ImportWorker(QThread):
+    """
+    Parse file CSV ở thread riêng, bắn từng lô về GUI thread.
+    Việc thêm vào Engine vẫn diễn ra trên GUI thread (slot của batch_ready),
+    nên Engine không bị 2 thread cùng sửa.
+    """
+    batch_ready = pyqtSignal(list)
+    progress = pyqtSignal(int)
+    failed = pyqtSignal(str)
+
+    def __init__(self, path: str, chunk_size: int = IMPORT_CHUNK_SIZE):
+        super().__init__()
+        self.path = path
+        self.chunk_size = chunk_size
+        self._cancelled = False
+
+    def cancel(self):
+        self._cancelled = True
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled
+
+    def run(self):
+        try:
+            for batch, percent in iter_csv_batches(self.path, self.chunk_size):
+                if self._cancelled:
+                    return
+                if batch:
+                    self.batch_ready.emit(batch)
+                self.progress.emit(percent)
+        except Exception as e:
+            self.failed.emit(str(e))
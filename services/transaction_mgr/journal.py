@@ -0,0 +1,127 @@
+import json
+import os
+import pathlib
+import threading
+from typing import Callable, Dict, List, Optional
+
+
+class TransactionJournal:
+    """
+    Nhật ký thay đổi dạng append-only (JSON Lines) nằm cạnh file CSV gốc.
+    Mỗi thao tác add/update/delete chỉ ghi thêm 1 dòng nhỏ thay vì ghi lại toàn bộ CSV.
+
+    - `<file>.journal`   : nhật ký đang ghi.
+    - `<file>.journal.1` : nhật ký đã "xoay" (rotate), đang được gộp (compact) vào CSV gốc.
+      Nếu app tắt giữa chừng, file này vẫn còn và sẽ được replay lại khi load.
+    Replay có tính idempotent: add/update = ghi đè theo id, delete id không tồn tại = bỏ qua.
+    """
+    def __init__(self, base_path: pathlib.Path):
+        self.path = base_path.with_name(base_path.name + ".journal")
+        self.rotated_path = base_path.with_name(base_path.name + ".journal.1")
+        self._fh = None
+        self._lock = threading.Lock()
+        self.count = 0  # Số bản ghi trong nhật ký đang ghi
+
+    # ==========================
+    # GHI
+    # ==========================
+    def append(self, op: str, row: Optional[Dict] = None, tid: Optional[str] = None):
+        """Ghi thêm 1 bản ghi: op = 'add' | 'update' | 'delete'"""
+        record = {"op": op}
+        if row is not None:
+            record["row"] = row
+        if tid is not None:
+            record["id"] = tid
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock:
+            if self._fh is None:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                self._fh = open(self.path, "a", encoding="utf-8")
+            self._fh.write(line)
+            self._fh.flush()
+            self.count += 1
+
+    def append_many(self, op: str, rows: Optional[List[Dict]] = None, ids: Optional[List[str]] = None):
+        """Ghi cả lô bản ghi bằng 1 lần write (import / sửa / xóa hàng loạt). Lô xóa truyền `ids`."""
+        if ids is not None:
+            records = [{"op": op, "id": tid} for tid in ids]
+        else:
+            records = [{"op": op, "row": r} for r in rows or ()]
+        self.append_records(records)
+
+    def append_records(self, records: List[Dict]):
+        """Ghi nhiều bản ghi (có thể khác op, vd: 1 unit-of-work) bằng 1 lần write"""
+        if not records:
+            return
+        data = "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records)
+        with self._lock:
+            if self._fh is None:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                self._fh = open(self.path, "a", encoding="utf-8")
+            self._fh.write(data)
+            self._fh.flush()
+            self.count += len(records)
+
+    def rotate(self) -> bool:
+        """
+        Chuyển nhật ký hiện tại sang `.journal.1` để gộp ở background.
+        Trả về False nếu lần gộp trước chưa xong (file `.journal.1` vẫn còn).
+        """
+        with self._lock:
+            if self.rotated_path.exists():
+                return False
+            self._close()
+            if self.path.exists():
+                os.replace(self.path, self.rotated_path)
+            self.count = 0
+            return True
+
+    def drop_rotated(self):
+        """Gọi sau khi CSV gốc đã chứa đủ dữ liệu của `.journal.1`"""
+        with self._lock:
+            self.rotated_path.unlink(missing_ok=True)
+
+    def reset(self):
+        """Xóa sạch nhật ký (sau khi đã ghi lại toàn bộ CSV)"""
+        with self._lock:
+            self._close()
+            self.path.unlink(missing_ok=True)
+            self.rotated_path.unlink(missing_ok=True)
+            self.count = 0
+
+    def close(self):
+        with self._lock:
+            self._close()
+
+    def _close(self):
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
+
+    # ==========================
+    # ĐỌC (REPLAY)
+    # ==========================
+    def replay(self, apply: Callable[[Dict], None]) -> int:
+        """Đọc lại `.journal.1` rồi `.journal` theo đúng thứ tự, gọi apply(record) cho từng dòng"""
+        total = 0
+        for path in (self.rotated_path, self.path):
+            if not path.exists():
+                continue
+            n = 0
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        # Dòng cuối bị ghi dở (mất điện/crash) -> bỏ qua
+                        print(f"⚠️ Journal: bỏ qua dòng hỏng trong {path.name}")
+                        continue
+                    apply(record)
+                    n += 1
+            total += n
+            if path == self.path:
+                self.count = n
+        return total
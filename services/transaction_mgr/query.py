@@ -0,0 +1,138 @@
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Callable, Dict, FrozenSet, Iterable, Iterator, List, Optional
+
+from .rollup import RollupCube, rollup_key
+
+if TYPE_CHECKING:
+    from .engine import TransactionEngine
+
+
+@dataclass(frozen=True)
+class TransactionQuery:
+    """
+    Bộ lọc khai báo cho TransactionEngine.query(). Trường None = không lọc.
+    order: "ledger" (thứ tự trong sổ, như bảng giao dịch) | "date" (tăng dần theo ngày).
+    """
+    date_from: Optional[str] = None
+    date_to: Optional[str] = None
+    type_name: Optional[str] = None
+    roles: Optional[FrozenSet[str]] = None
+    categories: Optional[FrozenSet[str]] = None
+    text: str = ""
+    amount_min: Optional[float] = None
+    amount_max: Optional[float] = None
+    recurring: Optional[bool] = None
+    order: str = "ledger"
+
+    @classmethod
+    def make(cls, roles: Optional[Iterable[str]] = None, categories: Optional[Iterable[str]] = None,
+             **fields) -> "TransactionQuery":
+        """Nhận roles/categories là iterable bất kỳ (list, set...)"""
+        return cls(roles=None if roles is None else frozenset(roles),
+                   categories=None if categories is None else frozenset(categories),
+                   **fields)
+
+    @property
+    def has_date(self) -> bool:
+        return self.date_from is not None or self.date_to is not None
+
+    @property
+    def cube_only(self) -> bool:
+        """Chỉ lọc theo chiều có trong RollupCube -> tổng hợp đọc thẳng từ cube, không cần duyệt"""
+        return not (self.has_date or self.text or self.amount_min is not None
+                    or self.amount_max is not None or self.recurring is not None)
+
+    def predicate(self, skip: FrozenSet[str] = frozenset()) -> Optional[Callable]:
+        """Hàm kiểm tra từng giao dịch cho các điều kiện chưa được index xử lý (None = không cần kiểm tra)"""
+        checks = []
+        if self.type_name is not None and "type" not in skip:
+            checks.append(lambda t, v=self.type_name: t.type == v)
+        if self.roles is not None and "roles" not in skip:
+            checks.append(lambda t, v=self.roles: t.role in v)
+        if self.categories is not None and "categories" not in skip:
+            checks.append(lambda t, v=self.categories: t.category in v)
+        if self.date_from is not None and "date" not in skip:
+            checks.append(lambda t, v=self.date_from: v <= t.date)
+        if self.date_to is not None and "date" not in skip:
+            checks.append(lambda t, v=self.date_to: t.date <= v)
+        if self.amount_min is not None:
+            checks.append(lambda t, v=self.amount_min: t.amount >= v)
+        if self.amount_max is not None:
+            checks.append(lambda t, v=self.amount_max: t.amount <= v)
+        if self.recurring is not None:
+            checks.append(lambda t, v=self.recurring: bool(t.is_recurring) == v)
+        if not checks:
+            return None
+        if len(checks) == 1:
+            return checks[0]
+        return lambda t: all(c(t) for c in checks)
+
+
+class QueryResult:
+    """
+    Kết quả lười (lazy) của TransactionEngine.query(): chỉ duyệt khi lặp hoặc gọi hàm tổng hợp.
+    Mỗi lần lặp lại chạy lại truy vấn trên dữ liệu hiện tại của Engine.
+    """
+    def __init__(self, engine: "TransactionEngine", query: TransactionQuery):
+        self._engine = engine
+        self.query = query
+
+    def __iter__(self) -> Iterator:
+        return self._engine._execute(self.query)
+
+    def ids(self) -> Iterator[str]:
+        return (t.id for t in self)
+
+    def list(self) -> List:
+        return list(self)
+
+    def first(self):
+        return next(iter(self), None)
+
+    # ==========================
+    # TỔNG HỢP
+    # ==========================
+    def rollup(self) -> RollupCube:
+        """Cube của riêng kết quả. Không lọc gì -> dùng luôn cube Engine đang duy trì."""
+        q = self.query
+        if q.cube_only and q.type_name is None and q.roles is None and q.categories is None:
+            return self._engine.rollup
+        cube = RollupCube()
+        for t in self:
+            cube.add(rollup_key(t), t.amount)
+        return cube
+
+    def _cube_totals(self, dimension: str) -> Dict[str, float]:
+        """Tổng theo 1 chiều đọc thẳng từ cube của Engine (chỉ dùng khi query.cube_only)"""
+        q = self.query
+        cube = self._engine.rollup
+        out: Dict[str, float] = {}
+        for role in (q.roles or (None,)):
+            for cat in (q.categories or (None,)):
+                for key, value in cube.sum_by(dimension, type=q.type_name, role=role, category=cat).items():
+                    out[key] = out.get(key, 0) + value
+        return out
+
+    def count(self) -> int:
+        if self.query.cube_only:
+            q, cube = self.query, self._engine.rollup
+            return sum(cube.count(type=q.type_name, role=r, category=c)
+                       for r in (q.roles or (None,)) for c in (q.categories or (None,)))
+        return sum(1 for _ in self)
+
+    def total(self) -> float:
+        """Tổng tiền của kết quả"""
+        if self.query.cube_only:
+            return sum(self._cube_totals("type").values())
+        return sum(t.amount for t in self)
+
+    def group_sum(self, dimension: str) -> Dict[str, float]:
+        """Tổng tiền nhóm theo 'month' | 'category' | 'role' | 'type' | 'date'"""
+        if dimension != "date" and self.query.cube_only:
+            return self._cube_totals(dimension)
+        key = (lambda t: t.date[:7]) if dimension == "month" else (lambda t: getattr(t, dimension))
+        out: Dict[str, float] = {}
+        for t in self:
+            k = key(t)
+            out[k] = out.get(k, 0) + t.amount
+        return out
@@ -0,0 +1,162 @@
+import calendar
+from collections import OrderedDict
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from models import Transaction
+
+# Giá trị Transaction.cycle (ô chọn chu kỳ trong TransactionDialog)
+CYCLE_WEEK = "Tuần"
+CYCLE_MONTH = "Tháng"
+CYCLE_YEAR = "Năm"
+
+# id lần phát sinh = "<id mẫu>@<ngày>" -> không trùng id thật, biết được mẫu gốc
+OCCURRENCE_SEP = "@"
+# Số khoảng ngày giữ trong cache (LRU) và số lần phát sinh tối đa / mẫu / lần gọi
+RANGE_CACHE_SIZE = 32
+MAX_PER_TEMPLATE = 10_000
+
+_FIELDS = ("date", "category", "amount", "type", "role", "description", "expiry_date", "cycle")
+
+
+def template_id(occurrence_id: str) -> str:
+    """id giao dịch mẫu của 1 lần phát sinh"""
+    return occurrence_id.partition(OCCURRENCE_SEP)[0]
+
+
+def _to_date(value: str) -> Optional[date]:
+    """ISO 'YYYY-MM-DD' -> date; ngày vượt cuối tháng (vd: '2025-02-31' dùng làm mốc cuối tháng) bị kẹp lại"""
+    try:
+        y, m, d = int(value[:4]), int(value[5:7]), int(value[8:10])
+        return date(y, m, min(d, calendar.monthrange(y, m)[1]))
+    except (TypeError, ValueError, IndexError):
+        return None
+
+
+def _add_months(anchor: date, months: int) -> date:
+    """Cộng tháng, giữ ngày của mốc gốc (31/1 -> 29/2 -> 31/3, không trôi dần về 28)"""
+    total = anchor.year * 12 + anchor.month - 1 + months
+    y, m = divmod(total, 12)
+    m += 1
+    return date(y, m, min(anchor.day, calendar.monthrange(y, m)[1]))
+
+
+def occurrence_dates(anchor: date, cycle: str, start: str, end: str,
+                     expiry: Optional[date] = None) -> List[str]:
+    """
+    Các ngày phát sinh (ISO) trong [start, end] của 1 giao dịch định kỳ có ngày gốc `anchor`.
+    Không gồm chính ngày gốc (đó là dòng thật trong sổ), dừng ở expiry (nếu có).
+    """
+    lo, hi = _to_date(start), _to_date(end)
+    if lo is None or hi is None:
+        return []
+    if expiry is not None and expiry < hi:
+        hi = expiry
+    if hi <= anchor:
+        return []
+
+    if cycle == CYCLE_WEEK:
+        n = max(1, (lo - anchor).days // 7)
+        step = lambda k: anchor + timedelta(days=7 * k)
+    elif cycle == CYCLE_YEAR:
+        n = max(1, lo.year - anchor.year)
+        step = lambda k: _add_months(anchor, 12 * k)
+    else:
+        # Mặc định (và dữ liệu cũ không có cycle) là hàng tháng
+        n = max(1, (lo.year * 12 + lo.month) - (anchor.year * 12 + anchor.month))
+        step = lambda k: _add_months(anchor, k)
+
+    out: List[str] = []
+    for k in range(n, n + MAX_PER_TEMPLATE):
+        d = step(k)
+        if d > hi:
+            break
+        iso = d.isoformat()
+        if start <= iso <= end:
+            out.append(iso)
+    return out
+
+
+class RecurrenceIndex:
+    """
+    Sinh các lần phát sinh của giao dịch định kỳ (is_recurring) theo yêu cầu, không lưu thành dòng thật.
+    - Chỉ giữ bản sao các giao dịch mẫu (thường vài chục dòng), không quét cả sổ mỗi lần hỏi.
+    - Kết quả cache theo (mẫu, khoảng ngày) và theo khoảng ngày (LRU). Mẫu đổi/xóa -> chỉ bỏ cache của mẫu đó
+      (và các khoảng đã gộp).
+    """
+    def __init__(self):
+        self._templates: Dict[str, Tuple] = {}                         # id -> giá trị các trường trong _FIELDS
+        self._dates: Dict[str, Dict[Tuple[str, str], List[str]]] = {}  # id -> (start, end) -> ngày phát sinh
+        self._ranges: "OrderedDict[Tuple[str, str], List[Transaction]]" = OrderedDict()
+
+    @classmethod
+    def build(cls, transactions: Iterable) -> "RecurrenceIndex":
+        index = cls()
+        for t in transactions:
+            if t.is_recurring:
+                index.add(t.id, t)
+        return index
+
+    def __len__(self):
+        return len(self._templates)
+
+    # ==========================
+    # CẬP NHẬT
+    # ==========================
+    def add(self, tid: str, t):
+        """Thêm / cập nhật 1 giao dịch. Không còn định kỳ thì gỡ khỏi danh sách mẫu."""
+        if not t.is_recurring:
+            self.remove(tid)
+            return
+        # Chép giá trị ra tuple: TransactionRow của ColumnarStore là view sống
+        values = tuple(getattr(t, f, "") for f in _FIELDS)
+        if self._templates.get(tid) == values:
+            return
+        self._templates[tid] = values
+        self._invalidate(tid)
+
+    def remove(self, tid: str):
+        if self._templates.pop(tid, None) is not None:
+            self._invalidate(tid)
+
+    def _invalidate(self, tid: str):
+        self._dates.pop(tid, None)
+        self._ranges.clear()
+
+    # ==========================
+    # TRUY VẤN
+    # ==========================
+    def dates(self, tid: str, start: str, end: str) -> List[str]:
+        """Ngày phát sinh của 1 mẫu trong [start, end] (có cache)"""
+        cache = self._dates.setdefault(tid, {})
+        key = (start, end)
+        found = cache.get(key)
+        if found is None:
+            values = self._templates[tid]
+            anchor = _to_date(values[0])
+            found = [] if anchor is None else occurrence_dates(
+                anchor, values[7], start, end, _to_date(values[6]) if values[6] else None)
+            if len(cache) >= RANGE_CACHE_SIZE:
+                cache.clear()
+            cache[key] = found
+        return found
+
+    def occurrences(self, start: str, end: str) -> List[Transaction]:
+        """Mọi lần phát sinh trong [start, end] (ISO, gồm 2 đầu), sắp theo ngày"""
+        key = (start, end)
+        found = self._ranges.get(key)
+        if found is not None:
+            self._ranges.move_to_end(key)
+            return found
+
+        found = []
+        for tid, values in self._templates.items():
+            _, category, amount, type_, role, description, expiry, cycle = values
+            for iso in self.dates(tid, start, end):
+                found.append(Transaction(f"{tid}{OCCURRENCE_SEP}{iso}", iso, category, amount, type_, role,
+                                         description, expiry_date=expiry, is_recurring=True, cycle=cycle))
+        found.sort(key=lambda o: o.date)   # sort ổn định: cùng ngày giữ thứ tự mẫu trong sổ
+        self._ranges[key] = found
+        if len(self._ranges) > RANGE_CACHE_SIZE:
+            self._ranges.popitem(last=False)
+        return found
@@ -0,0 +1,123 @@
+from typing import Dict, Iterable, Optional, Tuple
+
+# Thứ tự chiều trong khóa của cube
+DIMENSIONS = ("month", "category", "role", "type")
+_DIM_INDEX = {name: i for i, name in enumerate(DIMENSIONS)}
+
+RollupKey = Tuple[str, str, str, str]
+
+
+def rollup_key(t) -> RollupKey:
+    """(yyyy-mm, danh mục, thành viên, loại) của 1 giao dịch"""
+    return (t.date[:7], t.category, t.role, t.type)
+
+
+class RollupCube:
+    """
+    Bảng tổng hợp sẵn (materialized rollup): (tháng, danh mục, thành viên, loại) -> [tổng tiền, số giao dịch].
+    TransactionEngine cập nhật O(1) mỗi lần thêm/sửa/xóa, nên các biểu đồ & prompt AI
+    chỉ cần đọc vài trăm ô thay vì quét lại toàn bộ sổ giao dịch.
+    """
+    def __init__(self):
+        self._cells: Dict[RollupKey, list] = {}
+
+    @classmethod
+    def from_transactions(cls, transactions: Iterable) -> "RollupCube":
+        """Dựng cube từ 1 danh sách bất kỳ (vd: kết quả lọc trên UI)"""
+        cube = cls()
+        for t in transactions:
+            cube.add(rollup_key(t), t.amount)
+        return cube
+
+    # ==========================
+    # CẬP NHẬT
+    # ==========================
+    def add(self, key: RollupKey, amount: float, count: int = 1):
+        cell = self._cells.get(key)
+        if cell is None:
+            cell = self._cells[key] = [0.0, 0]
+        cell[0] += amount
+        cell[1] += count
+        # Ô rỗng thì bỏ hẳn để không còn danh mục/thành viên "ma" trên biểu đồ
+        if cell[1] <= 0:
+            del self._cells[key]
+
+    def clear(self):
+        self._cells.clear()
+
+    def copy(self) -> "RollupCube":
+        """Bản sao độc lập O(số ô) -> đọc ở thread khác trong lúc Engine vẫn cập nhật bản gốc"""
+        cube = RollupCube()
+        cube._cells = {key: list(cell) for key, cell in self._cells.items()}
+        return cube
+
+    def __len__(self):
+        return len(self._cells)
+
+    # ==========================
+    # TRUY VẤN
+    # ==========================
+    def _match(self, filters: Dict[str, Optional[str]]):
+        conds = [(_DIM_INDEX[k], v) for k, v in filters.items() if v is not None]
+        for key, cell in self._cells.items():
+            if all(key[i] == v for i, v in conds):
+                yield key, cell
+
+    def total(self, **filters) -> float:
+        """Tổng tiền theo bộ lọc chiều, vd: total(type="expense", month="2025-01")"""
+        return sum(cell[0] for _, cell in self._match(filters))
+
+    def count(self, **filters) -> int:
+        """Số giao dịch theo bộ lọc chiều"""
+        return sum(cell[1] for _, cell in self._match(filters))
+
+    def sum_by(self, dimension: str, **filters) -> Dict[str, float]:
+        """Tổng tiền nhóm theo 1 chiều, vd: sum_by("category", type="expense")"""
+        idx = _DIM_INDEX[dimension]
+        out: Dict[str, float] = {}
+        for key, cell in self._match(filters):
+            out[key[idx]] = out.get(key[idx], 0) + cell[0]
+        return out
+
+    def pivot(self, row: str, col: str, **filters) -> Dict[str, Dict[str, float]]:
+        """Bảng 2 chiều, vd: pivot("month", "type") -> {"2025-01": {"income": .., "expense": ..}}"""
+        ri, ci = _DIM_INDEX[row], _DIM_INDEX[col]
+        out: Dict[str, Dict[str, float]] = {}
+        for key, cell in self._match(filters):
+            inner = out.setdefault(key[ri], {})
+            inner[key[ci]] = inner.get(key[ci], 0) + cell[0]
+        return out
+
+    def sum_by_other(self, dimension: str, type_name: str, **filters) -> Dict[str, float]:
+        """
+        Tổng tiền nhóm theo 1 chiều của mọi loại KHÁC `type_name` (kể cả loại tự đặt).
+        Vd: sum_by_other("role", "expense") = phần "thu" theo thành viên (mọi thứ không phải chi).
+        """
+        idx, ti = _DIM_INDEX[dimension], _DIM_INDEX["type"]
+        out: Dict[str, float] = {}
+        for key, cell in self._match(filters):
+            if key[ti] != type_name:
+                out[key[idx]] = out.get(key[idx], 0) + cell[0]
+        return out
+
+    def pivot_flow(self, row: str, **filters) -> Dict[str, Dict[str, float]]:
+        """
+        Thu/chi theo 1 chiều như biểu đồ thu/chi gốc: loại "income" là thu, MỌI loại khác là chi.
+        Vd: pivot_flow("month") -> {"2025-01": {"income": .., "expense": ..}}
+        """
+        out: Dict[str, Dict[str, float]] = {}
+        for value, by_type in self.pivot(row, "type", **filters).items():
+            income = by_type.get("income", 0)
+            out[value] = {"income": income,
+                          "expense": sum(v for t, v in by_type.items() if t != "income")}
+        return out
+
+    def top(self, dimension: str, **filters) -> Optional[Tuple[str, float]]:
+        """(giá trị, tổng) lớn nhất của 1 chiều, None nếu không có dữ liệu"""
+        sums = self.sum_by(dimension, **filters)
+        return max(sums.items(), key=lambda x: x[1]) if sums else None
+
+    def values(self, dimension: str, **filters):
+        """Các giá trị khác nhau của 1 chiều (đã sắp xếp)"""
+        idx = _DIM_INDEX[dimension]
+        return sorted({key[idx] for key, _ in self._match(filters)})
@@ -0,0 +1,105 @@
+"""
+Định dạng snapshot nhị phân của transactions.csv (đọc bằng mmap, không cần parse CSV):
+
+    [HEADER]   magic "TXS1" | version | số bản ghi | mtime_ns + size của file CSV nguồn
+               | offset bảng chuỗi
+    [RECORDS]  bản ghi độ dài cố định: 8 chỉ số chuỗi (u32) + amount (f64) + is_recurring (u8)
+    [STRINGS]  số chuỗi (u32) | offsets (u32 * (n+1)) | blob UTF-8
+
+Mọi chuỗi (id, ngày, danh mục, mô tả...) được khử trùng lặp trong bảng chuỗi.
+Snapshot chỉ hợp lệ khi mtime/size của CSV nguồn khớp với header -> sửa CSV bằng tay là tự rơi về CSV.
+"""
+
+import mmap
+import os
+import pathlib
+import struct
+from array import array
+from typing import Dict, Iterable, List, Optional
+
+from models import Transaction
+
+MAGIC = b"TXS1"
+VERSION = 1
+HEADER = struct.Struct("<4sIQqQQ")       # magic, version, count, src_mtime_ns, src_size, strtab_offset
+RECORD = struct.Struct("<8IdB")          # id, date, category, type, role, description, expiry, cycle, amount, recurring
+_STR_FIELDS = ("id", "date", "category", "type", "role", "description", "expiry_date", "cycle")
+
+
+def snapshot_path(source: pathlib.Path) -> pathlib.Path:
+    return source.with_name(source.name + ".snap")
+
+
+def write_snapshot(source: pathlib.Path, rows: Iterable[Dict]):
+    """Ghi snapshot cho `source` (gọi ngay sau khi CSV vừa được ghi xong)"""
+    strings: List[str] = []
+    codes: Dict[str, int] = {}
+
+    def code(value) -> int:
+        value = "" if value is None else str(value)
+        c = codes.get(value)
+        if c is None:
+            c = codes[value] = len(strings)
+            strings.append(value)
+        return c
+
+    records = bytearray()
+    count = 0
+    for r in rows:
+        records += RECORD.pack(
+            *(code(r.get(f, "")) for f in _STR_FIELDS),
+            float(r["amount"]),
+            1 if str(r.get("is_recurring")) == "True" else 0,
+        )
+        count += 1
+
+    blobs = [s.encode("utf-8") for s in strings]
+    offsets = array("I", [0])
+    for b in blobs:
+        offsets.append(offsets[-1] + len(b))
+
+    st = source.stat()
+    strtab_offset = HEADER.size + len(records)
+    path = snapshot_path(source)
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, count, st.st_mtime_ns, st.st_size, strtab_offset))
+        f.write(records)
+        f.write(struct.pack("<I", len(strings)))
+        f.write(offsets.tobytes())
+        f.write(b"".join(blobs))
+    os.replace(tmp, path)
+
+
+def read_snapshot(source: pathlib.Path) -> Optional[List[Transaction]]:
+    """
+    Đọc snapshot nếu còn khớp với CSV nguồn.
+    Trả về None nếu không có / đã cũ / hỏng -> bên gọi tự đọc lại CSV.
+    """
+    path = snapshot_path(source)
+    if not path.exists() or not source.exists():
+        return None
+    try:
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            magic, version, count, mtime_ns, size, strtab_offset = HEADER.unpack_from(mm, 0)
+            st = source.stat()
+            if magic != MAGIC or version != VERSION or mtime_ns != st.st_mtime_ns or size != st.st_size:
+                return None
+
+            (n_strings,) = struct.unpack_from("<I", mm, strtab_offset)
+            offsets = array("I")
+            off_start = strtab_offset + 4
+            offsets.frombytes(mm[off_start:off_start + 4 * (n_strings + 1)])
+            blob = mm[off_start + 4 * (n_strings + 1):]
+            strings = [blob[offsets[i]:offsets[i + 1]].decode("utf-8") for i in range(n_strings)]
+
+            # Vòng lặp nóng: dùng biến cục bộ + tham số vị trí cho nhanh
+            result = []
+            append, new_t, S = result.append, Transaction, strings
+            records = mm[HEADER.size:HEADER.size + count * RECORD.size]
+            for tid, d, cat, typ, role, desc, exp, cyc, amount, rec in RECORD.iter_unpack(records):
+                append(new_t(S[tid], S[d], S[cat], amount, S[typ], S[role], S[desc], S[exp], rec == 1, S[cyc]))
+            return result
+    except (OSError, ValueError, struct.error, UnicodeDecodeError, IndexError) as e:
+        print(f"⚠️ Snapshot hỏng, đọc lại CSV: {e}")
+        return None
@@ -3,13 +3,16 @@ from PyQt6.QtWidgets import *
 from PyQt6.QtGui import *
 from PyQt6.QtCharts import *
 from agent import BotChatAgentAPI, LLMWorker
+from .rollup import RollupCube
 
 
 class AIAnalyticsPane(QWidget):
     """Pane phân tích AI – dễ mở rộng, dễ gắn vào bất kỳ dialog nào"""
-    def __init__(self, transactions, parent=None):
+    def __init__(self, transactions, parent=None, rollup=None):
         super().__init__(parent)
         self.transactions = transactions
+        # Số liệu tổng hợp sẵn (cube của Engine), không có thì tự dựng từ list
+        self.rollup = rollup if rollup is not None else RollupCube.from_transactions(transactions)
         self.agent = BotChatAgentAPI()  # Sử dụng agent đã được định nghĩa
         self._worker = None
         self._init_ui()
@@ -56,19 +59,14 @@ class AIAnalyticsPane(QWidget):
         self.btn_analyze.setEnabled(False)  # chỉ disable nút chính, còn lại tự do
 
         # Build prompt từ data thật
-        total_income = sum(t.amount for t in self.transactions if t.type == "income")
-        total_expense = sum(t.amount for t in self.transactions if t.type == "expense")
+        total_income = self.rollup.total(type="income")
+        total_expense = self.rollup.total(type="expense")
         balance = total_income - total_expense
 
         prompt = f"{prompt_suffix}\n\nDữ liệu:\n- Tổng thu: {total_income:,.0f} đ\n- Tổng chi: {total_expense:,.0f} đ\n- Số dư: {balance:,.0f} đ\n"
-        if self.transactions:
-            role_exp, cat_exp = {}, {}
-            for t in self.transactions:
-                if t.type == "expense":
-                    role_exp[t.role] = role_exp.get(t.role, 0) + t.amount
-                    cat_exp[t.category] = cat_exp.get(t.category, 0) + t.amount
-            top_role = max(role_exp.items(), key=lambda x: x[1]) if role_exp else ("không có", 0)
-            top_cat = max(cat_exp.items(), key=lambda x: x[1]) if cat_exp else ("không có", 0)
+        if len(self.rollup):
+            top_role = self.rollup.top("role", type="expense") or ("không có", 0)
+            top_cat = self.rollup.top("category", type="expense") or ("không có", 0)
             prompt += f"- Người chi nhiều: {top_role[0]} ({top_role[1]:,.0f} đ)\n- Danh mục chi nhiều: {top_cat[0]} ({top_cat[1]:,.0f} đ)\n"
 
         # Stream
@@ -130,9 +128,12 @@ class HeatmapWidget(QWidget):
 
 
 class StatisticsDialog(QDialog):
-    def __init__(qtl, parent=None, transactions=None):
+    def __init__(qtl, parent=None, transactions=None, rollup=None, top_expenses=None):
         super().__init__(parent)
         qtl.transactions = transactions or []
+        qtl.rollup = rollup if rollup is not None else RollupCube.from_transactions(qtl.transactions)
+        # Top khoản chi lấy sẵn từ index top-K của Engine; None -> tự sort danh sách
+        qtl.top_expenses = top_expenses
         qtl.setWindowTitle("Thống Kê")
         qtl.resize(1000, 700)
         qtl.init_ui()
@@ -140,6 +141,8 @@ class StatisticsDialog(QDialog):
     def init_ui(qtl):
         layout = QVBoxLayout()
         tabs = QTabWidget()
+        has_income = qtl.rollup.count(type="income") > 0
+        has_expense = qtl.rollup.count(type="expense") > 0
 
         # 1. Tổng quan
         summary = QTextEdit()
@@ -156,19 +159,16 @@ class StatisticsDialog(QDialog):
         tabs.addTab(summary, "Tổng quan")
 
         # 2. AI Assistant – nhiều chức năng
-        ai_pane = AIAnalyticsPane(qtl.transactions, qtl)
+        ai_pane = AIAnalyticsPane(qtl.transactions, qtl, qtl.rollup)
         tabs.addTab(ai_pane, "AI Phân tích")
 
 
         # 2. Biểu đồ tròn - Chi theo danh mục
-        if any(t.type == "expense" for t in qtl.transactions):
+        if has_expense:
             chart_view = QChartView()
             chart = QChart()
             series = QPieSeries()
-            cat_exp = {}
-            for t in qtl.transactions:
-                if t.type == "expense":
-                    cat_exp[t.category] = cat_exp.get(t.category, 0) + t.amount
+            cat_exp = qtl.rollup.sum_by("category", type="expense")
             for cat, amt in cat_exp.items():
                 series.append(cat, amt)
             chart.addSeries(series)
@@ -178,7 +178,7 @@ class StatisticsDialog(QDialog):
             tabs.addTab(chart_view, "Biểu đồ tròn")
 
         # 3. Biểu đồ đường - Thu/chi theo tháng
-        if any(t.type == "income" for t in qtl.transactions) or any(t.type == "expense" for t in qtl.transactions):
+        if has_income or has_expense:
             line_tab = QWidget()
             line_layout = QVBoxLayout(line_tab)
             line_chart = qtl.build_line_chart()
@@ -186,7 +186,7 @@ class StatisticsDialog(QDialog):
             tabs.addTab(line_tab, "Biểu đồ thu/chi theo tháng")
 
         # 4. Bar thu/chi theo người
-        if qtl.transactions:
+        if len(qtl.rollup):
             bar_tab = QWidget()
             bar_layout = QVBoxLayout(bar_tab)
             bar_chart = qtl.build_bar_chart()
@@ -194,7 +194,7 @@ class StatisticsDialog(QDialog):
             tabs.addTab(bar_tab, "Bar thu/chi theo người")
 
         # 5. Heatmap chi theo ngày
-        if any(t.type == "expense" for t in qtl.transactions):
+        if has_expense:
             heat_tab = QWidget()
             heat_layout = QVBoxLayout(heat_tab)
             heat_widget = HeatmapWidget(qtl.transactions)
@@ -202,7 +202,7 @@ class StatisticsDialog(QDialog):
             tabs.addTab(heat_tab, "Heatmap chi theo ngày")
 
         # 6. Top 5 chi đắt nhất
-        if any(t.type == "expense" for t in qtl.transactions):
+        if has_expense:
             top_tab = QWidget()
             top_layout = QVBoxLayout(top_tab)
             top_chart = qtl.build_top5_chart()
@@ -216,29 +216,18 @@ class StatisticsDialog(QDialog):
 
     # ----- Các hàm build biểu đồ -----
     def calc_stats(qtl):
-        cat_exp, role_exp, role_inc = {}, {}, {}
-        for t in qtl.transactions:
-            if t.type == "expense":
-                cat_exp[t.category] = cat_exp.get(t.category, 0) + t.amount
-                role_exp[t.role] = role_exp.get(t.role, 0) + t.amount
-            else:
-                role_inc[t.role] = role_inc.get(t.role, 0) + t.amount
+        cube = qtl.rollup
+        # Người thu nhiều: mọi loại không phải "expense" đều tính là thu (giữ đúng cách phân loại cũ)
+        role_inc = cube.sum_by_other("role", "expense")
         return {
-            'expense_category': max(cat_exp.items(), key=lambda x: x[1]) if cat_exp else None,
-            'biggest_spender': max(role_exp.items(), key=lambda x: x[1]) if role_exp else None,
+            'expense_category': cube.top("category", type="expense"),
+            'biggest_spender': cube.top("role", type="expense"),
             'biggest_earner': max(role_inc.items(), key=lambda x: x[1]) if role_inc else None
         }
 
     def build_line_chart(qtl):
-        monthly = {}
-        for t in qtl.transactions:
-            ym = t.date[:7]
-            monthly.setdefault(ym, {"income": 0, "expense": 0})
-            if t.type == "income":
-                monthly[ym]["income"] += t.amount
-            else:
-                monthly[ym]["expense"] += t.amount
-
+        # Loại "income" là thu, mọi loại khác (kể cả loại tự đặt) là chi
+        monthly = qtl.rollup.pivot_flow("month")
         sorted_keys = sorted(monthly.keys())
 
         income_series = QLineSeries()
@@ -279,12 +268,9 @@ class StatisticsDialog(QDialog):
         return chart_view
 
     def build_bar_chart(qtl):
-        role_income = {}
-        role_expense = {}
-        for t in qtl.transactions:
-            role_income[t.role] = role_income.get(t.role, 0) + (t.amount if t.type == "income" else 0)
-            role_expense[t.role] = role_expense.get(t.role, 0) + (t.amount if t.type == "expense" else 0)
-        roles = sorted(set(role_income.keys()) | set(role_expense.keys()))
+        role_income = qtl.rollup.sum_by("role", type="income")
+        role_expense = qtl.rollup.sum_by("role", type="expense")
+        roles = qtl.rollup.values("role")
 
         income_set = QBarSet("Thu nhập")
         expense_set = QBarSet("Chi tiêu")
@@ -319,9 +305,12 @@ class StatisticsDialog(QDialog):
         return chart_view
 
     def build_top5_chart(qtl):
-        expenses = [(t.description or t.category, t.amount) for t in qtl.transactions if t.type == "expense"]
-        expenses.sort(key=lambda x: x[1], reverse=True)
-        top5 = expenses[:5]
+        if qtl.top_expenses is not None:
+            top5 = [(t.description or t.category, t.amount) for t in qtl.top_expenses[:5]]
+        else:
+            expenses = [(t.description or t.category, t.amount) for t in qtl.transactions if t.type == "expense"]
+            expenses.sort(key=lambda x: x[1], reverse=True)
+            top5 = expenses[:5]
 
         series = QHorizontalBarSeries()
         bar_set = QBarSet("Chi")
@@ -0,0 +1,848 @@
+import contextlib
+import csv
+import json
+import os
+import pathlib
+import shutil
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from models import Transaction
+from .journal import TransactionJournal
+from .snapshot import read_snapshot, snapshot_path, write_snapshot
+
+FIELDNAMES = ["id", "date", "category", "amount", "type", "role",
+              "description", "expiry_date", "is_recurring", "cycle"]
+
+# Số bản ghi journal tối đa trước khi gộp (compact) ngược vào CSV gốc
+COMPACT_THRESHOLD = 500
+
+RowsProvider = Callable[[], List[Dict]]
+
+
+def _to_row(t: Transaction) -> Dict:
+    """Convert Object -> Dict (dạng chuỗi như trong CSV)"""
+    return {
+        "id": t.id,
+        "date": t.date,
+        "category": t.category,
+        "amount": t.amount,
+        "type": t.type,
+        "role": t.role,
+        "description": t.description,
+        "expiry_date": t.expiry_date,
+        "is_recurring": "True" if t.is_recurring else "False",
+        "cycle": getattr(t, "cycle", "Tháng")
+    }
+
+
+def _from_row(row: Dict) -> Transaction:
+    """Convert Dict (CSV/Journal/SQLite) -> Object"""
+    return Transaction(
+        id=row["id"],
+        date=row["date"],
+        category=row["category"],
+        amount=float(row["amount"]),
+        type=row["type"],
+        role=row["role"],
+        description=row.get("description", ""),
+        expiry_date=row.get("expiry_date", ""),
+        is_recurring=str(row.get("is_recurring", "False")) == "True",
+        cycle=row.get("cycle", "Tháng")
+    )
+
+
+def _write_csv(path: pathlib.Path, rows: Iterable[Dict]):
+    """Ghi CSV ra file tạm rồi os.replace -> không bao giờ để lại file CSV ghi dở"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "w", encoding="utf-8-sig", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDNAMES)
+        writer.writeheader()
+        writer.writerows(rows)
+    os.replace(tmp, path)
+
+
+def make_backend(path: pathlib.Path, migrate_from: Optional[pathlib.Path] = None):
+    """Chọn backend theo đuôi: .db/.sqlite -> SQLite, thư mục .parts -> phân vùng theo năm, còn lại -> CSV + journal"""
+    if path.suffix.lower() in (".db", ".sqlite", ".sqlite3"):
+        return SqliteBackend(path, migrate_from=migrate_from)
+    if path.suffix.lower() == ".parts":
+        return PartitionedBackend(path, migrate_from=migrate_from)
+    return CsvBackend(path)
+
+
+# ==========================================
+# 1. CSV + JOURNAL (MẶC ĐỊNH)
+# ==========================================
+class CsvBackend:
+    """
+    Lưu vào transactions.csv. Mỗi thay đổi chỉ ghi 1 dòng journal,
+    định kỳ gộp (compact) journal vào CSV gốc ở background thread.
+    """
+    def __init__(self, path: pathlib.Path):
+        self.path = path
+        self._journal = TransactionJournal(path)
+        # Khóa ghi file gốc: compaction (background) và save_all() không được chạy chồng nhau
+        self._file_lock = threading.Lock()
+        self._compactor: Optional[threading.Thread] = None
+
+    def load_into(self, store):
+        # Ưu tiên snapshot nhị phân (không phải parse CSV), cũ/hỏng thì đọc CSV như thường
+        loaded = read_snapshot(self.path)
+        if loaded is None and self.path.exists():
+            try:
+                with open(self.path, encoding="utf-8-sig") as f:
+                    loaded = [_from_row(row) for row in csv.DictReader(f)]
+                # Tạo lại snapshot ở background để lần khởi động sau nhanh hơn
+                self._heal_snapshot(loaded, self.path.stat().st_mtime_ns)
+            except Exception as e:
+                print(f"❌ Error loading transactions: {e}")
+        for t in loaded or ():
+            store[t.id] = t
+
+        # Áp các thay đổi chưa được gộp vào CSV gốc
+        def _apply(record: Dict):
+            op = record.get("op")
+            if op in ("add", "update"):
+                t = _from_row(record["row"])
+                store[t.id] = t
+            elif op == "delete":
+                store.pop(record.get("id"), None)
+
+        try:
+            replayed = self._journal.replay(_apply)
+            if replayed:
+                print(f"🔁 TransactionEngine: replay {replayed} thay đổi từ journal")
+        except Exception as e:
+            print(f"❌ Error replaying journal: {e}")
+
+    def save_all(self, rows: List[Dict]):
+        # Chờ lần gộp đang chạy (nếu có) để nó không ghi đè ảnh chụp cũ lên file mới
+        self._join_compactor()
+        with self._file_lock:
+            _write_csv(self.path, rows)
+            self._write_snapshot(rows)
+            self._journal.reset()
+
+    def write(self, op: str, row: Optional[Dict], tid: Optional[str], snapshot: RowsProvider):
+        """Ghi 1 dòng journal (O(1)) thay cho việc ghi lại cả file CSV"""
+        try:
+            self._journal.append(op, row=row, tid=tid)
+        except Exception as e:
+            print(f"❌ Error writing journal: {e}")
+            self.save_all(snapshot())
+            return
+        if self._journal.count >= COMPACT_THRESHOLD:
+            self.compact(snapshot)
+
+    def add_many(self, rows: List[Dict], snapshot: RowsProvider):
+        self.write_many("add", rows, None, snapshot)
+
+    def write_many(self, op: str, rows: Optional[List[Dict]], tids: Optional[List[str]], snapshot: RowsProvider):
+        """Ghi cả lô vào journal bằng 1 lần write; lô lớn sẽ kích hoạt gộp ở background"""
+        try:
+            self._journal.append_many(op, rows, tids)
+        except Exception as e:
+            print(f"❌ Error writing journal: {e}")
+            self.save_all(snapshot())
+            return
+        if self._journal.count >= COMPACT_THRESHOLD:
+            self.compact(snapshot)
+
+    def write_batch(self, ops: List[Tuple[str, Optional[Dict], Optional[str]]], snapshot: RowsProvider):
+        """Các thay đổi của 1 unit-of-work (op, row, id) -> 1 lần write journal"""
+        records = []
+        for op, row, tid in ops:
+            record = {"op": op}
+            if row is not None:
+                record["row"] = row
+            if tid is not None:
+                record["id"] = tid
+            records.append(record)
+        try:
+            self._journal.append_records(records)
+        except Exception as e:
+            print(f"❌ Error writing journal: {e}")
+            self.save_all(snapshot())
+            return
+        if self._journal.count >= COMPACT_THRESHOLD:
+            self.compact(snapshot)
+
+    def compact(self, snapshot: RowsProvider, wait: bool = False):
+        """
+        Gộp journal vào CSV gốc ở background thread.
+        Ảnh chụp dữ liệu được lấy ngay trên thread gọi, nên các thay đổi sau đó
+        sẽ nằm trong journal mới và không bị mất.
+        """
+        if self._compactor is not None and self._compactor.is_alive():
+            if not wait:
+                return
+            self._join_compactor()
+        if not self._journal.rotate():
+            # Lần gộp trước bị gián đoạn -> gộp đồng bộ cho sạch
+            self.save_all(snapshot())
+            return
+        rows = snapshot()
+
+        def _run():
+            try:
+                with self._file_lock:
+                    _write_csv(self.path, rows)
+                    self._write_snapshot(rows)
+                    self._journal.drop_rotated()
+            except Exception as e:
+                print(f"❌ Error compacting journal: {e}")
+
+        self._compactor = threading.Thread(target=_run, name="TransactionCompactor", daemon=True)
+        self._compactor.start()
+        if wait:
+            self._join_compactor()
+
+    def flush(self, snapshot: RowsProvider):
+        """Đảm bảo file CSV gốc chứa đủ mọi thay đổi (trước khi backup/copy file)"""
+        self._join_compactor()
+        if self._journal.count or self._journal.rotated_path.exists():
+            self.save_all(snapshot())
+
+    def copy_to(self, dest: pathlib.Path, snapshot: RowsProvider):
+        self.flush(snapshot)
+        shutil.copy(self.path, dest)
+
+    def data_files(self) -> Dict[str, pathlib.Path]:
+        """CSV gốc + journal chưa gộp: replay khi load nên backup không cần ép ghi lại CSV"""
+        return {
+            "transactions": self.path,
+            "transactions_journal_1": self._journal.rotated_path,
+            "transactions_journal": self._journal.path,
+        }
+
+    def files_locked(self):
+        """Giữ khi đọc data_files(): compaction không ghi CSV / xóa `.journal.1` giữa chừng"""
+        return self._file_lock
+
+    def query_ids(self, **filters) -> Optional[List[str]]:
+        """CSV không có index -> để Engine tự lọc trong RAM"""
+        return None
+
+    def close(self):
+        self._join_compactor()
+        self._journal.close()
+
+    def _write_snapshot(self, rows: List[Dict]):
+        try:
+            write_snapshot(self.path, rows)
+        except Exception as e:
+            # Snapshot chỉ là cache: lỗi thì lần sau đọc CSV
+            print(f"⚠️ Không ghi được snapshot: {e}")
+
+    def _heal_snapshot(self, loaded: List[Transaction], mtime_ns: int):
+        def _run():
+            with self._file_lock:
+                # CSV đã bị ghi lại trong lúc chờ -> snapshot mới đã có, bỏ qua
+                if self.path.exists() and self.path.stat().st_mtime_ns == mtime_ns:
+                    self._write_snapshot([_to_row(t) for t in loaded])
+
+        threading.Thread(target=_run, name="TransactionSnapshot", daemon=True).start()
+
+    def _join_compactor(self):
+        if self._compactor is not None:
+            self._compactor.join()
+            self._compactor = None
+
+
+# ==========================================
+# 2. SQLITE
+# ==========================================
+class SqliteBackend:
+    """
+    Lưu vào 1 file SQLite với index phụ trên date, type, role, category.
+    Ghi 1 dòng = 1 câu lệnh O(log n); bộ lọc ngày/loại được đẩy xuống SQL dùng index.
+    """
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS transactions (
+            id           TEXT PRIMARY KEY,
+            date         TEXT NOT NULL,
+            category     TEXT NOT NULL,
+            amount       REAL NOT NULL,
+            type         TEXT NOT NULL,
+            role         TEXT NOT NULL,
+            description  TEXT DEFAULT '',
+            expiry_date  TEXT DEFAULT '',
+            is_recurring INTEGER DEFAULT 0,
+            cycle        TEXT DEFAULT 'Tháng'
+        );
+        CREATE INDEX IF NOT EXISTS idx_trans_date     ON transactions(date);
+        CREATE INDEX IF NOT EXISTS idx_trans_type     ON transactions(type);
+        CREATE INDEX IF NOT EXISTS idx_trans_role     ON transactions(role);
+        CREATE INDEX IF NOT EXISTS idx_trans_category ON transactions(category);
+    """
+    # ON CONFLICT DO UPDATE giữ nguyên rowid => thứ tự load lại không đổi sau khi sửa
+    UPSERT = """
+        INSERT INTO transactions (id, date, category, amount, type, role,
+                                  description, expiry_date, is_recurring, cycle)
+        VALUES (:id, :date, :category, :amount, :type, :role,
+                :description, :expiry_date, :is_recurring, :cycle)
+        ON CONFLICT(id) DO UPDATE SET
+            date=excluded.date, category=excluded.category, amount=excluded.amount,
+            type=excluded.type, role=excluded.role, description=excluded.description,
+            expiry_date=excluded.expiry_date, is_recurring=excluded.is_recurring,
+            cycle=excluded.cycle
+    """
+
+    def __init__(self, path: pathlib.Path, migrate_from: Optional[pathlib.Path] = None):
+        self.path = path
+        self.migrate_from = migrate_from
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(self.SCHEMA)
+        # lower() của SQLite chỉ xử lý ASCII -> dùng lower() của Python cho tiếng Việt
+        self._conn.create_function("py_lower", 1, lambda s: (s or "").lower(), deterministic=True)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _params(row: Dict) -> Dict:
+        p = dict(row)
+        p["is_recurring"] = 1 if str(row.get("is_recurring")) == "True" else 0
+        return p
+
+    def load_into(self, store):
+        self._migrate_csv()
+        with self._lock:
+            cur = self._conn.execute("SELECT * FROM transactions ORDER BY rowid")
+            for r in cur:
+                row = dict(r)
+                row["is_recurring"] = "True" if row["is_recurring"] else "False"
+                t = _from_row(row)
+                store[t.id] = t
+
+    def _migrate_csv(self):
+        """Lần đầu dùng SQLite: nạp dữ liệu từ transactions.csv cũ (nếu có)"""
+        if not self.migrate_from:
+            return
+        if self._conn.execute("SELECT 1 FROM transactions LIMIT 1").fetchone():
+            return
+        legacy = CsvBackend(self.migrate_from)
+        store: Dict[str, Transaction] = {}
+        legacy.load_into(store)   # Gồm cả journal chưa gộp
+        if not store:
+            return
+        self.add_many([_to_row(t) for t in store.values()], None)
+        print(f"📦 SqliteBackend: đã chuyển {len(store)} giao dịch từ {self.migrate_from.name}")
+
+    def save_all(self, rows: List[Dict]):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM transactions")
+            self._conn.executemany(self.UPSERT, [self._params(r) for r in rows])
+
+    def write(self, op: str, row: Optional[Dict], tid: Optional[str], snapshot: RowsProvider):
+        try:
+            with self._lock, self._conn:
+                if op == "delete":
+                    self._conn.execute("DELETE FROM transactions WHERE id = ?", (tid,))
+                else:
+                    self._conn.execute(self.UPSERT, self._params(row))
+        except sqlite3.Error as e:
+            print(f"❌ SqliteBackend write error: {e}")
+
+    def add_many(self, rows: List[Dict], snapshot: Optional[RowsProvider]):
+        with self._lock, self._conn:
+            self._conn.executemany(self.UPSERT, [self._params(r) for r in rows])
+
+    def write_many(self, op: str, rows: Optional[List[Dict]], tids: Optional[List[str]], snapshot: RowsProvider):
+        """Cả lô trong 1 transaction SQL (1 lần commit)"""
+        try:
+            with self._lock, self._conn:
+                if op == "delete":
+                    self._conn.executemany("DELETE FROM transactions WHERE id = ?", [(tid,) for tid in tids])
+                else:
+                    self._conn.executemany(self.UPSERT, [self._params(r) for r in rows])
+        except sqlite3.Error as e:
+            print(f"❌ SqliteBackend write error: {e}")
+
+    def write_batch(self, ops: List[Tuple[str, Optional[Dict], Optional[str]]], snapshot: RowsProvider):
+        """Các thay đổi của 1 unit-of-work -> 1 transaction SQL (1 lần commit)"""
+        try:
+            with self._lock, self._conn:
+                for op, row, tid in ops:
+                    if op == "delete":
+                        self._conn.execute("DELETE FROM transactions WHERE id = ?", (tid,))
+                    else:
+                        self._conn.execute(self.UPSERT, self._params(row))
+        except sqlite3.Error as e:
+            print(f"❌ SqliteBackend write error: {e}")
+
+    def compact(self, snapshot: RowsProvider, wait: bool = False):
+        pass
+
+    def flush(self, snapshot: RowsProvider):
+        # TRUNCATE: dồn hết WAL vào file .db -> copy/backup riêng file .db là đủ dữ liệu
+        with self._lock:
+            self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def copy_to(self, dest: pathlib.Path, snapshot: RowsProvider):
+        with self._lock:
+            target = sqlite3.connect(str(dest))
+            try:
+                self._conn.backup(target)
+            finally:
+                target.close()
+
+    def data_files(self) -> Dict[str, pathlib.Path]:
+        return {"transactions": self.path}
+
+    @contextlib.contextmanager
+    def files_locked(self):
+        """Dồn WAL (nhỏ, không ghi lại cả DB) vào file .db rồi chặn ghi trong lúc backup đọc file"""
+        with self._lock:
+            self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            yield
+
+    def query_ids(self, keyword: str = "", type_name: Optional[str] = None,
+                  date_from: Optional[str] = None, date_to: Optional[str] = None,
+                  roles: Optional[Iterable[str]] = None,
+                  categories: Optional[Iterable[str]] = None) -> List[str]:
+        """Lọc bằng SQL (dùng index date/type/role/category), trả về danh sách id theo thứ tự lưu"""
+        where, params = [], []
+        if date_from:
+            where.append("date >= ?")
+            params.append(date_from)
+        if date_to:
+            where.append("date <= ?")
+            params.append(date_to)
+        if type_name:
+            where.append("type = ?")
+            params.append(type_name)
+        if roles:
+            roles = list(roles)
+            where.append(f"role IN ({','.join('?' * len(roles))})")
+            params.extend(roles)
+        if categories:
+            categories = list(categories)
+            where.append(f"category IN ({','.join('?' * len(categories))})")
+            params.extend(categories)
+        if keyword:
+            where.append("(instr(py_lower(role), ?) OR instr(py_lower(category), ?) OR instr(py_lower(description), ?))")
+            kw = keyword.lower()
+            params.extend([kw, kw, kw])
+        sql = "SELECT id FROM transactions"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY rowid"
+        with self._lock:
+            return [r[0] for r in self._conn.execute(sql, params)]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+# ==========================================
+# 3. PHÂN VÙNG THEO NĂM (NẠP LƯỜI)
+# ==========================================
+PARTITION_MANIFEST = "manifest.json"
+# Số năm mới nhất luôn được nạp khi khởi động (dashboard/lịch chủ yếu xem gần đây)
+HOT_PARTITIONS = 2
+# Ngân sách RAM: tổng số dòng của các phân vùng đã nạp. Vượt ngưỡng -> đẩy phân vùng cũ ít dùng nhất ra
+PARTITION_BUDGET_ROWS = 300_000
+# Phân vùng cho dòng có ngày lỗi (luôn nạp)
+_BAD_PARTITION = "0000"
+# 2: manifest có thêm danh sách id của từng phân vùng
+MANIFEST_VERSION = 2
+
+
+def partition_key(date: str) -> str:
+    """Khóa phân vùng = năm của ngày ISO"""
+    key = (date or "")[:4]
+    return key if len(key) == 4 and key.isdigit() else _BAD_PARTITION
+
+
+def rekey(tid: str, key: str, taken: Callable[[str], bool]) -> str:
+    """Id mới cho dòng trùng id với dòng ở năm khác: "<id>-<năm>" (thêm số thứ tự nếu vẫn trùng)"""
+    new_id, n = f"{tid}-{key}", 1
+    while taken(new_id):
+        n += 1
+        new_id = f"{tid}-{key}-{n}"
+    return new_id
+
+
+def _partition_meta(key: str, rows: List[Dict]) -> Dict:
+    """min/max ngày, số dòng, id, các ô cube (tháng, danh mục, thành viên, loại) và giao dịch định kỳ của 1 phân vùng"""
+    cells: Dict[tuple, List] = {}
+    recurring = []
+    for r in rows:
+        cell_key = (r["date"][:7], r["category"], r["role"], r["type"])
+        cell = cells.get(cell_key)
+        if cell is None:
+            cell = cells[cell_key] = [0.0, 0]
+        cell[0] += float(r["amount"])
+        cell[1] += 1
+        if str(r.get("is_recurring")) == "True":
+            recurring.append(r)
+    dates = [r["date"] for r in rows]
+    return {
+        "file": f"{key}.csv",
+        "rows": len(rows),
+        "min_date": min(dates, default=""),
+        "max_date": max(dates, default=""),
+        "ids": [r["id"] for r in rows],
+        "cells": [[*k, v[0], v[1]] for k, v in cells.items()],
+        "recurring": recurring,
+    }
+
+
+class PartitionedBackend:
+    """
+    Lưu mỗi năm 1 file CSV trong thư mục (vd: transactions.parts/2024.csv) + manifest.json ghi
+    min/max ngày, số dòng, các ô cube và giao dịch định kỳ của từng năm.
+    - Khởi động chỉ nạp HOT_PARTITIONS năm mới nhất. Năm cũ (phân vùng lạnh) được Engine nạp khi
+      truy vấn chạm tới khoảng ngày của nó, và bị đẩy ra theo LRU khi vượt PARTITION_BUDGET_ROWS.
+    - Tổng/cube của phân vùng chưa nạp lấy từ manifest -> số liệu toàn sổ luôn đúng mà không cần nạp.
+    - Manifest giữ cả danh sách id của từng năm -> kiểm tra trùng id / tìm 1 id không phải nạp năm lạnh.
+    - Thay đổi vẫn ghi 1 dòng journal; compaction chỉ ghi lại các phân vùng có thay đổi.
+    """
+    partitioned = True
+
+    def __init__(self, path: pathlib.Path, migrate_from: Optional[pathlib.Path] = None):
+        self.path = path
+        self.migrate_from = migrate_from
+        self.manifest_path = path / PARTITION_MANIFEST
+        self._journal = TransactionJournal(path / "transactions")
+        self._file_lock = threading.Lock()
+        self._compactor: Optional[threading.Thread] = None
+        self._meta: Dict[str, Dict] = {}                        # năm -> metadata (như trong manifest)
+        self._loaded: "OrderedDict[str, int]" = OrderedDict()   # năm đã nạp -> số dòng (LRU: cũ -> mới)
+        self._touched: Set[str] = set()                         # năm có dòng thêm/sửa từ lần compaction trước
+        self._writing: Set[str] = set()                         # năm đang được compaction ghi ở background
+        self._id_index: Optional[Dict[str, str]] = None         # id -> năm (dựng lười từ manifest)
+
+    # ---------- manifest / file ----------
+    def _part_file(self, key: str) -> pathlib.Path:
+        return self.path / f"{key}.csv"
+
+    def _read_manifest(self):
+        try:
+            self._meta = json.loads(self.manifest_path.read_text(encoding="utf-8")).get("partitions", {})
+        except FileNotFoundError:
+            self._meta = {}
+        except Exception as e:
+            print(f"❌ Error reading partition manifest: {e}")
+            self._meta = {}
+        self._id_index = None
+
+    def _write_manifest(self, meta: Dict[str, Dict]):
+        tmp = self.manifest_path.with_name(self.manifest_path.name + ".tmp")
+        tmp.write_text(json.dumps({"version": MANIFEST_VERSION, "partitions": meta}, ensure_ascii=False),
+                       encoding="utf-8")
+        os.replace(tmp, self.manifest_path)
+        self._meta = meta
+        self._id_index = None
+
+    def _upgrade_manifest(self):
+        """Manifest cũ (chưa có danh sách id): đọc từng năm 1 lần để bổ sung"""
+        missing = [key for key, meta in self._meta.items() if "ids" not in meta]
+        if not missing:
+            return
+        meta = dict(self._meta)
+        for key in missing:
+            meta[key] = dict(meta[key], ids=[t.id for t in self._read_partition(key)])
+        with self._file_lock:
+            self._write_manifest(meta)
+        print(f"📦 PartitionedBackend: bổ sung id cho {len(missing)} phân vùng trong manifest")
+
+    def _write_partitions(self, groups: Dict[str, List[Dict]]):
+        """Ghi lại các phân vùng trong `groups` (rỗng -> xóa file) rồi ghi manifest mới. Gọi khi giữ _file_lock."""
+        meta = dict(self._meta)
+        for key, rows in groups.items():
+            part = self._part_file(key)
+            if rows:
+                _write_csv(part, rows)
+                try:
+                    write_snapshot(part, rows)
+                except Exception as e:
+                    print(f"⚠️ Không ghi được snapshot: {e}")
+                meta[key] = _partition_meta(key, rows)
+            else:
+                part.unlink(missing_ok=True)
+                snapshot_path(part).unlink(missing_ok=True)
+                meta.pop(key, None)
+        self._write_manifest(meta)
+
+    def _read_partition(self, key: str) -> List[Transaction]:
+        part = self._part_file(key)
+        with self._file_lock:
+            loaded = read_snapshot(part)
+            if loaded is None and part.exists():
+                try:
+                    with open(part, encoding="utf-8-sig") as f:
+                        loaded = [_from_row(row) for row in csv.DictReader(f)]
+                    write_snapshot(part, [_to_row(t) for t in loaded])
+                except Exception as e:
+                    print(f"❌ Error loading partition {key}: {e}")
+        return loaded or []
+
+    # ---------- nạp ----------
+    def load_into(self, store):
+        self.path.mkdir(parents=True, exist_ok=True)
+        self._read_manifest()
+        if not self._meta:
+            self._migrate_csv()
+        self._upgrade_manifest()
+
+        keys = sorted(self._meta)
+        pending_journal = self._journal.path.exists() or self._journal.rotated_path.exists()
+        if pending_journal:
+            # Lần trước thoát đột ngột: journal có thể chạm mọi năm -> nạp hết để replay cho đúng
+            hot = keys
+        else:
+            hot = [k for k in keys if k != _BAD_PARTITION][-HOT_PARTITIONS:]
+            if _BAD_PARTITION in self._meta:
+                hot.append(_BAD_PARTITION)
+        for key in hot:
+            for t in self.load_partition(key):
+                if t.id in store:
+                    # Trùng id với năm đã nạp (file sửa tay / dữ liệu cũ): giữ cả 2 dòng, đổi id dòng này
+                    old_id, t.id = t.id, rekey(t.id, key, store.__contains__)
+                    self._touched.add(key)
+                    print(f"⚠️ Phân vùng {key}: id {old_id} bị trùng, đổi thành {t.id}")
+                store[t.id] = t
+
+        def _apply(record: Dict):
+            op = record.get("op")
+            if op in ("add", "update"):
+                t = _from_row(record["row"])
+                store[t.id] = t
+                self._mark_row(t.date)
+            elif op == "delete":
+                store.pop(record.get("id"), None)
+
+        try:
+            replayed = self._journal.replay(_apply)
+            if replayed:
+                print(f"🔁 PartitionedBackend: replay {replayed} thay đổi từ journal")
+        except Exception as e:
+            print(f"❌ Error replaying journal: {e}")
+
+    def _migrate_csv(self):
+        """Lần đầu dùng phân vùng: chia transactions.csv cũ (gồm cả journal) thành từng năm"""
+        if not self.migrate_from or not self.migrate_from.exists():
+            return
+        legacy = CsvBackend(self.migrate_from)
+        store: Dict[str, Transaction] = {}
+        legacy.load_into(store)
+        legacy.close()
+        if store:
+            self.save_all([_to_row(t) for t in store.values()])
+            print(f"📦 PartitionedBackend: đã chia {len(store)} giao dịch thành {len(self._meta)} phân vùng")
+
+    def load_partition(self, key: str) -> List[Transaction]:
+        """Nạp 1 năm từ đĩa (Engine tự đưa vào kho + index)"""
+        loaded = self._read_partition(key)
+        self._loaded[key] = len(loaded)
+        self._loaded.move_to_end(key)
+        return loaded
+
+    def unload(self, key: str):
+        self._loaded.pop(key, None)
+
+    # ---------- thông tin phân vùng cho Engine ----------
+    def partitions_for(self, date_from: Optional[str] = None, date_to: Optional[str] = None) -> List[str]:
+        """Các năm (có dữ liệu trên đĩa hoặc đã nạp) giao với khoảng ngày; đánh dấu vừa dùng (LRU)"""
+        keys = []
+        for key in set(self._meta) | set(self._loaded):
+            meta = self._meta.get(key)
+            if meta is not None and key != _BAD_PARTITION:
+                if (date_from and meta["max_date"] < date_from) or (date_to and meta["min_date"] > date_to):
+                    continue
+            keys.append(key)
+        for key in keys:
+            if key in self._loaded:
+                self._loaded.move_to_end(key)
+        return sorted(keys)
+
+    def is_loaded(self, key: str) -> bool:
+        return key in self._loaded
+
+    def has_cold(self) -> bool:
+        return any(key not in self._loaded for key in self._meta)
+
+    def partition_of(self, tid: str) -> Optional[str]:
+        """Năm (theo manifest = dữ liệu trên đĩa) đang chứa id, None nếu không có"""
+        index = self._id_index
+        if index is None:
+            index = self._id_index = {tid: key for key, meta in list(self._meta.items())
+                                      for tid in meta.get("ids", ())}
+        return index.get(tid)
+
+    def touch(self, key: str):
+        """Đánh dấu phân vùng cần ghi lại ở lần compaction tới"""
+        self._touched.add(key)
+
+    def cold_rows(self) -> int:
+        return sum(m["rows"] for k, m in self._meta.items() if k not in self._loaded)
+
+    def cold_cells(self):
+        """(khóa cube, tổng tiền, số dòng) của các phân vùng chưa nạp"""
+        for key, meta in list(self._meta.items()):
+            if key not in self._loaded:
+                for month, category, role, type_name, amount, count in meta["cells"]:
+                    yield (month, category, role, type_name), amount, count
+
+    def cold_templates(self) -> List[Transaction]:
+        """Giao dịch định kỳ nằm trong các phân vùng chưa nạp"""
+        return [_from_row(r) for key, meta in list(self._meta.items())
+                if key not in self._loaded for r in meta.get("recurring", ())]
+
+    def evictable(self, keep: Iterable[str]) -> List[str]:
+        """Các năm nên đẩy ra (LRU) để tổng số dòng đã nạp về dưới ngân sách"""
+        keep = set(keep)
+        hot = set([k for k in sorted(set(self._meta) | set(self._loaded)) if k != _BAD_PARTITION][-HOT_PARTITIONS:])
+        keep |= hot | self._touched | self._writing | {_BAD_PARTITION}
+        total = sum(self._loaded.values())
+        victims = []
+        for key, rows in self._loaded.items():
+            if total <= PARTITION_BUDGET_ROWS:
+                break
+            if key in keep:
+                continue
+            victims.append(key)
+            total -= rows
+        return victims
+
+    def data_files(self) -> Dict[str, pathlib.Path]:
+        files = {f"transactions_{key}": self._part_file(key) for key in sorted(self._meta)}
+        files["transactions_manifest"] = self.manifest_path
+        files["transactions_journal_1"] = self._journal.rotated_path
+        files["transactions_journal"] = self._journal.path
+        return files
+
+    def files_locked(self):
+        """Giữ khi đọc data_files(): compaction không ghi phân vùng / manifest giữa chừng"""
+        return self._file_lock
+
+    # ---------- ghi ----------
+    def save_all(self, rows: List[Dict]):
+        """Ghi lại mọi phân vùng có trong `rows` + các phân vùng đã nạp (giữ nguyên phân vùng lạnh)"""
+        self._join_compactor()
+        groups = self._group(rows, set(self._loaded))
+        with self._file_lock:
+            self._write_partitions(groups)
+            self._journal.reset()
+        self._after_write(groups)
+
+    def write(self, op: str, row: Optional[Dict], tid: Optional[str], snapshot: RowsProvider):
+        self.write_batch([(op, row, tid)], snapshot)
+
+    def add_many(self, rows: List[Dict], snapshot: RowsProvider):
+        self.write_many("add", rows, None, snapshot)
+
+    def write_many(self, op: str, rows: Optional[List[Dict]], tids: Optional[List[str]], snapshot: RowsProvider):
+        if tids is not None:
+            self.write_batch([(op, None, tid) for tid in tids], snapshot)
+        else:
+            self.write_batch([(op, row, None) for row in rows], snapshot)
+
+    def write_batch(self, ops: List[Tuple[str, Optional[Dict], Optional[str]]], snapshot: RowsProvider):
+        records = []
+        for op, row, tid in ops:
+            record = {"op": op}
+            if row is not None:
+                record["row"] = row
+                self._mark_row(row["date"])
+            if tid is not None:
+                record["id"] = tid
+            records.append(record)
+        try:
+            self._journal.append_records(records)
+        except Exception as e:
+            print(f"❌ Error writing journal: {e}")
+            self.save_all(snapshot())
+            return
+        if self._journal.count >= COMPACT_THRESHOLD:
+            self.compact(snapshot)
+
+    def _mark_row(self, date: str):
+        """Có dòng thêm/sửa thuộc năm này -> phải ghi lại; năm mới (chưa có trên đĩa) coi như đã nạp"""
+        key = partition_key(date)
+        self._touched.add(key)
+        if key not in self._loaded and key not in self._meta:
+            self._loaded[key] = 0
+
+    def _group(self, rows: List[Dict], dirty: Set[str]) -> Dict[str, List[Dict]]:
+        """Chia dòng theo năm, chỉ giữ các năm cần ghi: có dòng thêm/sửa hoặc số dòng khác manifest (bị xóa)"""
+        groups: Dict[str, List[Dict]] = {key: [] for key in self._loaded}
+        for r in rows:
+            groups.setdefault(partition_key(r["date"]), []).append(r)
+        return {key: part for key, part in groups.items()
+                if key in dirty or key not in self._meta or len(part) != self._meta[key]["rows"]}
+
+    def _after_write(self, groups: Dict[str, List[Dict]]):
+        for key, part in groups.items():
+            self._touched.discard(key)
+            if key in self._loaded:
+                if part:
+                    self._loaded[key] = len(part)
+                else:
+                    del self._loaded[key]
+
+    def compact(self, snapshot: RowsProvider, wait: bool = False):
+        """Ghi lại (ở background) chỉ các năm có thay đổi, rồi bỏ journal đã gộp"""
+        if self._compactor is not None and self._compactor.is_alive():
+            if not wait:
+                return
+            self._join_compactor()
+        if not self._journal.rotate():
+            self.save_all(snapshot())
+            return
+        groups = self._group(snapshot(), set(self._touched))
+        self._after_write(groups)
+        self._writing = set(groups)
+
+        def _run():
+            try:
+                with self._file_lock:
+                    self._write_partitions(groups)
+                    self._journal.drop_rotated()
+            except Exception as e:
+                # Journal .1 vẫn còn -> lần sau gộp đồng bộ lại; đánh dấu lại để không bị đẩy ra
+                self._touched |= set(groups)
+                print(f"❌ Error compacting partitions: {e}")
+            finally:
+                self._writing = set()
+
+        self._compactor = threading.Thread(target=_run, name="PartitionCompactor", daemon=True)
+        self._compactor.start()
+        if wait:
+            self._join_compactor()
+
+    def flush(self, snapshot: RowsProvider):
+        """Gộp đồng bộ: cũng chỉ ghi lại các năm có thay đổi"""
+        self._join_compactor()
+        if not (self._journal.count or self._journal.rotated_path.exists() or self._touched):
+            return
+        groups = self._group(snapshot(), set(self._touched))
+        with self._file_lock:
+            self._write_partitions(groups)
+            self._journal.reset()
+        self._after_write(groups)
+
+    def copy_to(self, dest: pathlib.Path, snapshot: RowsProvider):
+        self.flush(snapshot)
+        shutil.copytree(self.path, dest, dirs_exist_ok=True)
+
+    def query_ids(self, **filters) -> Optional[List[str]]:
+        return None
+
+    def close(self):
+        self._join_compactor()
+        self._journal.close()
+
+    def _join_compactor(self):
+        if self._compactor is not None:
+            self._compactor.join()
+            self._compactor = None
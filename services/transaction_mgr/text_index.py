@@ -0,0 +1,154 @@
+import unicodedata
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+def _build_fold_table() -> Dict[int, Optional[str]]:
+    """Bảng str.translate: chữ có dấu (Latin + Latin mở rộng tiếng Việt) -> chữ gốc, dấu rời -> bỏ"""
+    table: Dict[int, Optional[str]] = {}
+    for cp in list(range(0x00C0, 0x0250)) + list(range(0x1E00, 0x1F00)):
+        base = "".join(ch for ch in unicodedata.normalize("NFD", chr(cp)) if not unicodedata.combining(ch))
+        if base != chr(cp):
+            table[cp] = base
+    for cp in range(0x0300, 0x0370):      # Dấu rời (text đã ở dạng NFD)
+        table[cp] = None
+    table[ord("đ")] = "d"
+    return table
+
+
+_FOLD_TABLE = _build_fold_table()
+
+
+def fold(text: str) -> str:
+    """Chuẩn hóa để tìm kiếm: bỏ hoa/thường + bỏ dấu tiếng Việt ("Ăn sáng" -> "an sang")"""
+    # translate chạy ở tầng C, nhanh hơn nhiều so với normalize("NFD") + lọc từng ký tự
+    return text.casefold().translate(_FOLD_TABLE)
+
+
+def _trigrams(text: str) -> Set[str]:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class TextIndex:
+    """
+    Index tìm kiếm (không phân biệt hoa/thường, dấu) trên description + category + role.
+    Mọi chuỗi được fold rồi gom theo giá trị khác nhau -> tập id (sổ thật lặp lại mô tả rất nhiều).
+    - description: inverted index trigram -> tập mô tả khác nhau. search() lấy giao các
+      posting list (nhỏ nhất trước) rồi kiểm tra lại chuỗi con để loại kết quả khớp nhầm.
+    - category/role: ít giá trị nên chỉ quét danh sách giá trị (vài trăm), không cần trigram.
+    """
+    def __init__(self):
+        self._grams: Dict[str, Set[str]] = {}        # trigram -> các mô tả (đã fold) chứa nó
+        self._desc_ids: Dict[str, Set[str]] = {}     # mô tả (đã fold) -> id
+        self._label_ids: Dict[str, Set[str]] = {}    # danh mục/thành viên (đã fold) -> id
+        self._docs: Dict[str, Tuple[str, str, str]] = {}
+        self._fold_cache: Dict[str, str] = {}
+
+    @classmethod
+    def build(cls, transactions: Iterable) -> "TextIndex":
+        index = cls()
+        add = index.add
+        for t in transactions:
+            add(t.id, t)
+        return index
+
+    def __len__(self):
+        return len(self._docs)
+
+    def _fold(self, value: str) -> str:
+        folded = self._fold_cache.get(value)
+        if folded is None:
+            folded = self._fold_cache[value] = fold(value or "")
+        return folded
+
+    # ==========================
+    # CẬP NHẬT
+    # ==========================
+    def add(self, tid: str, t):
+        """Thêm mới / cập nhật văn bản của 1 giao dịch"""
+        doc = (self._fold(t.description), self._fold(t.category), self._fold(t.role))
+        old = self._docs.get(tid)
+        if old is not None:
+            if old == doc:
+                return
+            self.remove(tid)
+        self._docs[tid] = doc
+
+        desc = doc[0]
+        ids = self._desc_ids.get(desc)
+        if ids is None:
+            # Mô tả mới: mới phải tách trigram
+            self._desc_ids[desc] = {tid}
+            grams = self._grams
+            for g in _trigrams(desc):
+                posting = grams.get(g)
+                if posting is None:
+                    grams[g] = {desc}
+                else:
+                    posting.add(desc)
+        else:
+            ids.add(tid)
+
+        for label in doc[1:]:
+            ids = self._label_ids.get(label)
+            if ids is None:
+                self._label_ids[label] = {tid}
+            else:
+                ids.add(tid)
+
+    def remove(self, tid: str):
+        doc = self._docs.pop(tid, None)
+        if doc is None:
+            return
+        desc = doc[0]
+        ids = self._desc_ids[desc]
+        ids.discard(tid)
+        if not ids:
+            del self._desc_ids[desc]
+            for g in _trigrams(desc):
+                posting = self._grams.get(g)
+                if posting is not None:
+                    posting.discard(desc)
+                    if not posting:
+                        del self._grams[g]
+        for label in doc[1:]:
+            ids = self._label_ids.get(label)
+            if ids is not None:
+                ids.discard(tid)
+                if not ids:
+                    del self._label_ids[label]
+
+    # ==========================
+    # TRUY VẤN
+    # ==========================
+    def search(self, keyword: str) -> Optional[Set[str]]:
+        """Tập id khớp từ khóa (không phân biệt hoa/thường, dấu). None nếu từ khóa rỗng = không lọc."""
+        q = fold(keyword)
+        if not q:
+            return None
+        result: Set[str] = set()
+        for desc in self._match_descriptions(q):
+            result |= self._desc_ids[desc]
+        for label, ids in self._label_ids.items():
+            if q in label:
+                result |= ids
+        return result
+
+    def _match_descriptions(self, q: str) -> Iterable[str]:
+        if len(q) < 3:
+            # Từ khóa quá ngắn để dùng trigram: quét các mô tả khác nhau (đã fold sẵn)
+            return [desc for desc in self._desc_ids if q in desc]
+
+        postings = []
+        for g in _trigrams(q):
+            posting = self._grams.get(g)
+            if not posting:
+                return ()
+            postings.append(posting)
+        postings.sort(key=len)
+        candidates = set(postings[0])
+        for posting in postings[1:]:
+            candidates &= posting
+            if not candidates:
+                return ()
+        if len(q) == 3:
+            return candidates
+        return [desc for desc in candidates if q in desc]
@@ -0,0 +1,109 @@
+import heapq
+from typing import Callable, Dict, Iterable, List, Tuple
+
+from .frozen import FrozenTransaction, freeze
+
+# Số phần tử giữ trong heap = K * hệ số dư: xóa vài dòng top vẫn còn đủ K, không phải dựng lại
+TOP_K = 5
+TOP_SLACK = 4
+
+
+class TopAmountIndex:
+    """
+    Giữ các giao dịch có amount lớn nhất của 1 loại (vd: 5 khoản chi đắt nhất) mà không phải sort cả sổ.
+    - Min-heap giới hạn `capacity` phần tử (amount, -thứ tự, id): thêm/sửa O(log K).
+    - Xóa / sửa làm 1 phần tử rời heap chỉ gỡ khỏi _members; mục cũ trong heap bị bỏ lười khi nổi lên đỉnh.
+    - `_floor` = amount lớn nhất từng bị đẩy ra ngoài: heap luôn đúng là top-len(heap) của cả sổ.
+      Nếu xóa nhiều tới mức còn < n phần tử mà bên ngoài vẫn có thể lớn hơn -> dựng lại từ `source` (hiếm).
+    - Giữ luôn bản bất biến của các dòng trong top: đọc top không cần tra lại Engine
+      (dòng ở năm đã bị đẩy khỏi RAM không bị nạp lại).
+    """
+    def __init__(self, type_name: str, source: Callable[[], Iterable], capacity: int = TOP_K * TOP_SLACK):
+        self.type_name = type_name
+        self.capacity = capacity
+        self._source = source                          # () -> các giao dịch hiện có (dùng khi dựng lại)
+        self._heap: List[Tuple[float, int, str]] = []
+        self._members: Dict[str, Tuple[float, int]] = {}   # id -> (amount, thứ tự) đang hợp lệ trong heap
+        self._rows: Dict[str, FrozenTransaction] = {}      # id -> bản bất biến của dòng đang trong heap
+        self._floor = float("-inf")
+        self._seq = 0
+        self.rebuild()
+
+    def __len__(self):
+        return len(self._members)
+
+    # ==========================
+    # CẬP NHẬT
+    # ==========================
+    def rebuild(self):
+        """Dựng lại từ nguồn O(n log K)"""
+        self._heap, self._members, self._rows, self._floor, self._seq = [], {}, {}, float("-inf"), 0
+        items = (t for t in self._source() if t.type == self.type_name)
+        # (amount, -thứ tự) luôn khác nhau -> không bao giờ phải so tới id / object
+        best = heapq.nlargest(self.capacity + 1, ((t.amount, -i, t.id, t) for i, t in enumerate(items)))
+        if len(best) > self.capacity:
+            self._floor = best.pop()[0]
+        for amount, neg_seq, tid, t in best:
+            self._members[tid] = (amount, -neg_seq)
+            self._rows[tid] = freeze(t)
+            self._seq = max(self._seq, -neg_seq + 1)
+        self._heap = [(amount, neg_seq, tid) for amount, neg_seq, tid, _ in best]
+        heapq.heapify(self._heap)
+
+    def add(self, tid: str, t):
+        """Thêm / cập nhật 1 giao dịch (khác loại -> gỡ ra)"""
+        if t.type != self.type_name:
+            self.remove(tid)
+            return
+        amount = t.amount
+        old = self._members.pop(tid, None)
+        self._rows.pop(tid, None)
+        if old is not None and old[0] == amount:
+            # Sửa trường khác (mô tả, ngày...) -> vị trí trong top không đổi, chỉ thay bản lưu
+            self._members[tid] = old
+            self._rows[tid] = freeze(t)
+            return
+        seq = old[1] if old is not None else self._seq
+        if old is None:
+            self._seq += 1
+        if amount < self._floor:
+            return   # Bên ngoài heap đã có dòng lớn hơn -> dòng này không thể lọt top
+        self._members[tid] = (amount, seq)
+        self._rows[tid] = freeze(t)
+        heapq.heappush(self._heap, (amount, -seq, tid))
+        while len(self._members) > self.capacity:
+            self._floor = max(self._floor, self._pop_min()[0])
+        if len(self._heap) > 4 * self.capacity:
+            # Dọn mục cũ tích tụ (sửa amount liên tục) để heap không phình
+            self._heap = [(a, s, i) for a, s, i in self._heap if self._members.get(i) == (a, -s)]
+            heapq.heapify(self._heap)
+
+    def remove(self, tid: str):
+        self._members.pop(tid, None)
+        self._rows.pop(tid, None)
+
+    def _pop_min(self) -> Tuple[float, int, str]:
+        """Lấy phần tử nhỏ nhất còn hợp lệ, bỏ qua các mục cũ (đã xóa / đã sửa)"""
+        while True:
+            amount, neg_seq, tid = heapq.heappop(self._heap)
+            if self._members.get(tid) == (amount, -neg_seq):
+                del self._members[tid]
+                del self._rows[tid]
+                return amount, neg_seq, tid
+
+    # ==========================
+    # TRUY VẤN
+    # ==========================
+    def top(self, n: int = TOP_K) -> List[str]:
+        """Id n giao dịch lớn nhất (lớn -> nhỏ; bằng nhau thì dòng thêm trước đứng trước). O(K log K)."""
+        if n > self.capacity:
+            self.capacity = n * TOP_SLACK
+            self.rebuild()
+        elif len(self._members) < n and self._floor != float("-inf"):
+            self.rebuild()   # Xóa hết phần dư: bên ngoài heap có thể còn dòng lớn hơn
+        ranked = sorted(self._members.items(), key=lambda kv: (-kv[1][0], kv[1][1]))
+        return [tid for tid, _ in ranked[:n]]
+
+    def rows(self, n: int = TOP_K) -> List[FrozenTransaction]:
+        """Bản bất biến của n dòng lớn nhất (cùng thứ tự như top())"""
+        return [self._rows[tid] for tid in self.top(n)]
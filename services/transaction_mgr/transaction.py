@@ -1,15 +1,20 @@
 import math
+import pathlib
 from PyQt6.QtCore import *
 from PyQt6.QtWidgets import *
 from PyQt6.QtGui import *
 
 # Import các phần phụ trợ GUI
 from . import BudgetNode, StatisticsDialog
+from .importer import ImportWorker
+from .exporter import EXPORT_FILE_FILTER, ExportWorker
 from models import Transaction, FamilyMember
 from style import THEMES, SeasonalOverlay
 
 # Import Core Data Manager (Singleton)
 from core.data_manager import DataManager
+from core.change_feed import Change, KIND_TRANSACTION
+from core.page_refresh import connect_when_visible
 
 # ==========================================
 # 1. DIALOG NHẬP LIỆU (FORM)
@@ -283,8 +288,8 @@ class TransactionMgr(QMainWindow):
         
         # --- KẾT NỐI DATA MANAGER (SINGLETON) ---
         self.data_manager = DataManager.instance()
-        # Lắng nghe sự thay đổi dữ liệu để tự refresh
-        self.data_manager.data_changed.connect(self.refresh_all)
+        # Chỉ refresh khi giao dịch thay đổi (sửa todo/quỹ nhóm... không vẽ lại bảng), trang ẩn thì đợi tới khi hiện
+        connect_when_visible(self, self.data_manager.transactions_changed, self.refresh_all)
 
         self.init_ui()
 
@@ -403,15 +408,18 @@ class TransactionMgr(QMainWindow):
     # ==========================
     
     def refresh_all(self):
-        # Lấy dữ liệu mới nhất từ Singleton (Proxy Property)
-        transactions = self.data_manager.transactions 
-        self.update_table(transactions)
-        self.update_summary(transactions)
-        self.update_graph(transactions)
-
-    def update_summary(self, transactions):
-        inc = sum(t.amount for t in transactions if t.type == "income")
-        exp = sum(t.amount for t in transactions if t.type == "expense")
+        if self.data_manager.trans_engine.partitioned:
+            # Phân vùng: bảng chỉ lấy các dòng trong khoảng ngày đang lọc (không nạp lại các năm cũ)
+            self.update_table(self._current_query().list())
+        else:
+            # Lấy dữ liệu mới nhất từ Singleton (Proxy Property)
+            self.update_table(self.data_manager.transactions)
+        self.update_summary()
+        self.update_graph()
+
+    def update_summary(self):
+        s = self.data_manager.get_transaction_summary()
+        inc, exp = s["income"], s["expense"]
         self.income_label.setText(f"Thu: {inc:,.0f} đ")
         self.income_label.setStyleSheet("color: #27ae60; font-weight: bold; font-size: 14px;")
         
@@ -424,8 +432,7 @@ class TransactionMgr(QMainWindow):
     # --- ADD ---
     def add_transaction(self):
         # Lấy danh sách roles hiện có để gợi ý
-        current_data = self.data_manager.transactions
-        roles = sorted(set(t.role for t in current_data)) or ["Bố", "Mẹ", "Cá nhân"]
+        roles = self.data_manager.get_rollup().values("role") or ["Bố", "Mẹ", "Cá nhân"]
 
         dlg = TransactionDialog(self, roles, theme_key=self.current_theme_key)
         if dlg.exec() == QDialog.DialogCode.Accepted:
@@ -445,19 +452,19 @@ class TransactionMgr(QMainWindow):
         if row < 0: return
         tid = self.table.item(row, 0).data(Qt.ItemDataRole.UserRole)
         
-        # Tìm transaction trong list của Manager
-        trans = next((t for t in self.data_manager.transactions if t.id == tid), None)
+        # Tìm transaction qua index id của Engine
+        trans = self.data_manager.get_transaction(tid)
         
         if trans:
-            roles = sorted(set(t.role for t in self.data_manager.transactions))
+            roles = self.data_manager.get_rollup().values("role")
             dlg = TransactionDialog(self, roles, trans, theme_key=self.current_theme_key)
             if dlg.exec():
                 new_data = dlg.get_data()
-                # Cập nhật object hiện tại
-                for k, v in new_data.items(): setattr(trans, k, v)
+                # Tạo object mới thay vì sửa tại chỗ (object trong Engine có thể là view chỉ đọc)
+                new_t = Transaction(id=trans.id, **new_data)
                 
                 # GỌI DATA MANAGER CẬP NHẬT
-                self.data_manager.update_transaction(trans)
+                self.data_manager.update_transaction(new_t)
 
     # --- DELETE ---
     def delete_transaction(self):
@@ -472,20 +479,82 @@ class TransactionMgr(QMainWindow):
     # --- IMPORT / EXPORT (Giờ gọi qua Engine ẩn trong Manager) ---
     def import_csv(self):
         path, _ = QFileDialog.getOpenFileName(self, "Chọn file CSV", "", "CSV Files (*.csv)")
-        if path:
-            try:
-                # Gọi Engine thông qua Manager
-                count = self.data_manager.trans_engine.import_csv(path) 
-                self.data_manager.notify_change() # Báo UI cập nhật
-                QMessageBox.information(self, "Import", f"Đã import {count} dòng.")
-            except Exception as e:
-                QMessageBox.critical(self, "Lỗi", str(e))
+        if not path: return
+
+        # Parse ở worker thread, GUI chỉ nhận từng lô -> cửa sổ không bị treo
+        engine = self.data_manager.trans_engine
+        self._import_added = []
+        self._import_error = None
+        self._import_worker = ImportWorker(path)
+        self._import_progress = QProgressDialog("Đang import giao dịch...", "Hủy", 0, 100, self)
+        self._import_progress.setWindowTitle("Import")
+        self._import_progress.setWindowModality(Qt.WindowModality.WindowModal)
+        self._import_progress.setMinimumDuration(300)
+        self._import_progress.canceled.connect(self._import_worker.cancel)
+
+        self._import_worker.batch_ready.connect(lambda batch: self._import_added.extend(engine.import_batch(batch)))
+        self._import_worker.progress.connect(self._import_progress.setValue)
+        self._import_worker.failed.connect(self._on_import_failed)
+        self._import_worker.finished.connect(self._on_import_finished)
+        self._import_worker.start()
+
+    def _on_import_failed(self, msg):
+        self._import_error = msg
+
+    def _on_import_finished(self):
+        engine = self.data_manager.trans_engine
+        worker = self._import_worker
+        self._import_progress.close()
+        if worker.cancelled or self._import_error:
+            engine.rollback_import(self._import_added)
+            if self._import_error:
+                QMessageBox.critical(self, "Lỗi", self._import_error)
+        else:
+            engine.commit_import(self._import_added)
+            self.data_manager.notify_change(Change.reload(KIND_TRANSACTION)) # Báo UI cập nhật (chỉ miền giao dịch)
+            QMessageBox.information(self, "Import", f"Đã import {len(self._import_added)} dòng.")
+        self._import_added = []
+        worker.deleteLater()
+        self._import_worker = None
 
     def export_csv(self):
-        path, _ = QFileDialog.getSaveFileName(self, "Lưu file CSV", "", "CSV Files (*.csv)")
-        if path:
-            self.data_manager.trans_engine.export_csv(path)
-            QMessageBox.information(self, "Export", "Xuất file thành công!")
+        path, chosen = QFileDialog.getSaveFileName(self, "Xuất giao dịch", "", EXPORT_FILE_FILTER)
+        if not path: return
+        if not pathlib.Path(path).suffix:
+            # Không gõ đuôi -> lấy theo bộ lọc đang chọn, vd "JSON Lines (*.jsonl)" -> .jsonl
+            path += chosen[chosen.find("*") + 1:chosen.find(")")] or ".csv"
+
+        # Chỉ xuất phần đang lọc trên bảng, hoặc cả sổ
+        engine = self.data_manager.trans_engine
+        answer = QMessageBox.question(self, "Export", "Chỉ xuất các giao dịch đang lọc trên bảng?\n(No = xuất toàn bộ sổ)")
+        ids = engine.export_ids(self._current_query().query if answer == QMessageBox.StandardButton.Yes else None)
+
+        # Ghi file ở worker thread, GUI chỉ nhận tiến độ -> export lớn không làm treo cửa sổ.
+        # Giá trị được chốt ngay bây giờ (O(1)): dòng bị sửa trong lúc export vẫn ra giá trị lúc bắt đầu
+        self._export_error = None
+        self._export_worker = ExportWorker(path, ids, engine.export_reader(ids))
+        self._export_progress = QProgressDialog("Đang xuất giao dịch...", "Hủy", 0, 100, self)
+        self._export_progress.setWindowTitle("Export")
+        self._export_progress.setMinimumDuration(300)
+        self._export_progress.canceled.connect(self._export_worker.cancel)
+
+        self._export_worker.progress.connect(self._export_progress.setValue)
+        self._export_worker.failed.connect(self._on_export_failed)
+        self._export_worker.finished.connect(self._on_export_finished)
+        self._export_worker.start()
+
+    def _on_export_failed(self, msg):
+        self._export_error = msg
+
+    def _on_export_finished(self):
+        worker = self._export_worker
+        self._export_progress.close()
+        if self._export_error:
+            QMessageBox.critical(self, "Lỗi", self._export_error)
+        elif not worker.cancelled:
+            QMessageBox.information(self, "Export", f"Đã xuất {worker.exported} giao dịch ra {pathlib.Path(worker.path).name}.")
+        worker.deleteLater()
+        self._export_worker = None
 
     # --- HELPER GUI METHODS ---
     def create_btn(self, text, func):
@@ -495,21 +564,21 @@ class TransactionMgr(QMainWindow):
         btn.setFixedHeight(35)
         return btn
 
-    def apply_filter(self):
+    def _current_query(self):
+        """QueryResult theo các ô lọc đang chọn trên bảng"""
         keyword = self.keyword_edit.text().lower()
         type_text = self.type_filter.currentText()
         from_dt = self.from_date.date().toString("yyyy-MM-dd")
         to_dt = self.to_date.date().toString("yyyy-MM-dd")
 
-        all_trans = self.data_manager.transactions
-        filtered = [
-            t for t in all_trans
-            if (keyword in t.role.lower() or keyword in t.category.lower() or keyword in t.description.lower())
-            and (type_text == "Tất cả" or (type_text == "Thu nhập" and t.type == "income") or (type_text == "Chi tiêu" and t.type == "expense"))
-            and from_dt <= t.date <= to_dt
-        ]
-        self.update_table(filtered)
-        self.update_graph(filtered)
+        type_name = {"Thu nhập": "income", "Chi tiêu": "expense"}.get(type_text)
+        return self.data_manager.query_transactions(text=keyword, type_name=type_name,
+                                                    date_from=from_dt, date_to=to_dt)
+
+    def apply_filter(self):
+        result = self._current_query()
+        self.update_table(result.list())
+        self.update_graph(result)
 
     def update_table(self, data):
         self.table.setRowCount(len(data))
@@ -542,14 +611,18 @@ class TransactionMgr(QMainWindow):
         menu.exec(self.table.viewport().mapToGlobal(pos))
 
     def show_stats(self):
-        # Mở dialog thống kê (Code dialog này giả sử bạn đã có)
-        dlg = StatisticsDialog(self, self.data_manager.transactions)
+        # Mở dialog thống kê trên snapshot bất biến: sửa/xóa giao dịch trong lúc dialog mở không ảnh hưởng
+        snap = self.data_manager.snapshot()
+        dlg = StatisticsDialog(self, snap.transactions, snap.rollup,
+                               top_expenses=self.data_manager.get_top_transactions(5, "expense"))
         dlg.exec()
     
-    def update_graph(self, transactions):
+    def update_graph(self, result=None):
+        """result=None -> đọc cube của Engine; có QueryResult (kết quả lọc) -> tổng hợp riêng kết quả đó"""
         self.scene.clear()
-        
-        roles = sorted(set(t.role for t in transactions))
+
+        cube = self.data_manager.get_rollup() if result is None else result.rollup()
+        roles = cube.values("role")
         if not roles:
             return
 
@@ -560,9 +633,11 @@ class TransactionMgr(QMainWindow):
         ]
         
         # ✅ TÍNH TOÁN TỔNG TIỀN CHO TỪNG MEMBER TRƯỚC
+        role_income = cube.sum_by("role", type="income")
+        role_expense = cube.sum_by("role", type="expense")
         for m in members:
-            m.total_income = sum(t.amount for t in transactions if t.role == m.name and t.type == "income")
-            m.total_expense = sum(t.amount for t in transactions if t.role == m.name and t.type == "expense")
+            m.total_income = role_income.get(m.name, 0)
+            m.total_expense = role_expense.get(m.name, 0)
 
         # ✅ SAU ĐÓ MỚI TẠO NODE
         cx, cy = 250, 250
@@ -642,7 +717,7 @@ class TransactionMgr(QMainWindow):
         self.balance_label.setStyleSheet(f"color: {t['bg_secondary']}; font-weight: bold; font-size: 16px;")
 
         # Redraw Graphics to match theme
-        self.update_graph(self.data_manager.transactions)
+        self.update_graph()
 
     def resizeEvent(self, event):
         super().resizeEvent(event)
@@ -0,0 +1,77 @@
+"""
+Backup tăng dần: backup -> sửa -> restore -> nạp lại phải ra đúng sổ lúc backup,
+kể cả khi journal (thay đổi chưa gộp vào CSV) có / không có lúc backup.
+"""
+from core.backup import BackupStore
+from models import Transaction
+from services.transaction_mgr.engine import TransactionEngine
+
+
+def _t(i, amount=100.0):
+    return Transaction(str(i), f"2024-01-{i % 28 + 1:02d}", "Ăn uống", amount, "expense", "Bố", f"d{i}")
+
+
+def _state(engine):
+    return sorted((t.id, t.date, t.amount, t.description) for t in engine.get_all())
+
+
+def _backup(engine, store):
+    with engine.files_locked():
+        return store.snapshot(engine.data_files())
+
+
+def test_restore_drops_journal_written_after_backup(tmp_path):
+    path = tmp_path / "transactions.csv"
+    engine = TransactionEngine(path)
+    engine.add_many([_t(i) for i in range(50)])
+    engine.flush()   # Journal đã gộp hết -> lúc backup không có file journal
+    expected = _state(engine)
+    store = BackupStore(tmp_path / "backups")
+    manifest = _backup(engine, store)
+
+    engine.update_transaction(_t(1, 999.0))
+    engine.delete_many(["2", "3"])
+    engine.add_transaction(_t(77))
+    engine.close()
+    assert (tmp_path / "transactions.csv.journal").exists()
+
+    store.restore(manifest)
+    assert not (tmp_path / "transactions.csv.journal").exists()
+    reloaded = TransactionEngine(path)
+    assert _state(reloaded) == expected
+    reloaded.close()
+
+
+def test_restore_replays_journal_captured_in_backup(tmp_path):
+    path = tmp_path / "transactions.csv"
+    engine = TransactionEngine(path)
+    engine.add_many([_t(i) for i in range(50)])
+    engine.flush()
+    engine.update_transaction(_t(4, 444.0))   # Chỉ nằm trong journal lúc backup
+    expected = _state(engine)
+    store = BackupStore(tmp_path / "backups")
+    manifest = _backup(engine, store)
+
+    engine.add_many([_t(i) for i in range(100, 120)])
+    engine.flush()   # Gộp journal vào CSV, journal bị xóa
+    engine.close()
+
+    store.restore(manifest)
+    reloaded = TransactionEngine(path)
+    assert _state(reloaded) == expected
+    reloaded.close()
+
+
+def test_unchanged_files_reuse_previous_manifest(tmp_path):
+    data = tmp_path / "debts.json"
+    data.write_text("[]", encoding="utf-8")
+    store = BackupStore(tmp_path / "backups")
+    files = {"debts": data, "payment_log": tmp_path / "payment_log.json"}
+    first = store.snapshot(files)
+    assert store.snapshot(files) == first
+
+    (tmp_path / "payment_log.json").write_text("[1]", encoding="utf-8")
+    second = store.snapshot(files)
+    assert second != first
+    store.restore(first)
+    assert not (tmp_path / "payment_log.json").exists()
@@ -0,0 +1,40 @@
+"""
+ColumnarStore: cột type không còn giới hạn 255 loại, tombstone không lẫn vào tổng theo loại.
+"""
+import pytest
+
+from models import Transaction
+from services.transaction_mgr import columnar
+from services.transaction_mgr.columnar import ColumnarStore
+
+
+def _t(i, type_name):
+    return Transaction(str(i), "2024-01-01", f"cat{i % 3}", float(i), type_name, f"role{i % 2}", "")
+
+
+def test_more_than_255_types():
+    store = ColumnarStore()
+    rows = [_t(i, f"loại {i}") for i in range(400)]
+    for t in rows:
+        store[t.id] = t
+    assert [r.type for r in store.values()] == [t.type for t in rows]
+    assert store.sum_amount("loại 255") == 255.0
+    assert store.sum_amount("loại 399") == 399.0
+
+    # Dòng đã xóa (tombstone) không được tính vào loại nào
+    store.pop("255")
+    store.pop("399")
+    assert store.sum_amount("loại 255") == 0
+    assert store.sum_amount("loại 399") == 0
+    assert store.group_sum("category", "loại 300") == {"cat0": 300.0}
+    assert len(store.vacuum()) == 398
+
+
+def test_type_dictionary_full_raises_clear_error(monkeypatch):
+    monkeypatch.setattr(columnar, "_DEAD", 3)
+    store = ColumnarStore()
+    for i in range(3):
+        store[str(i)] = _t(i, f"loại {i}")
+    with pytest.raises(ValueError, match="tối đa 3"):
+        store["3"] = _t(3, "loại 3")
+    assert len(store) == 3 and len(store.ids) == 3   # Không để lại dòng dở dang
@@ -0,0 +1,40 @@
+"""
+DebtEngine.import_csv (đường tuần tự): file rỗng / chỉ có header không làm hỏng import,
+export -> import giữ nguyên dữ liệu.
+"""
+import pytest
+
+from core.write_behind import WriteBehind
+from models import Debt
+from services.debt_mgr.engine import DebtEngine
+
+
+@pytest.fixture
+def engine(tmp_path, monkeypatch):
+    # WriteBehind riêng cho test: không ghi nền lẫn vào test khác
+    monkeypatch.setattr(WriteBehind, "_instance", WriteBehind(delay=60))
+    return DebtEngine(tmp_path / "debts.json", tmp_path / "payments.json")
+
+
+def _debt(i):
+    return Debt(i, f"người {i}", "IOWE" if i % 2 else "THEY_OWE", 1000.0 * i, 10.0 * i,
+                0.5, 12, "2024-01-01", None if i % 3 else "2025-01-01", f"mục đích {i}", bool(i % 2))
+
+
+@pytest.mark.parametrize("content", ["", "\n", "id,counterparty,side,amount,paid_back,interest_rate,"
+                                     "term_months,start_date,due_date,purpose,compound\n"])
+def test_import_empty_file_imports_nothing(engine, tmp_path, content):
+    path = tmp_path / "in.csv"
+    path.write_text(content, encoding="utf-8")
+    assert engine.import_csv(str(path), parallel=False) == 0
+    assert engine._debts == []
+
+
+def test_export_import_round_trip(engine, tmp_path):
+    engine._debts = [_debt(i) for i in range(1, 6)]
+    path = str(tmp_path / "out.csv")
+    assert engine.export_csv(path)
+
+    engine._debts = []
+    assert engine.import_csv(path, parallel=False) == 5
+    assert engine._debts == [_debt(i) for i in range(1, 6)]
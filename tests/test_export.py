@@ -0,0 +1,98 @@
+"""
+Export: giá trị chốt lúc bắt đầu (GUI sửa / xóa trong lúc worker ghi không lẫn vào file),
+bắt đầu export không chép cả sổ, hủy export .npz không để lại file tạm.
+"""
+import csv
+import json
+import pathlib
+from unittest import mock
+
+from models import Transaction
+from services.transaction_mgr import exporter, frozen
+from services.transaction_mgr.engine import TransactionEngine
+from services.transaction_mgr.exporter import write_export
+
+
+def _engine(tmp_path, n=2000, columnar=False):
+    engine = TransactionEngine(tmp_path / "transactions.csv", columnar=columnar)
+    engine.add_many([Transaction(str(i), "2024-01-01", "a", float(i), "expense", "x", "d") for i in range(n)])
+    return engine
+
+
+def test_export_reader_is_lazy(tmp_path):
+    engine = _engine(tmp_path)
+    with mock.patch.object(frozen, "freeze", wraps=frozen.freeze) as spy:
+        read = engine.export_reader(engine.export_ids())
+    assert spy.call_count == 0
+    assert len(read(["1", "2"])) == 2
+    read.close()
+    engine.close()
+
+
+def test_export_keeps_values_from_start(tmp_path):
+    for columnar in (False, True):
+        engine = _engine(tmp_path / str(columnar), columnar=columnar)
+        ids = engine.export_ids()
+        read = engine.export_reader(ids)
+        first = read(ids[:10])   # Worker đã đọc 1 lô trước khi GUI sửa
+
+        # GUI sửa / xóa trong lúc export đang chạy
+        for i in range(0, 2000, 2):
+            engine.update_transaction(Transaction(str(i), "2024-01-01", "a", -1.0, "expense", "x", "changed"))
+        engine.delete_many([str(i) for i in range(1, 1000, 2)])
+        engine.add_transaction(Transaction("new", "2024-01-01", "a", 5.0, "expense", "x", "new"))
+
+        out = tmp_path / f"out_{columnar}.csv"
+        n = write_export(str(out), ids[10:], read)
+        rows = first + list(csv.DictReader(open(out, encoding="utf-8-sig")))
+        assert n == 1990 and len(rows) == 2000
+        assert all(float(r["amount"]) >= 0 and r["description"] == "d" for r in rows)
+        # write_export đã close(): không còn giữ giá trị cũ cho lần sửa sau
+        assert engine._export_pins == ()
+        engine.close()
+
+
+def test_cancelled_npz_export_leaves_no_temp_files(tmp_path):
+    engine = _engine(tmp_path, n=exporter.EXPORT_CHUNK_SIZE * 3)
+    ids = engine.export_ids()
+    work_dirs = []
+    real_mkdtemp = exporter.tempfile.mkdtemp
+
+    def mkdtemp(**kw):
+        work_dirs.append(pathlib.Path(real_mkdtemp(**kw)))
+        return str(work_dirs[-1])
+
+    calls = iter([False, True])
+    with mock.patch.object(exporter.tempfile, "mkdtemp", mkdtemp), \
+            mock.patch.object(exporter._NpzWriter, "discard", autospec=True,
+                              side_effect=exporter._NpzWriter.discard) as discard:
+        n = write_export(str(tmp_path / "out.npz"), ids, engine.export_reader(ids),
+                         cancelled=lambda: next(calls, True))
+    assert n == -1
+    writer = discard.call_args[0][0]
+    assert all(f.closed for f in writer._files.values())
+    assert not (tmp_path / "out.npz").exists() and not (tmp_path / "out.npz.tmp").exists()
+    assert work_dirs and not work_dirs[0].exists()
+    engine.close()
+
+
+def test_npz_export_roundtrip(tmp_path):
+    engine = _engine(tmp_path, n=30)
+    ids = engine.export_ids()
+    path = tmp_path / "out.npz"
+    assert write_export(str(path), ids, engine.export_reader(ids)) == 30
+    import zipfile
+    with zipfile.ZipFile(path) as zf:
+        assert sorted(zf.namelist()) == sorted(f"{name}.npy" for name in exporter.FIELDNAMES)
+    engine.close()
+
+
+def test_jsonl_export_typed_values(tmp_path):
+    engine = _engine(tmp_path, n=3)
+    ids = engine.export_ids()
+    path = tmp_path / "out.jsonl"
+    write_export(str(path), ids, engine.export_reader(ids))
+    rows = [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+    assert [r["amount"] for r in rows] == [0.0, 1.0, 2.0]
+    assert all(r["is_recurring"] is False for r in rows)
+    engine.close()
@@ -0,0 +1,98 @@
+"""
+CSV + journal (backend mặc định): mỗi thay đổi chỉ ghi thêm journal, load lại replay đúng thứ tự,
+compaction gộp journal vào CSV gốc mà không mất thay đổi nào.
+"""
+from models import Transaction
+from services.transaction_mgr import storage
+from services.transaction_mgr.engine import TransactionEngine
+from services.transaction_mgr.storage import _to_row
+
+
+def _t(i, amount=None, date="2024-03-01"):
+    return Transaction(str(i), date, f"c{i % 3}", float(amount if amount is not None else i),
+                       "income" if i % 2 else "expense", f"r{i % 2}", f"giao dịch {i}")
+
+
+def _rows(engine):
+    return [_to_row(t) for t in engine.get_all()]
+
+
+def _reload(path):
+    engine = TransactionEngine(path)
+    rows = _rows(engine)
+    summary = engine.summary()
+    engine.close()
+    return rows, summary
+
+
+def test_mutations_append_to_journal_and_replay(tmp_path):
+    path = tmp_path / "transactions.csv"
+    engine = TransactionEngine(path)
+    engine.add_many([_t(i) for i in range(5)])
+    engine.save()
+    engine.flush()
+    csv_bytes = path.read_bytes()
+
+    engine.add_transaction(_t(5))
+    engine.update_transaction(_t(1, amount=100))
+    engine.delete_transaction("2")
+    engine.update_many([_t(3, amount=300, date="2023-01-01")])
+    engine.delete_many(["4"])
+    expected, summary = _rows(engine), engine.summary()
+    engine.close()
+
+    # CSV gốc không bị ghi lại, mọi thay đổi nằm trong journal
+    assert path.read_bytes() == csv_bytes
+    assert len(path.with_name("transactions.csv.journal").read_text(encoding="utf-8").splitlines()) == 5
+    assert _reload(path) == (expected, summary)
+
+
+def test_replay_skips_torn_last_line(tmp_path):
+    path = tmp_path / "transactions.csv"
+    engine = TransactionEngine(path)
+    engine.add_transaction(_t(1))
+    engine.add_transaction(_t(2))
+    expected = _rows(engine)
+    engine.close()
+    # Mất điện giữa lúc ghi dòng cuối
+    with open(path.with_name("transactions.csv.journal"), "a", encoding="utf-8") as f:
+        f.write('{"op": "add", "row": {"id": "3", "da')
+    assert _reload(path)[0] == expected
+
+
+def test_compaction_folds_journal_into_csv(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "COMPACT_THRESHOLD", 10)
+    path = tmp_path / "transactions.csv"
+    engine = TransactionEngine(path)
+    for i in range(25):
+        engine.add_transaction(_t(i))
+    engine.delete_transaction("7")
+    engine.compact(wait=True)
+    expected = _rows(engine)
+    engine.close()
+
+    assert not path.with_name("transactions.csv.journal.1").exists()
+    assert not path.with_name("transactions.csv.journal").exists()
+    assert _reload(path)[0] == expected
+    assert len(expected) == 24
+
+
+def test_interrupted_compaction_replays_both_journals(tmp_path):
+    path = tmp_path / "transactions.csv"
+    engine = TransactionEngine(path)
+    engine.add_many([_t(i) for i in range(3)])
+    engine.backend._journal.rotate()   # App tắt ngay sau khi xoay journal, CSV gốc chưa được ghi
+    engine.update_transaction(_t(0, amount=50))
+    engine.delete_transaction("1")
+    expected = _rows(engine)
+    engine.close()
+
+    assert path.with_name("transactions.csv.journal.1").exists()
+    assert _reload(path)[0] == expected
+
+    # Lần compact sau thấy `.journal.1` còn sót -> ghi lại đồng bộ, dọn sạch cả 2 journal
+    engine = TransactionEngine(path)
+    engine.compact(wait=True)
+    engine.close()
+    assert not path.with_name("transactions.csv.journal.1").exists()
+    assert _reload(path)[0] == expected
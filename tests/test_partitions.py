@@ -0,0 +1,120 @@
+"""
+Backend phân vùng theo năm: khởi động chỉ nạp các năm mới nhất, năm cũ nạp khi truy vấn chạm tới,
+tổng/cube toàn sổ luôn đúng (manifest), ghi / import không làm mất hay trùng dòng ở năm chưa nạp.
+"""
+import pytest
+
+from models import Transaction
+from services.transaction_mgr import storage
+from services.transaction_mgr.engine import TransactionEngine
+from services.transaction_mgr.rollup import RollupCube
+from services.transaction_mgr.storage import PartitionedBackend
+
+YEARS = [str(y) for y in range(2015, 2025)]
+
+
+def _ledger(n=300):
+    # 30 dòng / năm, năm 2015..2024
+    return [Transaction(str(i), f"{2015 + i % 10}-{i % 12 + 1:02d}-{i % 28 + 1:02d}", f"c{i % 4}",
+                        float(100 + i), "income" if i % 3 == 0 else "expense", f"r{i % 2}", f"d{i}",
+                        is_recurring=i == 10)
+            for i in range(n)]
+
+
+def _open(path):
+    return TransactionEngine(path, backend=PartitionedBackend(path))
+
+
+@pytest.fixture
+def parts(tmp_path):
+    path = tmp_path / "transactions.parts"
+    engine = _open(path)
+    engine.add_many(_ledger())
+    engine.flush()
+    engine.close()
+    return path
+
+
+def _loaded(engine):
+    return sorted(engine.backend._loaded)
+
+
+def test_startup_loads_hot_years_only(parts):
+    engine = _open(parts)
+    rows = _ledger()
+    assert engine.partitioned
+    assert _loaded(engine) == ["2023", "2024"]
+    # Số liệu toàn sổ lấy từ manifest, không cần nạp năm cũ
+    assert len(engine) == 300
+    cube = RollupCube.from_transactions(rows)
+    assert engine.rollup.pivot_flow("month") == cube.pivot_flow("month")
+    assert engine.summary()["income"] == sum(t.amount for t in rows if t.type == "income")
+    # Mẫu định kỳ ở năm lạnh (2015) vẫn sinh lần phát sinh
+    assert [o.id for o in engine.occurrences("2024-11-01", "2024-11-30")] == ["10@2024-11-11"]
+    assert _loaded(engine) == ["2023", "2024"]
+    engine.close()
+
+
+def test_query_and_lookup_load_only_needed_years(parts):
+    engine = _open(parts)
+    expected = [t.id for t in _ledger() if "2017-01-01" <= t.date <= "2017-12-31"]
+    assert list(engine.query(date_from="2017-01-01", date_to="2017-12-31").ids()) == expected
+    assert _loaded(engine) == ["2017", "2023", "2024"]
+    assert engine.get_by_id("4").date.startswith("2019")
+    assert _loaded(engine) == ["2017", "2019", "2023", "2024"]
+    engine.close()
+
+
+def test_eviction_over_budget_keeps_totals(parts, monkeypatch):
+    monkeypatch.setattr(storage, "PARTITION_BUDGET_ROWS", 90)
+    engine = _open(parts)
+    summary = engine.summary()
+    engine.query(date_from="2015-01-01", date_to="2015-12-31").list()
+    engine.query(date_from="2018-01-01", date_to="2018-12-31").list()
+    # 2015 ít dùng nhất bị đẩy ra, năm vừa hỏi và các năm nóng ở lại
+    assert _loaded(engine) == ["2018", "2023", "2024"]
+    assert engine.summary() == summary
+    expected = [t.id for t in _ledger() if t.date < "2016"]
+    assert list(engine.query(date_to="2015-12-31").ids()) == expected
+    engine.close()
+
+
+def test_writes_touch_only_changed_years(parts):
+    untouched = parts / "2016.csv"
+    stamp = untouched.stat().st_mtime_ns
+    engine = _open(parts)
+    engine.update_transaction(Transaction("0", "2015-01-01", "c0", 1.0, "income", "r0", "sửa năm lạnh"))
+    engine.delete_transaction("2")   # Năm 2017
+    engine.add_transaction(Transaction("mới", "2030-01-01", "c1", 5.0, "expense", "r1", "năm mới"))
+    expected_len = len(engine)
+    engine.flush()
+    engine.close()
+
+    assert untouched.stat().st_mtime_ns == stamp
+    engine = _open(parts)
+    assert len(engine) == expected_len == 300
+    assert engine.get_by_id("0").description == "sửa năm lạnh"
+    assert engine.get_by_id("2") is None
+    assert _loaded(engine)[-2:] == ["2024", "2030"]
+    assert len(engine.get_all()) == 300
+    engine.close()
+
+
+def test_import_keeps_ids_unique_across_cold_years(parts, tmp_path):
+    engine = _open(parts)
+    src = tmp_path / "import.csv"
+    # id "5" đang nằm ở năm 2020 (chưa nạp)
+    src.write_text("id,date,category,amount,type,role,description\n5,2024-05-05,c9,3,expense,r0,nhập\n",
+                   encoding="utf-8")
+    engine.import_csv(str(src))
+    assert "2020" not in _loaded(engine)
+    imported = next(t for t in engine.query(date_from="2024-05-05", date_to="2024-05-05") if t.description == "nhập")
+    assert imported.id != "5"
+    engine.flush()
+    engine.close()
+
+    engine = _open(parts)
+    ids = [t.id for t in engine.get_all()]
+    assert len(ids) == len(set(ids)) == 301
+    assert engine.get_by_id("5").description == "d5"
+    engine.close()
@@ -0,0 +1,90 @@
+"""
+TransactionEngine.query(): mọi đường chọn index (khoảng ngày, trigram, duyệt cả sổ, cube) phải cho
+cùng kết quả và cùng thứ tự với cách lọc thẳng trên cả sổ.
+"""
+import pytest
+
+from models import Transaction
+from services.transaction_mgr.engine import TransactionEngine
+from services.transaction_mgr.text_index import fold
+
+ROLES = ["Bố", "Mẹ", "Con"]
+DESCRIPTIONS = ["Ăn sáng", "Tiền điện", "Lương tháng", "Đổ xăng", "Cà phê sáng"]
+
+
+def _ledger(n=200):
+    return [Transaction(str(i), f"{2023 + i % 3}-{i * 7 % 12 + 1:02d}-{i % 28 + 1:02d}", f"Danh mục {i % 6}",
+                        float(500 + 37 * (i % 50)), ["income", "expense", "saving"][i % 3 if i % 5 else 1],
+                        ROLES[i % 3], f"{DESCRIPTIONS[i % 5]} {i}", is_recurring=i % 11 == 0)
+            for i in range(n)]
+
+
+def _baseline(rows, date_from=None, date_to=None, type_name=None, roles=None, categories=None,
+              text="", amount_min=None, amount_max=None, recurring=None, order="ledger"):
+    def ok(t):
+        return ((date_from is None or date_from <= t.date) and (date_to is None or t.date <= date_to)
+                and (type_name is None or t.type == type_name)
+                and (roles is None or t.role in roles) and (categories is None or t.category in categories)
+                and (not text or any(fold(text) in fold(v) for v in (t.description, t.category, t.role)))
+                and (amount_min is None or t.amount >= amount_min) and (amount_max is None or t.amount <= amount_max)
+                and (recurring is None or t.is_recurring == recurring))
+    out = [t for t in rows if ok(t)]
+    return sorted(out, key=lambda t: t.date) if order == "date" else out
+
+
+FILTERS = [
+    {},
+    {"order": "date"},
+    {"type_name": "expense"},
+    {"date_from": "2024-03-01", "date_to": "2024-08-31"},
+    {"date_from": "2025-01-01", "order": "date"},
+    {"date_to": "2023-06-30", "type_name": "income", "roles": ["Bố"]},
+    {"text": "sang"},                                  # Không dấu vẫn khớp "Ăn sáng", "Cà phê sáng"
+    {"text": "ĐIỆN", "date_from": "2024-01-01", "order": "date"},
+    {"text": "xa"},                                    # Từ khóa ngắn hơn 1 trigram
+    {"categories": ["Danh mục 2", "Danh mục 5"], "amount_min": 1000, "amount_max": 2000},
+    {"roles": ["Mẹ", "Con"], "type_name": "saving"},
+    {"recurring": True, "order": "date"},
+    {"text": "không có"},
+]
+
+
+@pytest.fixture(params=[False, True], ids=["dict", "columnar"])
+def engine(tmp_path, request):
+    engine = TransactionEngine(tmp_path / "transactions.csv", columnar=request.param)
+    engine.add_many(_ledger())
+    engine.update_transaction(Transaction("4", "2025-12-31", "Danh mục 5", 1500.0, "expense", "Mẹ", "Tiền điện sửa"))
+    engine.delete_many(["10", "11"])
+    yield engine
+    engine.close()
+
+
+@pytest.mark.parametrize("filters", FILTERS)
+def test_query_matches_full_scan(engine, filters):
+    expected = _baseline(engine.get_all(), **filters)
+    result = engine.query(**filters)
+    assert list(result.ids()) == [t.id for t in expected]
+    assert result.count() == len(expected)
+    assert result.total() == pytest.approx(sum(t.amount for t in expected))
+    for dimension in ("month", "category", "role", "type"):
+        grouped = {}
+        for t in expected:
+            key = t.date[:7] if dimension == "month" else getattr(t, dimension)
+            grouped[key] = grouped.get(key, 0) + t.amount
+        assert result.group_sum(dimension) == pytest.approx(grouped)
+
+
+def test_result_is_lazy_and_sees_later_writes(engine):
+    result = engine.query(type_name="income", roles=["Con"])
+    before = result.count()
+    engine.add_transaction(Transaction("x", "2024-01-01", "Danh mục 0", 10.0, "income", "Con", "thêm sau"))
+    assert result.count() == before + 1
+    assert result.first() is not None
+    engine.delete_transaction("x")
+    assert result.count() == before
+
+
+def test_filter_is_query_shorthand(engine):
+    got = engine.filter("sáng", "expense", "2024-01-01", "2025-12-31")
+    expected = engine.query(text="sáng", type_name="expense", date_from="2024-01-01", date_to="2025-12-31")
+    assert got and [t.id for t in got] == list(expected.ids())
@@ -0,0 +1,66 @@
+"""
+Giao dịch định kỳ: ngày phát sinh theo chu kỳ Tuần / Tháng / Năm, cache của Engine theo kịp mỗi lần sửa mẫu.
+"""
+from datetime import date
+
+import pytest
+
+from models import Transaction
+from services.transaction_mgr.engine import TransactionEngine
+from services.transaction_mgr.recurrence import occurrence_dates, template_id
+
+
+@pytest.mark.parametrize("anchor, cycle, start, end, expected", [
+    # Mốc cuối tháng không trôi dần về ngày 28
+    (date(2024, 1, 31), "Tháng", "2024-01-01", "2024-05-31",
+     ["2024-02-29", "2024-03-31", "2024-04-30", "2024-05-31"]),
+    (date(2024, 1, 31), "Tháng", "2024-04-01", "2024-04-29", []),
+    (date(2024, 3, 5), "Tuần", "2024-03-01", "2024-03-31", ["2024-03-12", "2024-03-19", "2024-03-26"]),
+    (date(2024, 2, 29), "Năm", "2024-01-01", "2028-12-31",
+     ["2025-02-28", "2026-02-28", "2027-02-28", "2028-02-29"]),
+    # Dữ liệu cũ không có chu kỳ -> hàng tháng
+    (date(2023, 11, 15), "", "2024-01-01", "2024-02-28", ["2024-01-15", "2024-02-15"]),
+])
+def test_occurrence_dates(anchor, cycle, start, end, expected):
+    assert occurrence_dates(anchor, cycle, start, end) == expected
+
+
+def test_occurrence_dates_stop_at_expiry():
+    dates = occurrence_dates(date(2024, 1, 10), "Tháng", "2024-01-01", "2024-12-31", expiry=date(2024, 4, 10))
+    assert dates == ["2024-02-10", "2024-03-10", "2024-04-10"]
+
+
+@pytest.fixture(params=[False, True], ids=["dict", "columnar"])
+def engine(tmp_path, request):
+    engine = TransactionEngine(tmp_path / "transactions.csv", columnar=request.param)
+    engine.add_many([
+        Transaction("rent", "2024-01-05", "Nhà", 5000.0, "expense", "Bố", "Tiền nhà", is_recurring=True, cycle="Tháng"),
+        Transaction("salary", "2024-01-25", "Lương", 20000.0, "income", "Mẹ", "Lương", is_recurring=True, cycle="Tháng"),
+        Transaction("gym", "2024-03-01", "Sức khỏe", 100.0, "expense", "Con", "Tập", is_recurring=True, cycle="Tuần",
+                    expiry_date="2024-03-20"),
+        Transaction("once", "2024-02-01", "Ăn uống", 50.0, "expense", "Bố", "Một lần"),
+    ])
+    yield engine
+    engine.close()
+
+
+def test_engine_occurrences_and_forecast(engine):
+    found = engine.occurrences("2024-03-01", "2024-03-31")
+    assert [(o.id, o.amount) for o in found] == [
+        ("rent@2024-03-05", 5000.0), ("gym@2024-03-08", 100.0), ("gym@2024-03-15", 100.0),
+        ("salary@2024-03-25", 20000.0)]
+    assert {template_id(o.id) for o in found} == {"rent", "gym", "salary"}
+    assert engine.forecast("2024-02-01", "2024-04-30") == {"income": 60000.0, "expense": 15200.0, "balance": 44800.0}
+
+
+def test_engine_occurrences_follow_template_changes(engine):
+    engine.occurrences("2024-02-01", "2024-04-30")   # Dựng index + cache
+    engine.update_transaction(Transaction("rent", "2024-01-05", "Nhà", 6000.0, "expense", "Bố", "Tiền nhà",
+                                          is_recurring=True, cycle="Năm"))
+    engine.update_transaction(Transaction("once", "2024-02-01", "Ăn uống", 50.0, "expense", "Bố", "Một lần",
+                                          is_recurring=True, cycle="Tháng"))
+    engine.delete_transaction("salary")
+    found = engine.occurrences("2024-02-01", "2025-01-31")
+    assert [o.id for o in found if not o.id.startswith("gym")] == \
+        [f"once@2024-{m:02d}-01" for m in range(3, 13)] + ["once@2025-01-01", "rent@2025-01-05"]
+    assert engine.forecast("2025-01-01", "2025-01-31")["expense"] == 6050.0
@@ -0,0 +1,101 @@
+"""
+Backend SQLite: cùng kết quả với CSV + journal (thứ tự sổ, query đẩy xuống SQL), giữ thứ tự sau khi sửa,
+chuyển dữ liệu từ transactions.csv cũ đúng 1 lần.
+"""
+import pytest
+
+from models import Transaction
+from services.transaction_mgr.engine import TransactionEngine
+from services.transaction_mgr.storage import SqliteBackend, _to_row
+
+ROLES = ["Bố", "Mẹ", "Con"]
+
+
+def _ledger(n=120):
+    return [Transaction(str(i), f"{2023 + i % 2}-{i % 12 + 1:02d}-{i % 28 + 1:02d}", f"Danh mục {i % 5}",
+                        float(1000 + 13 * i), "income" if i % 4 == 0 else "expense", ROLES[i % 3],
+                        f"Ghi Chú {i}", is_recurring=i % 10 == 0)
+            for i in range(n)]
+
+
+def _open_sqlite(tmp_path, migrate_from=None):
+    path = tmp_path / "transactions.db"
+    return TransactionEngine(path, backend=SqliteBackend(path, migrate_from=migrate_from))
+
+
+def _mutate(engine):
+    engine.add_many(_ledger())
+    engine.update_transaction(Transaction("5", "2022-12-31", "Danh mục 9", 1.0, "income", "Mẹ", "đã sửa"))
+    engine.delete_many(["7", "8"])
+    engine.begin()
+    engine.add_transaction(Transaction("mới", "2024-06-06", "Danh mục 1", 77.0, "expense", "Con", "mới"))
+    engine.delete_transaction("9")
+    engine.commit()
+
+
+@pytest.fixture
+def engines(tmp_path):
+    csv_engine = TransactionEngine(tmp_path / "transactions.csv")
+    sql_engine = _open_sqlite(tmp_path)
+    _mutate(csv_engine)
+    _mutate(sql_engine)
+    yield csv_engine, sql_engine
+    csv_engine.close()
+    sql_engine.close()
+
+
+def test_reload_keeps_rows_and_order(tmp_path, engines):
+    csv_engine, sql_engine = engines
+    expected = [_to_row(t) for t in csv_engine.get_all()]
+    assert [_to_row(t) for t in sql_engine.get_all()] == expected
+    sql_engine.close()
+
+    reloaded = _open_sqlite(tmp_path)
+    # Dòng "5" bị sửa vẫn ở vị trí cũ (UPSERT giữ rowid)
+    assert [_to_row(t) for t in reloaded.get_all()] == expected
+    assert reloaded.summary() == csv_engine.summary()
+    reloaded.close()
+
+
+@pytest.mark.parametrize("filters", [
+    {"type_name": "income"},
+    {"date_from": "2023-03-01", "date_to": "2023-09-30"},
+    {"date_from": "2024-01-01", "type_name": "expense", "roles": ["Bố", "Con"]},
+    {"categories": ["Danh mục 1", "Danh mục 9"], "order": "date"},
+    {"type_name": "expense", "text": "ghi chú 1", "amount_min": 1100},
+    {"roles": ["Mẹ"], "recurring": True},
+])
+def test_pushdown_matches_in_memory_filter(engines, filters):
+    csv_engine, sql_engine = engines
+    expected = csv_engine.query(**filters)
+    got = sql_engine.query(**filters)
+    assert list(got.ids()) == list(expected.ids())
+    assert got.total() == expected.total()
+
+
+def test_query_ids_uses_indexes(tmp_path):
+    backend = SqliteBackend(tmp_path / "transactions.db")
+    names = {r["name"] for r in backend._conn.execute("PRAGMA index_list(transactions)")}
+    assert {"idx_trans_date", "idx_trans_type", "idx_trans_role", "idx_trans_category"} <= names
+    plan = " ".join(r[3] for r in backend._conn.execute(
+        "EXPLAIN QUERY PLAN SELECT id FROM transactions WHERE date >= ? AND date <= ?", ("2024-01-01", "2024-02-01")))
+    assert "idx_trans_date" in plan
+    backend.close()
+
+
+def test_migrates_legacy_csv_once(tmp_path):
+    legacy = TransactionEngine(tmp_path / "transactions.csv")
+    legacy.add_many(_ledger(10))
+    legacy.delete_transaction("3")   # Còn trong journal, chưa gộp vào CSV
+    expected = [_to_row(t) for t in legacy.get_all()]
+    legacy.close()
+
+    engine = _open_sqlite(tmp_path, migrate_from=tmp_path / "transactions.csv")
+    assert [_to_row(t) for t in engine.get_all()] == expected
+    engine.delete_transaction("4")
+    engine.close()
+
+    # Lần mở sau: DB đã có dữ liệu -> không nạp lại từ CSV
+    engine = _open_sqlite(tmp_path, migrate_from=tmp_path / "transactions.csv")
+    assert [t.id for t in engine.get_all()] == [r["id"] for r in expected if r["id"] != "4"]
+    engine.close()
@@ -0,0 +1,76 @@
+"""
+So sánh số liệu tổng hợp (Engine + RollupCube) với cách tính gốc (quét cả sổ) trên sổ có loại tự đặt.
+Chạy: python -m pytest -q (từ thư mục gốc repo)
+"""
+from models import Transaction
+from services.transaction_mgr.engine import TransactionEngine
+from services.transaction_mgr.rollup import RollupCube
+
+# Có cả loại tự đặt / viết hoa khác: không được tính lẫn vào "income" / "expense" của summary
+TYPES = ["income", "expense", "transfer", "Income", "saving", "expense"]
+
+
+def _ledger():
+    return [
+        Transaction(str(i), f"2024-{i % 12 + 1:02d}-{i % 28 + 1:02d}", f"cat{i % 5}",
+                    float(1000 + 37 * i), TYPES[i % len(TYPES)], f"role{i % 3}", f"d{i}")
+        for i in range(300)
+    ]
+
+
+# ==========================
+# CÁCH TÍNH GỐC (trước khi có tổng cộng dồn / cube)
+# ==========================
+def _baseline_summary(transactions):
+    inc = sum(t.amount for t in transactions if t.type == "income")
+    exp = sum(t.amount for t in transactions if t.type == "expense")
+    return {"income": inc, "expense": exp, "balance": inc - exp}
+
+
+def _baseline_monthly(transactions):
+    monthly = {}
+    for t in transactions:
+        ym = t.date[:7]
+        monthly.setdefault(ym, {"income": 0, "expense": 0})
+        if t.type == "income":
+            monthly[ym]["income"] += t.amount
+        else:
+            monthly[ym]["expense"] += t.amount
+    return monthly
+
+
+def _baseline_role_income(transactions):
+    role_inc = {}
+    for t in transactions:
+        if t.type != "expense":
+            role_inc[t.role] = role_inc.get(t.role, 0) + t.amount
+    return role_inc
+
+
+# ==========================
+# TESTS
+# ==========================
+def test_engine_summary_matches_baseline(tmp_path):
+    rows = _ledger()
+    engine = TransactionEngine(tmp_path / "transactions.csv")
+    engine.add_many(rows)
+    assert engine.summary() == _baseline_summary(rows)
+
+    # Sửa / xóa vẫn khớp (tổng cộng dồn cập nhật theo từng thao tác)
+    engine.update_transaction(Transaction("1", "2024-02-02", "cat1", 5000.0, "transfer", "role1", "x"))
+    engine.update_transaction(Transaction("2", "2024-03-03", "cat2", 7000.0, "income", "role2", "y"))
+    engine.delete_many(["3", "4"])
+    engine.close()
+    assert engine.summary() == _baseline_summary(engine.get_all())
+
+    # Nạp lại từ đĩa cũng khớp
+    reloaded = TransactionEngine(tmp_path / "transactions.csv")
+    assert reloaded.summary() == _baseline_summary(reloaded.get_all())
+    reloaded.close()
+
+
+def test_rollup_flow_matches_baseline():
+    rows = _ledger()
+    cube = RollupCube.from_transactions(rows)
+    assert cube.pivot_flow("month") == _baseline_monthly(rows)
+    assert cube.sum_by_other("role", "expense") == _baseline_role_income(rows)
@@ -0,0 +1,93 @@
+"""
+Unit-of-work của TransactionEngine (begin/commit/rollback) và UndoLog của các Engine dạng list:
+sau rollback, mọi trạng thái (thứ tự sổ, tổng, cube, index ngày, tìm kiếm) phải y như trước begin().
+"""
+import copy
+from dataclasses import dataclass
+
+import pytest
+
+from core.undo import UndoLog
+from models import Transaction
+from services.transaction_mgr.engine import TransactionEngine
+
+
+def _rows(n=40):
+    return [Transaction(str(i), f"2024-{i % 12 + 1:02d}-{i % 28 + 1:02d}", f"c{i % 4}",
+                        float(10 * i + 1), "income" if i % 3 == 0 else "expense", f"r{i % 2}", f"mô tả {i}")
+            for i in range(n)]
+
+
+def _state(engine):
+    return {
+        "rows": [(t.id, t.date, t.category, t.amount, t.type, t.role, t.description) for t in engine.get_all()],
+        "summary": engine.summary(),
+        "cube": engine.rollup.pivot("month", "type"),
+        "range": engine._dates.range(),
+        "latest": [t.id for t in engine.latest(5)],
+        "largest": [t.id for t in engine.largest(5)],
+        "search": list(engine.query(text="mô tả 1").ids()),
+    }
+
+
+@pytest.mark.parametrize("columnar", [False, True])
+def test_rollback_restores_state_and_order(tmp_path, columnar):
+    engine = TransactionEngine(tmp_path / "transactions.csv", columnar=columnar)
+    engine.add_many(_rows())
+    _state(engine)   # Dựng sẵn các index lười (tìm kiếm, top-K) để rollback phải cập nhật cả chúng
+    before = _state(engine)
+
+    engine.begin()
+    engine.delete_transaction("3")
+    engine.delete_many(["10", "0", "39"])
+    engine.update_transaction(Transaction("5", "2023-01-01", "x", 9999.0, "expense", "r9", "sửa"))
+    engine.update_many([Transaction("7", "2024-07-08", "c3", 1.0, "income", "r1", "sửa 7")])
+    engine.add_transaction(Transaction("new", "2024-05-05", "c1", 50.0, "expense", "r0", "mới"))
+    engine.add_transaction(Transaction("3", "2022-02-02", "c2", 3.0, "income", "r1", "thêm lại"))
+    engine.rollback()
+
+    assert _state(engine) == before
+    engine.close()
+    # Không có gì được ghi xuống đĩa
+    reloaded = TransactionEngine(tmp_path / "transactions.csv", columnar=columnar)
+    assert _state(reloaded)["rows"] == before["rows"]
+    reloaded.close()
+
+
+def test_commit_writes_once_and_keeps_changes(tmp_path):
+    engine = TransactionEngine(tmp_path / "transactions.csv")
+    engine.add_many(_rows())
+    engine.begin()
+    engine.delete_transaction("3")
+    engine.update_transaction(Transaction("5", "2023-01-01", "x", 9999.0, "expense", "r9", "sửa"))
+    engine.commit()
+    after = _state(engine)
+    engine.close()
+    reloaded = TransactionEngine(tmp_path / "transactions.csv")
+    assert _state(reloaded)["rows"] == after["rows"]
+    reloaded.close()
+
+
+@dataclass
+class _Item:
+    id: int
+    value: int
+
+
+def test_undo_log_restores_positions_and_in_place_edits():
+    items = [_Item(i, i) for i in range(6)]
+    before = copy.deepcopy(items)
+    log = UndoLog()
+
+    log.remember(items, 2)
+    items.pop(2)
+    target = items[3]
+    snap = copy.deepcopy(target)
+    target.value = 100                      # Sửa tại chỗ trước khi báo cho Engine -> truyền before
+    log.remember(items, target.id, before=snap)
+    log.remember(items, 99)
+    items.append(_Item(99, 99))
+
+    assert log.restore(items)
+    assert items == before
+    assert not log.restore(items)           # Không còn gì để hoàn tác
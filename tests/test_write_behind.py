@@ -0,0 +1,111 @@
+"""
+WriteBehind: gộp nhiều lần sửa thành 1 lần ghi, thứ tự ghi (bản mới không bị bản cũ đè),
+hold()/release() của unit-of-work và flush khi đóng app.
+"""
+import json
+import threading
+import time
+import types
+
+import pytest
+
+from core.write_behind import WriteBehind
+
+
+def _wait(cond, timeout=5.0):
+    end = time.monotonic() + timeout
+    while not cond():
+        if time.monotonic() > end:
+            return False
+        time.sleep(0.005)
+    return True
+
+
+def test_coalesces_burst_into_one_write(tmp_path):
+    wb = WriteBehind(delay=0.05, max_delay=1.0)
+    path = tmp_path / "todos.json"
+    data = []
+    for i in range(20):
+        data.append(i)
+        wb.mark_dirty("todos", lambda: list(data), path, json.dumps)
+    assert _wait(lambda: path.exists())
+    assert json.loads(path.read_text()) == list(range(20))
+    assert wb.writes == 1
+    assert not wb.is_dirty("todos")
+
+
+def test_snapshot_taken_at_mark_time(tmp_path):
+    wb = WriteBehind(delay=10)
+    path = tmp_path / "debts.json"
+    data = [1]
+    wb.mark_dirty("debts", lambda: list(data), path, json.dumps)
+    data.append(2)   # Sửa tiếp mà không mark_dirty -> không lọt vào lần ghi đã xếp
+    wb.flush()
+    assert json.loads(path.read_text()) == [1]
+
+
+class _GapLock:
+    """_io_lock chèn 1 khoảng dừng trên thread nền ngay trước khi lấy khóa (mô phỏng bị lập lịch chậm)"""
+    def __init__(self, at_gap, go):
+        self._lock = threading.Lock()
+        self._at_gap, self._go = at_gap, go
+
+    def __enter__(self):
+        if threading.current_thread().name == "write-behind" and not self._go.is_set():
+            self._at_gap.set()
+            self._go.wait(5)
+        self._lock.acquire()
+
+    def __exit__(self, *exc):
+        self._lock.release()
+
+
+def test_flush_never_overwritten_by_older_background_write():
+    wb = WriteBehind(delay=0.01, max_delay=0.01)
+    at_gap, go = threading.Event(), threading.Event()
+    wb._io_lock = _GapLock(at_gap, go)
+    written = []
+
+    wb.mark_dirty("k", lambda: 1, written.append)
+    assert at_gap.wait(5)                      # Thread nền đã chọn ghi, chưa kịp lấy _io_lock
+    wb.mark_dirty("k", lambda: 2, written.append)
+    wb.flush()                                 # GUI thread ghi bản mới trước
+    go.set()
+    assert _wait(lambda: not wb.is_dirty())
+    time.sleep(0.05)
+    assert written and written[-1] == 2
+
+
+def test_flush_inside_hold_is_deferred_to_release(tmp_path):
+    wb = WriteBehind(delay=0.01)
+    path = tmp_path / "funds.json"
+    wb.hold()
+    wb.mark_dirty("funds", lambda: {"step": 1}, path, json.dumps)
+    wb.flush()   # vd: flush_all() giữa 1 DataManager.transaction()
+    time.sleep(0.05)
+    assert not path.exists()
+    wb.mark_dirty("funds", lambda: {"step": 2}, path, json.dumps)
+    wb.release()
+    # release() cuối cùng thực hiện luôn lần flush bị hoãn (đồng bộ)
+    assert json.loads(path.read_text()) == {"step": 2}
+    assert wb.writes == 1
+
+
+def test_close_event_flushes_pending_writes(tmp_path, monkeypatch):
+    app_mod = pytest.importorskip("services.dashboard_mgr.app")
+    from core import data_manager
+
+    wb = WriteBehind(delay=60)
+    monkeypatch.setattr(WriteBehind, "_instance", wb)
+    path = tmp_path / "notes.json"
+    wb.mark_dirty("notes", lambda: ["ghi chú"], path, json.dumps)
+
+    # DataManager giả: chỉ cần flush_all() thật (không nạp Engine nào)
+    fake = types.SimpleNamespace(wait_ready=lambda: None, trans_engine=types.SimpleNamespace(flush=lambda: None))
+    fake.flush_all = lambda: data_manager.DataManager.flush_all(fake)
+    monkeypatch.setattr(data_manager.DataManager, "instance", classmethod(lambda cls: fake))
+    monkeypatch.setattr(app_mod.QMainWindow, "closeEvent", lambda self, event: None)
+
+    window = app_mod.FinanceApp.__new__(app_mod.FinanceApp)
+    app_mod.FinanceApp.closeEvent(window, None)
+    assert json.loads(path.read_text()) == ["ghi chú"]